@@ -0,0 +1,84 @@
+import React, { useEffect, useRef } from 'react';
+import { RawCam } from '../../types';
+
+interface CamOverlayProps {
+  cam: RawCam;
+  imageUrl: string;
+  alpha?: number;
+  className?: string;
+}
+
+// Same piecewise-linear JET ramp OpenCV's COLORMAP_JET uses server-side
+function jet(value: number): [number, number, number] {
+  const v = Math.min(Math.max(value, 0), 1);
+  const channel = (offset: number) => Math.round(255 * Math.min(Math.max(1.5 - Math.abs(4 * v - offset), 0), 1));
+  return [channel(3), channel(2), channel(1)];
+}
+
+function float16ToNumber(bits: number): number {
+  const sign = bits & 0x8000 ? -1 : 1;
+  const exponent = (bits >> 10) & 0x1f;
+  const fraction = bits & 0x03ff;
+  if (exponent === 0) return sign * Math.pow(2, -14) * (fraction / 1024);
+  if (exponent === 0x1f) return fraction ? NaN : sign * Infinity;
+  return sign * Math.pow(2, exponent - 15) * (1 + fraction / 1024);
+}
+
+export function decodeCam(cam: RawCam): Float32Array {
+  const bytes = Uint8Array.from(atob(cam.data), (c) => c.charCodeAt(0));
+  const size = cam.shape[0] * cam.shape[1];
+  const values = new Float32Array(size);
+  if (cam.dtype === 'uint8') {
+    for (let i = 0; i < size; i++) values[i] = bytes[i] / 255;
+  } else {
+    const view = new DataView(bytes.buffer);
+    for (let i = 0; i < size; i++) values[i] = float16ToNumber(view.getUint16(i * 2, true));
+  }
+  return values;
+}
+
+/**
+ * Colorizes a low-resolution Grad-CAM grid and upsamples it over the image
+ * the browser already has, instead of downloading a rendered overlay.
+ */
+export default function CamOverlay({ cam, imageUrl, alpha = 0.4, className = '' }: CamOverlayProps) {
+  const canvasRef = useRef<HTMLCanvasElement>(null);
+
+  useEffect(() => {
+    const canvas = canvasRef.current;
+    if (!canvas) return;
+
+    const [rows, cols] = cam.shape;
+    const values = decodeCam(cam);
+    const grid = document.createElement('canvas');
+    grid.width = cols;
+    grid.height = rows;
+    const gridContext = grid.getContext('2d');
+    if (!gridContext) return;
+    const pixels = gridContext.createImageData(cols, rows);
+    values.forEach((value, i) => {
+      const [r, g, b] = jet(value);
+      pixels.data.set([r, g, b, 255], i * 4);
+    });
+    gridContext.putImageData(pixels, 0, 0);
+
+    const image = new Image();
+    image.crossOrigin = 'anonymous';
+    image.onload = () => {
+      const context = canvas.getContext('2d');
+      if (!context) return;
+      canvas.width = image.naturalWidth;
+      canvas.height = image.naturalHeight;
+      context.drawImage(image, 0, 0);
+      // Bilinear upsampling of the grid happens in drawImage
+      context.imageSmoothingEnabled = true;
+      context.imageSmoothingQuality = 'high';
+      context.globalAlpha = alpha;
+      context.drawImage(grid, 0, 0, canvas.width, canvas.height);
+      context.globalAlpha = 1;
+    };
+    image.src = imageUrl;
+  }, [cam, imageUrl, alpha]);
+
+  return <canvas ref={canvasRef} className={className} />;
+}
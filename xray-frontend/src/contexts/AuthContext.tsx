@@ -6,6 +6,8 @@ export interface User {
   name: string;
   role: 'patient' | 'doctor' | 'admin';
   avatar: string;
+  // Bearer token for the study history API, issued with `python -m utils.access`
+  accessToken?: string;
 }
 
 interface AuthContextType {
@@ -24,21 +26,24 @@ const mockUsers: User[] = [
     email: 'patient@xinsight.com',
     name: 'John Patient',
     role: 'patient',
-    avatar: 'https://images.pexels.com/photos/220453/pexels-photo-220453.jpeg?auto=compress&cs=tinysrgb&w=150'
+    avatar: 'https://images.pexels.com/photos/220453/pexels-photo-220453.jpeg?auto=compress&cs=tinysrgb&w=150',
+    accessToken: process.env.REACT_APP_PATIENT_STUDY_TOKEN
   },
   {
     id: '2',
     email: 'doctor@xinsight.com',
     name: 'Dr. Sarah Wilson',
     role: 'doctor',
-    avatar: 'https://images.pexels.com/photos/5452293/pexels-photo-5452293.jpeg?auto=compress&cs=tinysrgb&w=150'
+    avatar: 'https://images.pexels.com/photos/5452293/pexels-photo-5452293.jpeg?auto=compress&cs=tinysrgb&w=150',
+    accessToken: process.env.REACT_APP_DOCTOR_STUDY_TOKEN
   },
   {
     id: '3',
     email: 'admin@xinsight.com',
     name: 'Admin User',
     role: 'admin',
-    avatar: 'https://images.pexels.com/photos/2182970/pexels-photo-2182970.jpeg?auto=compress&cs=tinysrgb&w=150'
+    avatar: 'https://images.pexels.com/photos/2182970/pexels-photo-2182970.jpeg?auto=compress&cs=tinysrgb&w=150',
+    accessToken: process.env.REACT_APP_ADMIN_STUDY_TOKEN
   }
 ];
 
@@ -1,13 +1,60 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
+import axios from 'axios';
 import { Stethoscope, FileText, Users, TrendingUp, Eye, CreditCard as Edit3, CheckCircle } from 'lucide-react';
 import { useAuth } from '../contexts/AuthContext';
+import { StudySummary } from '../types';
+
+interface PendingCase {
+  id: string;
+  patientName: string;
+  age: number | null;
+  study: string;
+  aiConfidence: number;
+  aiFindings: string;
+  uploadDate: string;
+  priority: 'high' | 'medium' | 'low';
+}
+
+const toPendingCase = (study: StudySummary): PendingCase => {
+  const confidence = Math.max(0, ...study.flagged_conditions.map((f) => f.probability));
+  const abnormal = study.patient_status === 'Abnormal';
+  return {
+    id: study.id,
+    patientName: study.patient_id ?? 'Unassigned patient',
+    age: null,
+    study: study.modality === 'bone' ? 'Bone X-Ray' : 'Chest X-Ray',
+    aiConfidence: Math.round(confidence * 1000) / 10,
+    aiFindings: study.flagged_conditions.length
+      ? study.flagged_conditions.map((f) => f.condition).join(', ')
+      : study.patient_status,
+    uploadDate: new Date(study.created_at * 1000).toISOString().slice(0, 16).replace('T', ' '),
+    priority: abnormal && confidence >= 0.8 ? 'high' : abnormal ? 'medium' : 'low',
+  };
+};
 
 export default function DoctorPortal() {
   const { user } = useAuth();
   const [activeTab, setActiveTab] = useState('dashboard');
+  const [storedCases, setStoredCases] = useState<PendingCase[] | null>(null);
 
-  // Mock doctor data
-  const doctorData = {
+  // Recent studies come from the study store; no model is re-run
+  useEffect(() => {
+    if (!user?.accessToken) return;
+    axios
+      .get('http://127.0.0.1:8000/studies', {
+        params: { limit: 20 },
+        headers: { Authorization: `Bearer ${user.accessToken}` },
+      })
+      .then((response) => setStoredCases(response.data.items.map(toPendingCase)))
+      .catch(() => setStoredCases(null));
+  }, [user]);
+
+  // Mock doctor data (pending cases are replaced by stored studies when the backend has any)
+  const doctorData: {
+    stats: { totalPatients: number; pendingReviews: number; analyzedToday: number; accuracy: number };
+    pendingCases: PendingCase[];
+    recentActivity: { id: string; action: string; timestamp: string; result: string }[];
+  } = {
     stats: {
       totalPatients: 156,
       pendingReviews: 8,
@@ -68,6 +115,10 @@ export default function DoctorPortal() {
     ]
   };
 
+  if (storedCases && storedCases.length) {
+    doctorData.pendingCases = storedCases;
+  }
+
   const tabs = [
     { id: 'dashboard', label: 'Dashboard', icon: TrendingUp },
     { id: 'pending', label: 'Pending Reviews', icon: FileText },
@@ -192,7 +243,7 @@ export default function DoctorPortal() {
                   <div className="flex items-center justify-between mb-4">
                     <div>
                       <h3 className="text-lg font-semibold text-gray-900">{case_.patientName}</h3>
-                      <p className="text-sm text-gray-600">Age: {case_.age} | {case_.study}</p>
+                      <p className="text-sm text-gray-600">{case_.age !== null && `Age: ${case_.age} | `}{case_.study}</p>
                       <p className="text-sm text-gray-500">{case_.uploadDate}</p>
                     </div>
                     <div className="flex items-center space-x-3">
@@ -264,7 +315,7 @@ export default function DoctorPortal() {
                       <td className="px-6 py-4 whitespace-nowrap">
                         <div>
                           <div className="text-sm font-medium text-gray-900">{patient.patientName}</div>
-                          <div className="text-sm text-gray-500">Age: {patient.age}</div>
+                          {patient.age !== null && <div className="text-sm text-gray-500">Age: {patient.age}</div>}
                         </div>
                       </td>
                       <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
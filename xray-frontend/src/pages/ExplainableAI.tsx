@@ -1,17 +1,47 @@
 import React, { useState } from 'react';
 import { Brain, Eye, Layers, Target, AlertCircle, TrendingUp } from 'lucide-react';
+import CamOverlay from '../components/Explainability/CamOverlay';
+import { RawCam } from '../types';
+
+interface ExplanationExample {
+  title: string;
+  image: string;
+  condition: string;
+  confidence: number;
+  explanation: string;
+  keyFeatures: string[];
+  // Raw Grad-CAM grid from the API (heatmap_mode=raw), rendered client-side
+  cam?: RawCam;
+}
+
+// A 7x7 uint8 grid (DenseNet121's last conv resolution) with Gaussian peaks
+// at [row, col] grid positions, shaped like a heatmap_mode=raw response
+function focalCam(peaks: [number, number][], sigma = 1.2): RawCam {
+  const size = 7;
+  const bytes = new Uint8Array(size * size);
+  for (let row = 0; row < size; row++) {
+    for (let col = 0; col < size; col++) {
+      const value = Math.max(...peaks.map(([r, c]) =>
+        Math.exp(-((row - r) ** 2 + (col - c) ** 2) / (2 * sigma * sigma))));
+      bytes[row * size + col] = Math.round(value * 255);
+    }
+  }
+  return { shape: [size, size], dtype: 'uint8', data: btoa(String.fromCharCode(...bytes)) };
+}
 
 export default function ExplainableAI() {
   const [selectedExample, setSelectedExample] = useState(0);
 
-  const examples = [
+  const examples: ExplanationExample[] = [
     {
       title: 'Pneumonia Detection',
       image: 'https://images.pexels.com/photos/7089020/pexels-photo-7089020.jpeg?auto=compress&cs=tinysrgb&w=800',
       condition: 'Pneumonia',
       confidence: 92.3,
       explanation: 'The AI model detected consolidation patterns in the lower right lobe, characterized by increased opacity and air bronchograms. The heatmap shows high attention to these regions.',
-      keyFeatures: ['Consolidation pattern', 'Air bronchograms', 'Increased opacity', 'Lower lobe location']
+      keyFeatures: ['Consolidation pattern', 'Air bronchograms', 'Increased opacity', 'Lower lobe location'],
+      // The patient's right lung is on the image's left
+      cam: focalCam([[5, 2], [4, 1]])
     },
     {
       title: 'Fracture Identification',
@@ -19,7 +49,8 @@ export default function ExplainableAI() {
       condition: 'Rib Fracture',
       confidence: 87.6,
       explanation: 'The model identified a clear discontinuity in the cortical bone structure of the 6th rib. The attention mechanism focused on the fracture line and surrounding bone architecture.',
-      keyFeatures: ['Cortical discontinuity', 'Bone alignment', 'Fracture line visibility', 'Surrounding tissue']
+      keyFeatures: ['Cortical discontinuity', 'Bone alignment', 'Fracture line visibility', 'Surrounding tissue'],
+      cam: focalCam([[3, 5]], 0.8)
     },
     {
       title: 'Normal X-Ray Analysis',
@@ -113,13 +144,23 @@ export default function ExplainableAI() {
             {/* Image and Heatmap */}
             <div className="space-y-6">
               <div className="relative">
-                <img
-                  src={examples[selectedExample].image}
-                  alt={examples[selectedExample].title}
-                  className="w-full h-80 object-cover rounded-lg bg-black"
-                />
-                {/* Simulated attention heatmap overlay */}
-                <div className="absolute inset-0 bg-gradient-to-r from-red-500/20 via-yellow-500/30 to-transparent rounded-lg pointer-events-none" />
+                {examples[selectedExample].cam ? (
+                  <CamOverlay
+                    cam={examples[selectedExample].cam!}
+                    imageUrl={examples[selectedExample].image}
+                    className="w-full h-80 object-cover rounded-lg bg-black"
+                  />
+                ) : (
+                  <>
+                    <img
+                      src={examples[selectedExample].image}
+                      alt={examples[selectedExample].title}
+                      className="w-full h-80 object-cover rounded-lg bg-black"
+                    />
+                    {/* Simulated attention heatmap overlay */}
+                    <div className="absolute inset-0 bg-gradient-to-r from-red-500/20 via-yellow-500/30 to-transparent rounded-lg pointer-events-none" />
+                  </>
+                )}
                 <div className="absolute top-4 left-4 bg-black/70 text-white px-3 py-1 rounded-lg text-sm">
                   Attention Heatmap
                 </div>
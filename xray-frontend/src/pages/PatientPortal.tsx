@@ -1,12 +1,46 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
+import axios from 'axios';
 import { User, FileText, Clock, Upload, Download, Eye } from 'lucide-react';
 import { useAuth } from '../contexts/AuthContext';
+import { StudySummary } from '../types';
+
+interface AnalysisRow {
+  id: string;
+  date: string;
+  type: string;
+  status: string;
+  findings: string;
+}
+
+const toAnalysisRow = (study: StudySummary): AnalysisRow => ({
+  id: study.id,
+  date: new Date(study.created_at * 1000).toISOString().slice(0, 10),
+  type: study.modality === 'bone' ? 'Bone X-Ray' : 'Chest X-Ray',
+  status: 'completed',
+  findings: study.flagged_conditions.length
+    ? study.flagged_conditions.map((f) => f.condition).join(', ')
+    : study.patient_status,
+});
 
 export default function PatientPortal() {
   const { user } = useAuth();
   const [activeTab, setActiveTab] = useState('overview');
+  const [storedAnalyses, setStoredAnalyses] = useState<AnalysisRow[] | null>(null);
 
-  // Mock patient data
+  // Past results come from the study store; no model is re-run. The server
+  // scopes a patient token to that patient's own studies.
+  useEffect(() => {
+    if (!user?.accessToken) return;
+    axios
+      .get('http://127.0.0.1:8000/studies', {
+        params: { limit: 20 },
+        headers: { Authorization: `Bearer ${user.accessToken}` },
+      })
+      .then((response) => setStoredAnalyses(response.data.items.map(toAnalysisRow)))
+      .catch(() => setStoredAnalyses(null));
+  }, [user]);
+
+  // Mock patient data (recent analyses are replaced by stored studies when the backend has any)
   const patientData = {
     recentAnalyses: [
       {
@@ -42,6 +76,10 @@ export default function PatientPortal() {
     ]
   };
 
+  if (storedAnalyses && storedAnalyses.length) {
+    patientData.recentAnalyses = storedAnalyses;
+  }
+
   const tabs = [
     { id: 'overview', label: 'Overview', icon: User },
     { id: 'history', label: 'X-Ray History', icon: FileText },
@@ -11,6 +11,9 @@ import {
 } from 'lucide-react';
 import axios from 'axios';
 import ReactMarkdown from 'react-markdown';
+import { useAuth } from '../contexts/AuthContext';
+import CamOverlay from '../components/Explainability/CamOverlay';
+import { RawCam } from '../types';
 
 // --- 1. INTERFACES ---
 interface FlaggedCondition {
@@ -29,13 +32,16 @@ interface AnalysisResponse {
   patient_status: string;
   flagged_conditions: FlaggedCondition[];
   medical_validation: MedicalValidation;
-  heatmaps: Record<string, string>;
+  // Data URLs (heatmap_mode=overlay) or raw Grad-CAM grids (heatmap_mode=raw)
+  heatmaps: Record<string, string | RawCam>;
   report_text: string;
+  study_id?: string;
 }
 
 type AnalysisMode = 'chest' | 'bone';
 
 export default function Upload() {
+  const { user } = useAuth();
   const [uploadedFile, setUploadedFile] = useState<File | null>(null);
   const [previewUrl, setPreviewUrl] = useState<string | null>(null);
   const [isAnalyzing, setIsAnalyzing] = useState(false);
@@ -90,11 +96,16 @@ export default function Upload() {
     
     const formData = new FormData();
     formData.append('file', uploadedFile);
+    // Stored studies are indexed by patient so the portals can list them later
+    if (user?.role === 'patient') formData.append('patient_id', user.id);
 
     try {
       const endpoint = `http://127.0.0.1:8000/${analysisMode}/predict`;
       const response = await axios.post(endpoint, formData, {
         headers: { 'Content-Type': 'multipart/form-data' },
+        // Images the browser can show get raw CAM grids, overlaid on the preview here;
+        // DICOM has no browser preview, so the server renders those overlays
+        params: { heatmap_mode: uploadedFile.type.startsWith('image/') ? 'raw' : 'overlay' },
       });
       setAnalysis(response.data);
     } catch (err) {
@@ -225,10 +236,14 @@ export default function Upload() {
                   <div className="pt-8 border-t border-gray-100">
                     <h3 className="text-lg font-bold text-gray-900 mb-6">Pathology Heatmaps</h3>
                     <div className="grid grid-cols-1 sm:grid-cols-2 gap-6">
-                      {Object.entries(analysis.heatmaps).map(([name, b64], idx) => (
+                      {Object.entries(analysis.heatmaps).map(([name, heatmap], idx) => (
                         <div key={idx} className="bg-gray-50 p-4 rounded-xl border">
                           <span className="block text-center text-xs font-black text-gray-500 mb-3 uppercase tracking-widest">{name}</span>
-                          <img src={b64} alt={name} className="w-full rounded-lg shadow-sm bg-black" />
+                          {typeof heatmap === 'string' ? (
+                            <img src={heatmap} alt={name} className="w-full rounded-lg shadow-sm bg-black" />
+                          ) : (
+                            <CamOverlay cam={heatmap} imageUrl={previewUrl!} className="w-full rounded-lg shadow-sm bg-black" />
+                          )}
                         </div>
                       ))}
                     </div>
@@ -32,4 +32,20 @@ export interface XRayAnalysis {
   processingTime: number;
   findings: Finding[];
   report: Report;
-}
\ No newline at end of file
+}
+// Raw Grad-CAM grid returned by /{modality}/predict?heatmap_mode=raw
+export interface RawCam {
+  shape: [number, number];
+  dtype: 'uint8' | 'float16';
+  data: string; // base64, row-major, little-endian
+}
+
+// Study summary returned by GET /studies
+export interface StudySummary {
+  id: string;
+  patient_id: string | null;
+  modality: string;
+  created_at: number;
+  patient_status: string;
+  flagged_conditions: { condition: string; probability: number }[];
+}
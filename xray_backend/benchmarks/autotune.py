@@ -0,0 +1,153 @@
+"""
+Sweeps the runtime thread layout (utils/runtime.py) with the load test and
+reports the best throughput and tail-latency settings.
+
+    python -m benchmarks.autotune --workers 1,2,4 --requests 80 --concurrency 16
+    python -m benchmarks.autotune --intra-op 4,8,16 --inter-op 1,2 --cv2-threads 1,2 \\
+        --endpoint classify --files-per-request 8 --output autotune.json
+
+Each trial runs the load test in fresh processes (TensorFlow fixes its pool
+sizes once per process): one process per simulated worker, each pinned to its
+share of the CPUs and given concurrency / workers of the client load, all
+started together. Throughput is summed over the workers and latency is the
+worst worker's percentile. Unset thread lists are derived from the
+per-worker core count, as the server itself would. Extra arguments after
+"--" go to benchmarks.load_test unchanged.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import subprocess
+import tempfile
+
+from utils.runtime import available_cpus
+from benchmarks.load_test import git_commit
+
+
+def int_list(spec: str) -> list:
+    return [int(v) for v in spec.split(",") if v.strip()]
+
+
+def candidates(cores: int, intra, inter, cv2_threads) -> list:
+    """(intra, inter, cv2) combinations for a worker with `cores` CPUs."""
+    intra = intra or sorted({cores, max(1, cores // 2)})
+    inter = inter or sorted({1, min(2, cores)})
+    cv2_threads = cv2_threads or sorted({1, max(1, cores // 4)})
+    return list(itertools.product(intra, inter, cv2_threads))
+
+
+def run_trial(workers, intra, inter, cv2_threads, cpus, args, extra) -> dict:
+    """Runs one layout and merges the per-worker load test reports."""
+    per_worker = max(1, len(cpus) // workers)
+    procs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for w in range(workers):
+            slice_ = cpus[w * per_worker:(w + 1) * per_worker]
+            env = {
+                **os.environ,
+                "WEB_WORKERS": "1",
+                "TF_INTRA_OP_THREADS": str(intra),
+                "TF_INTER_OP_THREADS": str(inter),
+                "CV2_THREADS": str(cv2_threads),
+                "RENDER_THREADS": str(min(4, per_worker)),
+                "CPU_AFFINITY": ",".join(map(str, slice_)),
+                "OMP_NUM_THREADS": str(intra),
+            }
+            output = os.path.join(tmp, f"worker{w}.json")
+            cmd = [sys.executable, "-m", "benchmarks.load_test",
+                   "--requests", str(max(1, args.requests // workers)),
+                   "--concurrency", str(max(1, args.concurrency // workers)),
+                   "--endpoint", args.endpoint, "--files-per-request", str(args.files_per_request),
+                   "--image-size", str(args.image_size), "--output", output, *extra]
+            procs.append((subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE), output))
+
+        reports, failures = [], []
+        for proc, output in procs:
+            _, stderr = proc.communicate()
+            if proc.returncode != 0 or not os.path.exists(output):
+                failures.append(stderr.decode(errors="replace").strip().splitlines()[-1:] or ["no output"])
+                continue
+            with open(output) as f:
+                reports.append(json.load(f))
+
+    trial = {"workers": workers, "intra_op_threads": intra, "inter_op_threads": inter, "cv2_threads": cv2_threads}
+    if failures or not reports:
+        return {**trial, "error": failures}
+    latency = [m["latency_ms"] for r in reports for m in r["modalities"].values() if m["latency_ms"].get("count")]
+    return {
+        **trial,
+        "throughput_rps": round(sum(r["throughput_rps"] for r in reports), 3),
+        "images_per_min": round(sum(r["images_per_min"] for r in reports), 1),
+        "errors": sum(r["errors"] for r in reports),
+        "p50_ms": max((l["p50"] for l in latency), default=None),
+        "p95_ms": max((l["p95"] for l in latency), default=None),
+        "p99_ms": max((l["p99"] for l in latency), default=None),
+    }
+
+
+def env_line(trial: dict) -> str:
+    return (f"WEB_WORKERS={trial['workers']} TF_INTRA_OP_THREADS={trial['intra_op_threads']} "
+            f"TF_INTER_OP_THREADS={trial['inter_op_threads']} CV2_THREADS={trial['cv2_threads']}")
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    extra = []
+    if "--" in argv:
+        extra = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int_list, default=[1, 2])
+    parser.add_argument("--intra-op", type=int_list, default=None, help="TF intra-op thread counts (default: derived)")
+    parser.add_argument("--inter-op", type=int_list, default=None, help="TF inter-op thread counts (default: derived)")
+    parser.add_argument("--cv2-threads", type=int_list, default=None, help="OpenCV thread counts (default: derived)")
+    parser.add_argument("--requests", type=int, default=80, help="Total requests per trial, split across workers")
+    parser.add_argument("--concurrency", type=int, default=16, help="Total client concurrency, split across workers")
+    parser.add_argument("--endpoint", choices=("predict", "classify"), default="predict")
+    parser.add_argument("--files-per-request", type=int, default=1)
+    parser.add_argument("--image-size", type=int, default=1024)
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    cpus = available_cpus()
+    trials = []
+    for workers in sorted(set(args.workers)):
+        if workers > len(cpus):
+            print(f"⚠️ Skipping {workers} workers: only {len(cpus)} CPUs available.")
+            continue
+        for intra, inter, cv2_threads in candidates(len(cpus) // workers, args.intra_op, args.inter_op, args.cv2_threads):
+            started = time.perf_counter()
+            trial = run_trial(workers, intra, inter, cv2_threads, cpus, args, extra)
+            trial["wall_s"] = round(time.perf_counter() - started, 1)
+            trials.append(trial)
+            if "error" in trial:
+                print(f"❌ {env_line(trial)}: {trial['error']}")
+            else:
+                print(f"⏱️  {env_line(trial)}: {trial['throughput_rps']} req/s, "
+                      f"p95 {trial['p95_ms']} ms, p99 {trial['p99_ms']} ms, {trial['errors']} errors")
+
+    ok = [t for t in trials if "error" not in t and not t["errors"]]
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "cpus": len(cpus),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "trials": trials,
+        "best_throughput": max(ok, key=lambda t: t["throughput_rps"], default=None),
+        "best_p95": min(ok, key=lambda t: t["p95_ms"], default=None),
+    }
+    if report["best_throughput"]:
+        print(f"✅ Best throughput: {env_line(report['best_throughput'])}")
+        print(f"✅ Best p95 latency: {env_line(report['best_p95'])}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Local stand-ins for the external backends and model weights, so the API can
+be benchmarked on any machine:
+
+- fake Ollama chat and Hugging Face feature extraction with configurable latency
+- a tiny randomly initialized vision model exposing the same
+  conv5_block16_concat layer that Grad-CAM hooks into
+"""
+import io
+import time
+import random
+import asyncio
+import zlib
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+from modalities.base import MODALITIES, Release
+from modalities import pipeline
+from utils import clients
+
+BIOBERT_TOKENS = 12
+
+
+class LatencyModel:
+    """Mean latency in milliseconds with uniform +/- jitter."""
+
+    def __init__(self, mean_ms=0.0, jitter_ms=0.0, seed=0):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+
+    def delay_s(self) -> float:
+        return max(0.0, self.mean_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+
+    def sleep(self):
+        time.sleep(self.delay_s())
+
+
+class FakeOllamaClient:
+    """Async stand-in for ollama.AsyncClient; waits without blocking the loop like the real HTTP call."""
+
+    def __init__(self, latency: LatencyModel):
+        self.latency = latency
+
+    async def chat(self, model=None, messages=None, **kwargs):
+        await asyncio.sleep(self.latency.delay_s())
+        return {"message": {"role": "assistant", "content": f"[FINDINGS]\nSynthetic report from {model}.\n[IMPRESSION]\nBenchmark."}}
+
+
+def fake_feature_extraction(latency: LatencyModel, dim=pipeline.BIOBERT_DIM):
+    # Synchronous like InferenceClient.feature_extraction; clients runs it in a thread
+    def features(text):
+        # Deterministic per text so cache behaviour matches the real backend
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        return rng.standard_normal((BIOBERT_TOKENS, dim)).astype(np.float32)
+
+    def feature_extraction(text, model=None, **kwargs):
+        latency.sleep()
+        # A list of texts is one request with one (tokens, dim) array per text
+        if isinstance(text, list):
+            return np.stack([features(t) for t in text])
+        return features(text)[np.newaxis]
+    return feature_extraction
+
+
+def install_fake_backends(ollama_ms=0.0, embedding_ms=0.0, jitter_ms=0.0):
+    """
+    Swaps the shared clients for fakes in-process. Calls still go through
+    utils.clients' timeouts, concurrency limits and circuit breakers.
+    """
+    fake_ollama = FakeOllamaClient(LatencyModel(ollama_ms, jitter_ms, seed=1))
+    clients.get_ollama_client = lambda: fake_ollama
+    clients.embedding_client.feature_extraction = fake_feature_extraction(LatencyModel(embedding_ms, jitter_ms, seed=2))
+
+
+def build_tiny_model(num_classes, conv_layer="conv5_block16_concat", input_shape=(224, 224, 3), seed=0):
+    """
+    A few-kilobyte stand-in for DenseNet121: strided convs down to the same 7x7
+    grid, a Concatenate named like DenseNet's last block, then pooled sigmoid heads.
+    """
+    tf.keras.utils.set_random_seed(seed)
+    inputs = tf.keras.Input(shape=input_shape)
+    x = tf.keras.layers.Conv2D(8, 3, strides=4, padding="same", activation="relu")(inputs)
+    x = tf.keras.layers.Conv2D(16, 3, strides=8, padding="same", activation="relu")(x)
+    branch = tf.keras.layers.Conv2D(16, 1, padding="same", activation="relu")(x)
+    x = tf.keras.layers.Concatenate(name=conv_layer)([x, branch])
+    x = tf.keras.layers.GlobalAveragePooling2D(name="avg_pool")(x)
+    # Bias the heads towards the ~0.2-0.3 threshold band so a realistic handful of classes flag
+    outputs = tf.keras.layers.Dense(
+        num_classes, activation="sigmoid", name="predictions",
+        bias_initializer=tf.keras.initializers.RandomUniform(-1.6, -0.8, seed=seed)
+    )(x)
+    return tf.keras.Model(inputs, outputs, name="tiny_densenet")
+
+
+def install_tiny_models(seed=0, shared_backbone=False):
+    """
+    Replaces every registered modality's model with a tiny random one. With
+    shared_backbone=True all models get identical feature extractors and
+    differ only in their heads, as when fine-tuning on a frozen backbone.
+    """
+    for offset, modality in enumerate(MODALITIES.values()):
+        thresholds, thresholds_version = modality.load_thresholds()
+        model_seed = seed if shared_backbone else seed + offset
+        model = build_tiny_model(len(modality.classes), modality.conv_layer, seed=model_seed)
+        modality.swap(Release(model, thresholds, f"tiny-{model_seed}", thresholds_version))
+
+
+def synthetic_xray(width=1024, height=1024, fmt="PNG", mode="L", seed=0) -> bytes:
+    """Encodes a noisy radiograph-like image for upload payloads."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    base = 128 + 60 * np.sin(xx / 37.0) * np.cos(yy / 53.0)
+    pixels = np.clip(base + rng.normal(0, 20, (height, width)), 0, 255).astype(np.uint8)
+    if mode == "I;16":
+        # 16-bit grayscale, as exported by most DICOM-to-PNG converters
+        img = Image.fromarray(pixels.astype(np.uint16) * 257)
+    else:
+        img = Image.fromarray(pixels)
+        if mode != "L":
+            img = img.convert(mode)
+    buffer = io.BytesIO()
+    img.save(buffer, fmt)
+    return buffer.getvalue()
@@ -0,0 +1,232 @@
+"""
+Concurrent end-to-end load test against main6.app, run in-process over ASGI.
+
+    python -m benchmarks.load_test --requests 200 --concurrency 16 \\
+        --ollama-ms 800 --embedding-ms 60 --output results.json
+    python -m benchmarks.load_test --endpoint classify --files-per-request 8 \\
+        --requests 500 --concurrency 32
+
+By default the real models are swapped for tiny random ones and Ollama /
+Hugging Face are replaced by local fakes (see benchmarks/fakes.py), so the
+numbers measure the server's own overhead. Pass --real-models to keep the
+weights under models/ and --real-backends to call the live services.
+
+Every request asks for the debug timing breakdown, so the report contains
+throughput and p50/p95/p99 per modality for the client-observed latency and
+for every server-side stage. The JSON output is stamped with the git commit
+and can be diffed against a previous run with --compare.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+import numpy as np
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+os.environ.setdefault("TRACE_LOG", "0")
+
+PERCENTILES = (50, 95, 99)
+
+
+def summarize(samples) -> dict:
+    values = np.asarray(samples, dtype=np.float64)
+    if values.size == 0:
+        return {"count": 0}
+    summary = {"count": int(values.size), "mean": round(float(values.mean()), 3)}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = round(float(np.percentile(values, p)), 3)
+    summary["max"] = round(float(values.max()), 3)
+    return summary
+
+
+def stage_samples(timings: dict) -> dict:
+    """Collapses a response's timings object into {stage: ms} (per-class maps are summed)."""
+    samples = {}
+    for field, value in timings.items():
+        if not field.endswith("_ms"):
+            continue
+        stage = field[:-3]
+        samples[stage] = sum(value.values()) if isinstance(value, dict) else value
+    return samples
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+async def run_load(app, modalities, payloads, total_requests, concurrency, warmup,
+                   endpoint="predict", files_per_request=1):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    records = []
+    queue = asyncio.Queue()
+    for i in range(total_requests):
+        queue.put_nowait(i)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i, record=True):
+            modality = modalities[i % len(modalities)]
+            payload = payloads[i % len(payloads)]
+            start = time.perf_counter()
+            if endpoint == "classify":
+                files = [("files", (f"study{j}.png", payloads[(i + j) % len(payloads)], "image/png"))
+                         for j in range(files_per_request)]
+            else:
+                files = {"file": ("study.png", payload, "image/png")}
+            response = await client.post(f"/{modality}/{endpoint}", params={"debug": "1"}, files=files)
+            latency_ms = (time.perf_counter() - start) * 1000.0
+            if not record:
+                return
+            body = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+            records.append({
+                "modality": modality,
+                "status": response.status_code,
+                "latency_ms": latency_ms,
+                "stages": stage_samples(body.get("timings", {})),
+                "images": files_per_request if endpoint == "classify" else 1,
+                "flagged": len(body.get("heatmaps", {}) or {}),
+            })
+
+        for i in range(warmup):
+            await one(i, record=False)
+
+        async def worker():
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await one(i)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return records, elapsed
+
+
+def build_report(records, elapsed, config) -> dict:
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": config,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(records) / elapsed, 3) if elapsed else 0.0,
+        "images_per_min": round(60.0 * sum(r["images"] for r in records) / elapsed, 1) if elapsed else 0.0,
+        "errors": sum(1 for r in records if r["status"] != 200),
+        "modalities": {},
+    }
+    for modality in sorted({r["modality"] for r in records}):
+        rows = [r for r in records if r["modality"] == modality]
+        ok = [r for r in rows if r["status"] == 200]
+        stages = {}
+        for r in ok:
+            for stage, ms in r["stages"].items():
+                stages.setdefault(stage, []).append(ms)
+        report["modalities"][modality] = {
+            "requests": len(rows),
+            "errors": len(rows) - len(ok),
+            "throughput_rps": round(len(rows) / elapsed, 3) if elapsed else 0.0,
+            "mean_flagged": round(float(np.mean([r["flagged"] for r in ok])), 2) if ok else 0.0,
+            "latency_ms": summarize([r["latency_ms"] for r in ok]),
+            "stages_ms": {stage: summarize(values) for stage, values in sorted(stages.items())},
+        }
+    return report
+
+
+def compare(current: dict, baseline: dict) -> list:
+    """Lines describing p50/p95 changes per modality and stage relative to a baseline run."""
+    lines = [f"baseline {baseline.get('commit')} -> current {current.get('commit')}",
+             f"throughput: {baseline.get('throughput_rps')} -> {current.get('throughput_rps')} req/s"]
+    for modality, stats in current["modalities"].items():
+        base = baseline.get("modalities", {}).get(modality)
+        if not base:
+            continue
+        rows = [("latency", stats["latency_ms"], base["latency_ms"])]
+        rows += [(s, v, base["stages_ms"].get(s, {})) for s, v in stats["stages_ms"].items()]
+        for name, now, before in rows:
+            for p in ("p50", "p95"):
+                if p in now and p in before and before[p]:
+                    delta = 100.0 * (now[p] - before[p]) / before[p]
+                    lines.append(f"{modality:>6} {name:<12} {p}: {before[p]:>10.2f} -> {now[p]:>10.2f} ms ({delta:+.1f}%)")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=4)
+    parser.add_argument("--modalities", default="chest,bone")
+    parser.add_argument("--endpoint", choices=("predict", "classify"), default="predict")
+    parser.add_argument("--files-per-request", type=int, default=1, help="Uploads per /classify request")
+    parser.add_argument("--image-size", type=int, default=1024, help="Edge length of the synthetic uploads")
+    parser.add_argument("--images", type=int, default=4, help="Distinct synthetic images to cycle through")
+    parser.add_argument("--coalesce", action="store_true",
+                        help="Let concurrent identical uploads share one computation (off: every request runs the pipeline)")
+    parser.add_argument("--ollama-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--real-models", action="store_true")
+    parser.add_argument("--real-backends", action="store_true")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON report to diff against")
+    args = parser.parse_args(argv)
+
+    import main6
+    from utils.runtime import RUNTIME
+    from modalities.base import MODALITIES
+    from modalities.pipeline import build_knowledge_vectors
+    from utils.coalescing import INFLIGHT
+    from benchmarks import fakes
+
+    if not args.real_backends:
+        fakes.install_fake_backends(args.ollama_ms, args.embedding_ms, args.jitter_ms)
+    if not args.real_models:
+        fakes.install_tiny_models()
+
+    modalities = [m.strip() for m in args.modalities.split(",") if m.strip()]
+    for name in modalities:
+        if name not in MODALITIES:
+            parser.error(f"Unknown modality '{name}'. Registered: {sorted(MODALITIES)}")
+        # ASGITransport does not run startup hooks
+        asyncio.run(build_knowledge_vectors(MODALITIES[name]))
+
+    # The payloads repeat, so coalescing would otherwise turn most requests into followers
+    INFLIGHT.enabled = args.coalesce
+    payloads = [fakes.synthetic_xray(args.image_size, args.image_size, seed=i) for i in range(args.images)]
+    records, elapsed = asyncio.run(run_load(
+        main6.app, modalities, payloads, args.requests, args.concurrency, args.warmup,
+        args.endpoint, args.files_per_request
+    ))
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    report = build_report(records, elapsed, config)
+    report["runtime"] = RUNTIME.describe()
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+        print(f"✅ Wrote {args.output}: {report['throughput_rps']} req/s "
+              f"({report['images_per_min']} images/min), {report['errors']} errors")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        print("\n".join(compare(report, baseline)), file=sys.stderr)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Focused micro-benchmarks for the hot helpers of the predict pipeline.
+
+    python -m benchmarks.micro --output micro.json
+    python -m benchmarks.micro --only gradcam --repeats 20
+
+Suites:
+  preprocess  utils.visualizer.preprocess_image across resolutions and formats
+  gradcam     Grad-CAM heatmaps for 1, 3 and 8 flagged classes, per class and combined
+  knowledge   get_biobert_validation against file-backed knowledge bases of 6, 1k
+              and 100k entries (end to end and top-k search alone; IVF at 100k)
+  similar     similar-case search over 10k and 200k stored 1024-d feature vectors,
+              brute force and IVF
+  tta         one forward pass vs test-time augmentation (7 views) batched and
+              one view at a time
+
+Each case reports wall time (mean/p50/p95 in ms), peak traced memory
+(NumPy and Python allocations via tracemalloc) and, on Linux, the peak RSS
+growth above the pre-call baseline, which also covers PIL, OpenCV and
+TensorFlow buffers. Grad-CAM and TTA run on the tiny stand-in model unless
+--real-models is given.
+"""
+import os
+import sys
+import json
+import asyncio
+import time
+import argparse
+import tracemalloc
+from contextlib import redirect_stdout
+import numpy as np
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+os.environ.setdefault("METRICS_ENABLED", "0")
+
+from benchmarks.load_test import summarize, git_commit
+
+RESOLUTIONS = (512, 1024, 2048, 4096)
+FORMATS = (("PNG", "L"), ("PNG", "RGB"), ("JPEG", "L"), ("PNG", "I;16"))
+FLAGGED_COUNTS = (1, 3, 8)
+KNOWLEDGE_SIZES = (6, 1_000, 100_000)
+SIMILAR_SIZES = (10_000, 200_000)
+FEATURE_DIM = 1024
+
+
+def _proc_status_kb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """Resets VmHWM to the current RSS (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def measure(fn, repeats, warmup=1) -> dict:
+    for _ in range(warmup):
+        fn()
+    times = []
+    traced_peak = 0
+    rss_peak_kb = None
+    tracemalloc.start()
+    for _ in range(repeats):
+        tracemalloc.reset_peak()
+        rss_before = _proc_status_kb("VmRSS") if _reset_peak_rss() else None
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000.0)
+        traced_peak = max(traced_peak, tracemalloc.get_traced_memory()[1])
+        if rss_before is not None:
+            rss_peak_kb = max(rss_peak_kb or 0, _proc_status_kb("VmHWM") - rss_before)
+    tracemalloc.stop()
+    return {
+        "time_ms": summarize(times),
+        "peak_traced_mb": round(traced_peak / (1024 * 1024), 3),
+        "peak_rss_delta_mb": round(rss_peak_kb / 1024, 3) if rss_peak_kb is not None else None,
+    }
+
+
+def bench_preprocess(repeats) -> list:
+    from utils.visualizer import preprocess_image
+    from benchmarks.fakes import synthetic_xray
+    results = []
+    for size in RESOLUTIONS:
+        for fmt, mode in FORMATS:
+            payload = synthetic_xray(size, size, fmt=fmt, mode=mode)
+            case = measure(lambda: preprocess_image(payload), repeats)
+            results.append({"case": f"{fmt}/{mode}/{size}px", "bytes": len(payload), **case})
+    return results
+
+
+def bench_gradcam(repeats, real_models=False) -> list:
+    from modalities.chest import CHEST
+    from modalities.pipeline import generate_heatmaps
+    from utils.visualizer import preprocess_image
+    from benchmarks import fakes
+
+    if not real_models:
+        fakes.install_tiny_models()
+    elif CHEST.model is None:
+        CHEST.load()
+
+    img_array, original_image = preprocess_image(fakes.synthetic_xray(1024, 1024))
+    results = []
+    for count in FLAGGED_COUNTS:
+        indices = list(range(min(count, len(CHEST.classes))))
+        case = measure(lambda: generate_heatmaps(CHEST, img_array, original_image, indices), repeats)
+        results.append({"case": f"{count} classes", **case})
+        if count > 1:
+            case = measure(lambda: generate_heatmaps(CHEST, img_array, original_image, indices, combined=True), repeats)
+            results.append({"case": f"{count} classes combined", **case})
+    return results
+
+
+def bench_knowledge(repeats) -> list:
+    import tempfile
+    from modalities.chest import CHEST
+    from modalities import pipeline
+    from utils.knowledge import KnowledgeBase
+    from benchmarks import fakes
+
+    fakes.install_fake_backends()
+    rng = np.random.default_rng(0)
+
+    async def embed(text):
+        return rng.standard_normal(pipeline.BIOBERT_DIM).astype(np.float32)
+
+    saved = CHEST.knowledge
+    results = []
+    try:
+        for size in KNOWLEDGE_SIZES:
+            with tempfile.TemporaryDirectory() as directory:
+                entries = [{"category": f"category-{i % 50}", "text": f"entry {i}"} for i in range(size)]
+                CHEST.knowledge = KnowledgeBase(CHEST.name, entries, directory)
+                asyncio.run(CHEST.knowledge.build(embed, "bench"))
+                query = "Cardiomegaly, Effusion"
+                # Warm the query-embedding cache and resident rows so only matching is measured
+                validate = lambda: asyncio.run(pipeline.get_biobert_validation(CHEST, query))
+                validate()
+                case = measure(validate, repeats)
+                results.append({"case": f"{size} entries", **case})
+                query_vec = rng.standard_normal(pipeline.BIOBERT_DIM).astype(np.float32)
+                case = measure(lambda: CHEST.knowledge.search(query_vec), repeats)
+                results.append({"case": f"{size} entries top-k search", **case})
+    finally:
+        CHEST.knowledge = saved
+    return results
+
+
+def bench_similar(repeats) -> list:
+    import tempfile
+    from utils.vector_index import VectorIndex
+
+    rng = np.random.default_rng(0)
+    results = []
+    for size in SIMILAR_SIZES:
+        with tempfile.TemporaryDirectory() as directory:
+            index = VectorIndex(directory, auto_train=False)
+            # Clustered like real studies: many near-duplicates of a few hundred looks
+            centers = rng.standard_normal((256, FEATURE_DIM)).astype(np.float32)
+            for start in range(0, size, 10_000):
+                n = min(10_000, size - start)
+                rows = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, FEATURE_DIM), dtype=np.float32)
+                index.add([f"s{start + i}" for i in range(n)], rows)
+            query = centers[0] + 0.5 * rng.standard_normal(FEATURE_DIM, dtype=np.float32)
+
+            case = measure(lambda: index.search(query, 10), repeats)
+            results.append({"case": f"{size} vectors brute force", **case})
+            index.train()
+            case = measure(lambda: index.search(query, 10), repeats)
+            results.append({"case": f"{size} vectors IVF", **case})
+    return results
+
+
+def bench_tta(repeats, real_models=False) -> list:
+    from modalities.chest import CHEST
+    from utils.visualizer import preprocess_image
+    from utils.tta import augment, averaged
+    from benchmarks import fakes
+
+    if not real_models:
+        fakes.install_tiny_models()
+    elif CHEST.model is None:
+        CHEST.load()
+
+    model = CHEST.model
+    img_array, _ = preprocess_image(fakes.synthetic_xray(1024, 1024))
+    preds = model(img_array, training=False).numpy()
+    views = augment(img_array)
+
+    def sequential():
+        outputs = [preds] + [model(views[i:i + 1], training=False).numpy() for i in range(len(views))]
+        return np.mean(outputs, axis=0)
+
+    results = []
+    for name, fn in (("single view", lambda: model(img_array, training=False).numpy()),
+                     (f"{len(views) + 1} views batched", lambda: averaged(model, img_array, preds)),
+                     (f"{len(views) + 1} views sequential", sequential)):
+        fn()
+        results.append({"case": name, **measure(fn, repeats)})
+    return results
+
+
+SUITES = {
+    "preprocess": lambda args: bench_preprocess(args.repeats),
+    "gradcam": lambda args: bench_gradcam(args.repeats, args.real_models),
+    "knowledge": lambda args: bench_knowledge(args.repeats),
+    "similar": lambda args: bench_similar(args.repeats),
+    "tta": lambda args: bench_tta(args.repeats, args.real_models),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", choices=sorted(SUITES), action="append", help="Run only these suites")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--real-models", action="store_true")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+              "repeats": args.repeats, "suites": {}}
+    # Progress, and whatever the app prints while loading, go to stderr: stdout carries only the report
+    with redirect_stdout(sys.stderr):
+        for name in args.only or SUITES:
+            print(f"⏱️  Running {name} micro-benchmarks...")
+            report["suites"][name] = SUITES[name](args)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+        print(f"✅ Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,23 @@
 import os
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import chest, bone # Import your routers
+
+# Thread pools must be sized before the routers load the models
+from utils.runtime import RUNTIME
+RUNTIME.apply()
+
+from routers import chest, bone, analyze, studies, analytics, admin, metrics # Import your routers
+from utils.uploads import enforce_upload_limit
+from utils.serialization import FastJSONResponse
+from utils.clients import close_clients
+from utils.analytics import ANALYTICS
+from modalities.reload import WATCHER
+from modalities.shadow import SHADOW
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2' 
 
-app = FastAPI(title="X-Insight API")
+app = FastAPI(title="X-Insight API", default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,10 +27,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads before the multipart body is spooled
+app.middleware("http")(enforce_upload_limit)
+
 # Connect the endpoints from your router files
 app.include_router(chest.router)
 app.include_router(bone.router)
+app.include_router(analyze.router)
+app.include_router(studies.router)
+app.include_router(analytics.router)
+app.include_router(admin.router)
+app.include_router(metrics.router)
+
+@app.on_event("startup")
+async def startup_event():
+    ANALYTICS.start()
+    WATCHER.start()
+    await asyncio.to_thread(SHADOW.load_from_env)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    WATCHER.stop()
+    await close_clients()
+    ANALYTICS.stop()
 
 @app.get("/")
 def root():
-    return {"message": "X-Insight Multi-Diagnostic Engine is operational."}
\ No newline at end of file
+    return {"message": "X-Insight Multi-Diagnostic Engine is operational."}
+
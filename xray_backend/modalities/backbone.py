@@ -0,0 +1,119 @@
+import hashlib
+import weakref
+import numpy as np
+import tensorflow as tf
+
+# Models are split at the pooled feature layer; layers after it form the head
+FEATURE_LAYER = "avg_pool"
+
+# model -> BackboneSplit, or None when the model cannot be split
+_splits = weakref.WeakKeyDictionary()
+# model -> model emitting (pooled features, predictions), or None
+_feature_models = weakref.WeakKeyDictionary()
+
+
+class BackboneSplit:
+    """A vision model cut into a feature extractor and a classification head."""
+
+    def __init__(self, backbone, head, fingerprint: str):
+        self.backbone = backbone
+        self.head = head
+        self.fingerprint = fingerprint
+
+
+def _fingerprint(model) -> str:
+    """Hash of the architecture and weights, so two models with the same frozen backbone match."""
+    digest = hashlib.sha1()
+    for weight in model.weights:
+        digest.update(weight.name.encode("utf-8"))
+        digest.update(str(tuple(weight.shape)).encode("utf-8"))
+        digest.update(np.ascontiguousarray(weight.numpy()).tobytes())
+    return digest.hexdigest()
+
+
+def _split(model, feature_layer: str):
+    layer = model.get_layer(feature_layer)
+    backbone = tf.keras.Model(model.inputs, layer.output, name=f"{model.name}_backbone")
+
+    # Rebuild the head by re-applying the layers after the feature layer
+    names = [l.name for l in model.layers]
+    features = tf.keras.Input(shape=layer.output.shape[1:])
+    x = features
+    for head_layer in model.layers[names.index(feature_layer) + 1:]:
+        x = head_layer(x)
+    head = tf.keras.Model(features, x, name=f"{model.name}_head")
+
+    # Only trust the split if it reproduces the full model on a probe input
+    probe = np.random.default_rng(0).random((1, *model.inputs[0].shape[1:]), dtype=np.float32)
+    expected = model(probe, training=False).numpy()
+    actual = head(backbone(probe, training=False), training=False).numpy()
+    if expected.shape != actual.shape or not np.allclose(expected, actual, atol=1e-5):
+        raise ValueError("head is not a linear chain after the feature layer")
+    return BackboneSplit(backbone, head, _fingerprint(backbone))
+
+
+def get_split(model, feature_layer=FEATURE_LAYER):
+    """The cached BackboneSplit for a model, or None if it has no separable head."""
+    if model in _splits:
+        return _splits[model]
+    try:
+        split = _split(model, feature_layer)
+    except Exception as e:
+        print(f"⚠️ Backbone sharing disabled for {model.name}: {e}")
+        split = None
+    _splits[model] = split
+    return split
+
+
+def get_feature_model(model, feature_layer=FEATURE_LAYER):
+    """
+    The cached (pooled features, predictions) view of a model: the same single
+    forward pass, also exposing the penultimate features. None if the model
+    has no such layer.
+    """
+    if model in _feature_models:
+        return _feature_models[model]
+    try:
+        feature_model = tf.keras.Model(model.inputs, [model.get_layer(feature_layer).output, model.output])
+    except Exception as e:
+        print(f"⚠️ Pooled features unavailable for {model.name}: {e}")
+        feature_model = None
+    _feature_models[model] = feature_model
+    return feature_model
+
+
+def vision_with_features(model, img_array):
+    """(predictions, pooled features or None) from one forward pass."""
+    feature_model = get_feature_model(model)
+    if feature_model is None:
+        return model(img_array, training=False).numpy(), None
+    features, preds = feature_model(img_array, training=False)
+    return preds.numpy(), features.numpy()
+
+
+def shared_vision(models: dict, img_array) -> tuple:
+    """
+    Probability matrices and pooled features for several models ({name:
+    model}) on the same input. Models whose backbones have identical
+    fingerprints compute features once and only run their own heads; the
+    rest run their full model. Returns ({name: preds}, {name: features},
+    [names that shared a backbone pass]).
+    """
+    groups = {}
+    for name, model in models.items():
+        split = get_split(model)
+        key = split.fingerprint if split is not None else name
+        groups.setdefault(key, []).append((name, model, split))
+
+    preds, features, shared = {}, {}, []
+    for members in groups.values():
+        if len(members) == 1:
+            name, model, _ = members[0]
+            preds[name], features[name] = vision_with_features(model, img_array)
+            continue
+        pooled = members[0][2].backbone(img_array, training=False)
+        for name, _, split in members:
+            preds[name] = split.head(pooled, training=False).numpy()
+            features[name] = pooled.numpy()
+            shared.append(name)
+    return preds, features, shared
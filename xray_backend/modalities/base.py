@@ -0,0 +1,198 @@
+import json
+import hashlib
+import numpy as np
+import tensorflow as tf
+import tensorflow.keras.backend as K
+
+from utils.postprocess import compile_thresholds
+from utils.explain import ExplainPolicy
+from utils.knowledge import load_entries
+from utils.visualizer import get_grad_model
+from modalities.backbone import vision_with_features
+
+# name -> Modality, filled by register() as modality modules are imported
+MODALITIES = {}
+
+
+# --- CUSTOM LOSS (needed to deserialize the trained models) ---
+def binary_focal_loss(gamma=2.0, alpha=0.25):
+    def focal_loss_fixed(y_true, y_pred):
+        y_pred = K.clip(y_pred, K.epsilon(), 1.0 - K.epsilon())
+        y_true = tf.cast(y_true, tf.float32)
+        cross_entropy = -y_true * K.log(y_pred) - (1 - y_true) * K.log(1 - y_pred)
+        p_t = y_true * y_pred + (1 - y_true) * (1 - y_pred)
+        alpha_factor = y_true * alpha + (1 - y_true) * (1 - alpha)
+        modulating_factor = K.pow((1.0 - p_t), gamma)
+        loss = alpha_factor * modulating_factor * cross_entropy
+        return K.mean(loss, axis=-1)
+    return focal_loss_fixed
+
+
+def content_version(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()[:12]
+
+
+def file_version(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+class Release:
+    """
+    A vision model and its compiled thresholds, swapped in as one object so a
+    request never mixes versions. The versions are content hashes of the
+    artifacts and are reported with every prediction for cache keying.
+    """
+
+    def __init__(self, model, thresholds, model_version: str, thresholds_version: str):
+        self.model = model
+        self.thresholds = thresholds
+        self.model_version = model_version
+        self.thresholds_version = thresholds_version
+        # Micro-batcher bound to this model (created on first triage request)
+        self.batcher = None
+
+    def describe(self) -> dict:
+        return {"model_version": self.model_version, "thresholds_version": self.thresholds_version}
+
+
+class Modality:
+    """
+    Everything the shared pipeline needs to serve one imaging modality:
+    output classes and thresholds, the vision model, the knowledge base used
+    for BioBERT validation and the Ollama prompt template.
+
+    report_messages is a list of {"role", "content"} dicts whose content is
+    formatted with {diseases_text} and {bio_category}. query_template is
+    formatted with {findings} to build the BioBERT query sentence.
+    The model and thresholds live in `release` and can be replaced at runtime
+    (see modalities.reload). explain_policy picks which flagged classes get
+    Grad-CAM heatmaps
+    (every flagged class by default). knowledge_path points at a JSONL/CSV
+    file of reference findings; without one the knowledge_base dict is used.
+    """
+
+    def __init__(self, name, title, classes, model_path, knowledge_base,
+                 report_messages, query_template, thresholds=None, thresholds_path=None,
+                 normal_class=None, normal_label="Normal",
+                 empty_findings_text="No abnormalities detected.",
+                 correlation_status="Clinical Correlation Recommended",
+                 conv_layer="conv5_block16_concat", explain_policy=None, knowledge_path=None):
+        if thresholds is None and thresholds_path is None:
+            raise ValueError(f"Modality '{name}' needs thresholds or thresholds_path.")
+
+        self.name = name
+        self.title = title
+        self.classes = list(classes)
+        self.model_path = model_path
+        self.knowledge_base = knowledge_base
+        self.knowledge_path = knowledge_path
+        self.report_messages = report_messages
+        self.query_template = query_template
+        self.threshold_values = thresholds
+        self.thresholds_path = thresholds_path
+        self.normal_class = normal_class
+        self.normal_label = normal_label
+        self.empty_findings_text = empty_findings_text
+        self.correlation_status = correlation_status
+        self.conv_layer = conv_layer
+        self.explain_policy = explain_policy or ExplainPolicy()
+
+        # Populated by load() and the startup hook
+        self.release = None
+        # utils.knowledge.KnowledgeBase
+        self.knowledge = None
+
+    def __repr__(self):
+        return f"Modality(name={self.name!r}, classes={len(self.classes)})"
+
+    @property
+    def model(self):
+        return self.release.model if self.release is not None else None
+
+    @property
+    def thresholds(self):
+        return self.release.thresholds if self.release is not None else None
+
+    def read_thresholds(self, path=None) -> dict:
+        path = path or self.thresholds_path
+        if path is None:
+            return self.threshold_values
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def load_thresholds(self, path=None):
+        """(compiled thresholds, version) from path, thresholds_path or the built-in values."""
+        values = self.read_thresholds(path)
+        version = content_version(json.dumps({c: float(values[c]) for c in self.classes if c in values},
+                                              sort_keys=True).encode("utf-8"))
+        return compile_thresholds(self.classes, values), version
+
+    def load_model(self, model_path=None):
+        """(Keras model, version) from model_path (default: the modality's own)."""
+        model_path = model_path or self.model_path
+        model = tf.keras.models.load_model(
+            model_path,
+            custom_objects={'focal_loss_fixed': binary_focal_loss(gamma=2.0, alpha=0.25)}
+        )
+        return model, file_version(model_path)
+
+    def warm_up(self, model):
+        """
+        One forward pass through the prediction/feature view plus the Grad-CAM
+        graph, so the first real request does not pay for tracing. Rejects
+        models whose outputs do not match the modality's classes.
+        """
+        probe = np.zeros((1, *model.inputs[0].shape[1:]), dtype=np.float32)
+        preds, _ = vision_with_features(model, probe)
+        if preds.shape[-1] != len(self.classes):
+            raise ValueError(f"Model outputs {preds.shape[-1]} classes, {self.title} expects {len(self.classes)}.")
+        get_grad_model(model, self.conv_layer)
+
+    def build_release(self, model_path=None, reload_model=True) -> Release:
+        """
+        Loads and warms a complete Release without touching the active one.
+        With reload_model=False only the thresholds are re-read and the
+        current model is kept.
+        """
+        thresholds, thresholds_version = self.load_thresholds()
+        if not reload_model and self.release is not None:
+            return Release(self.release.model, thresholds, self.release.model_version, thresholds_version)
+        model, model_version = self.load_model(model_path)
+        self.warm_up(model)
+        return Release(model, thresholds, model_version, thresholds_version)
+
+    def swap(self, release: Release):
+        """Makes release active; requests already running keep the one they started with."""
+        previous, self.release = self.release, release
+        return previous
+
+    def load(self):
+        """Loads thresholds and the Keras model. Failures leave model as None."""
+        try:
+            self.swap(self.build_release())
+            print(f"✅ {self.title} Vision model loaded successfully.")
+        except Exception as e:
+            print(f"❌ Error loading {self.title} artifacts: {e}")
+            self.release = None
+        return self
+
+    def knowledge_entries(self) -> list:
+        return load_entries(self.knowledge_path, self.knowledge_base)
+
+    def build_report_messages(self, diseases_text: str, bio_category: str) -> list:
+        return [
+            {"role": m["role"], "content": m["content"].format(diseases_text=diseases_text, bio_category=bio_category)}
+            for m in self.report_messages
+        ]
+
+
+def register(modality: Modality) -> Modality:
+    """Adds a modality to the registry used by cross-modality endpoints."""
+    if modality.name in MODALITIES:
+        raise ValueError(f"Modality '{modality.name}' is already registered.")
+    MODALITIES[modality.name] = modality
+    return modality
@@ -0,0 +1,42 @@
+import os
+
+from modalities.base import Modality, register
+from utils.explain import ExplainPolicy
+
+BONE_CLASSES = ['Cancer', 'Fracture', 'Osteoarthritis', 'Osteopenia', 'Osteoporosis', 'Scoliosis']
+
+# Skeletal Knowledge Base for Semantic Validation
+BONE_KNOWLEDGE_BASE = {
+    "Malignancy/Neoplastic": "Evidence of abnormal bone growth, primary bone tumors, or metastatic lesions suggesting cancer.",
+    "Traumatic/Structural": "Disruption of cortical continuity or acute breaks indicating a fracture.",
+    "Degenerative/Joint": "Reduction in joint space, osteophyte formation, or subchondral sclerosis suggesting osteoarthritis.",
+    "Density/Metabolic": "Decreased bone mineral density or porous bone structure indicating osteopenia or osteoporosis.",
+    "Deformity/Alignment": "Lateral curvature of the spine or abnormal vertebral alignment suggesting scoliosis.",
+    "Normal": "Intact cortical margins, normal bone density, and preserved joint spaces without pathology."
+}
+
+REPORT_MESSAGES = [
+    {"role": "user", "content": """
+    You are an expert orthopedic radiologist. Synthesize these findings into a professional report.
+    - Pathologies: {diseases_text}
+    - Semantic Category: {bio_category}
+
+    Structure: [CLINICAL FINDINGS] and [DIAGNOSTIC IMPRESSION]. Focus on structural integrity and density.
+    """}
+]
+
+BONE = register(Modality(
+    name="bone",
+    title="Bone",
+    classes=BONE_CLASSES,
+    thresholds_path="models/bone_thresholds.json",
+    model_path="models/bone_model_best.keras",
+    knowledge_base=BONE_KNOWLEDGE_BASE,
+    report_messages=REPORT_MESSAGES,
+    query_template="Skeletal X-ray findings include {findings}.",
+    normal_label="Normal",
+    empty_findings_text="Normal skeletal structure.",
+    correlation_status="Clinical Correlation Required",
+    explain_policy=ExplainPolicy.from_env("BONE"),
+    knowledge_path=os.getenv("BONE_KNOWLEDGE_PATH"),
+))
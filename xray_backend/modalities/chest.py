@@ -0,0 +1,50 @@
+import os
+
+from modalities.base import Modality, register
+from utils.explain import ExplainPolicy
+
+ALL_CLASSES = [
+    'Atelectasis', 'Cardiomegaly', 'Consolidation', 'Edema', 'Effusion',
+    'Emphysema', 'Fibrosis', 'Hernia', 'Infiltration', 'Mass', 'No Finding',
+    'Nodule', 'Pleural_Thickening', 'Pneumonia', 'Pneumothorax'
+]
+
+MEDICAL_KNOWLEDGE_BASE = {
+    "Pleural Anomalies": "Evidence of effusion, pleural thickening, or pneumothorax indicating pleural space involvement.",
+    "Infectious/Inflammatory": "Infiltration, consolidation, or pneumonia suggesting active alveolar filling or infection.",
+    "Cardiac Anomalies": "Cardiomegaly indicating enlarged cardiac silhouette.",
+    "Chronic/Structural": "Fibrosis, emphysema, atelectasis, or hernia suggesting structural lung damage or volume loss.",
+    "Focal Lesions": "Nodule or mass requiring oncological correlation.",
+    "Normal": "No pathological findings, clear lungs and normal cardiac silhouette."
+}
+
+REPORT_MESSAGES = [
+    {"role": "system", "content": "You are an expert radiologist AI. Synthesize the provided multi-label findings into a formal, professional radiology report. Use structured sections (FINDINGS, IMPRESSION). Discuss how the flagged conditions clinically relate to one another."},
+    {"role": "user", "content": """
+Generate a formal radiology report for the following case:
+
+### RADIOLOGICAL FINDINGS:
+- Flagged Conditions: {diseases_text}
+- BioBERT Semantic Category: {bio_category}
+
+Ensure you mention ALL flagged conditions in the findings section and provide a cohesive diagnostic impression.
+You are evaluating a Chest X-Ray (CXR). Do not mention CT scans or MRIs.
+"""}
+]
+
+CHEST = register(Modality(
+    name="chest",
+    title="Chest",
+    classes=ALL_CLASSES,
+    thresholds_path="models/chest_thresholds.json",
+    model_path="models/DenseNet121_Fully_Trained.keras",
+    knowledge_base=MEDICAL_KNOWLEDGE_BASE,
+    report_messages=REPORT_MESSAGES,
+    query_template="X-ray findings include {findings}.",
+    normal_class="No Finding",
+    normal_label="Normal / No Finding",
+    empty_findings_text="No abnormalities detected.",
+    correlation_status="Clinical Correlation Recommended",
+    explain_policy=ExplainPolicy.from_env("CHEST"),
+    knowledge_path=os.getenv("CHEST_KNOWLEDGE_PATH"),
+))
@@ -0,0 +1,635 @@
+import os
+import asyncio
+import threading
+import numpy as np
+from collections import OrderedDict
+from fastapi import UploadFile
+
+from utils.visualizer import preprocess_image, iter_grad_cams, combined_grad_cam, render_heatmaps, encode_raw_cams, to_data_url, ENCODINGS, HEATMAP_FORMAT
+from utils.uploads import open_upload
+from utils.postprocess import postprocess_batch
+from utils.tta import borderline, averaged
+from utils.memory import MEMORY, max_heatmaps, explain_bytes, TTA_BYTES
+from utils.metrics import stage, in_flight, count_cache, Counter
+from utils.batching import MicroBatcher
+from utils.analytics import ANALYTICS
+from utils.study_store import STUDIES
+from utils.vector_index import VectorIndex
+from utils.knowledge import KnowledgeBase, KB_TOP_K
+from modalities.backbone import shared_vision, vision_with_features
+from modalities.shadow import SHADOW
+from utils import clients
+
+# --- 1. SHARED BACKENDS ---
+# Connections, timeouts, retries and circuit breakers live in utils/clients.py
+BIOBERT_MODEL = "dmis-lab/biobert-v1.1"
+BIOBERT_DIM = 768
+
+REPORT_MODEL = 'llama3.2:1b'
+VALIDATION_THRESHOLD = 0.65
+
+HEATMAP_MODES = ("overlay", "raw")
+HEATMAP_MIME = ENCODINGS[HEATMAP_FORMAT][1]
+CAM_DTYPES = ("uint8", "float16")
+COMBINED_HEATMAP = "Combined"
+
+DEGRADED_PARTS = Counter(
+    "xinsight_degraded_parts_total",
+    "Response parts omitted or downgraded to meet a latency budget.",
+    ("modality", "part", "action"),
+)
+
+# Query sentences repeat whenever the same set of findings recurs
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+_embedding_cache = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+
+# --- 2. BIOBERT ANALYST LOGIC ---
+def pool_features(features) -> np.ndarray:
+    """Mean-pools one text's feature-extraction output to a BIOBERT_DIM vector."""
+    features = np.array(features)
+    # Handle different output shapes from the feature extraction pipeline
+    if features.ndim == 3: return np.mean(features[0], axis=0)
+    if features.ndim == 2: return np.mean(features, axis=0)
+    flat_features = features.flatten()
+    if len(flat_features) % BIOBERT_DIM == 0: return np.mean(flat_features.reshape(-1, BIOBERT_DIM), axis=0)
+    return flat_features
+
+
+async def get_embedding(text: str):
+    """Extracts a mean-pooled BioBERT feature vector via the Hugging Face API."""
+    try:
+        return pool_features(await clients.feature_extraction(text, model=BIOBERT_MODEL))
+    except Exception as e:
+        print(f"Embedding error: {e}")
+        return None
+
+
+async def get_embeddings(texts: list) -> list:
+    """
+    Mean-pooled BioBERT vectors for a batch of texts, sent as one embedding
+    request. A failed request yields None for every text in it.
+    """
+    try:
+        response = await clients.feature_extraction(list(texts), model=BIOBERT_MODEL)
+        if len(response) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(response)}")
+        return [pool_features(features) for features in response]
+    except Exception as e:
+        print(f"Embedding error ({len(texts)} texts): {e}")
+        return [None] * len(texts)
+
+
+async def get_query_embedding(modality, text: str):
+    """get_embedding() behind a small LRU cache, counting hits per modality."""
+    with _embedding_cache_lock:
+        vec = _embedding_cache.get(text)
+        if vec is not None:
+            _embedding_cache.move_to_end(text)
+    count_cache(modality.name, "embedding", vec is not None)
+    if vec is not None:
+        return vec
+
+    with stage(modality.name, "embedding") as span:
+        vec = await get_embedding(text)
+        if vec is None:
+            span.fail()
+            return None
+
+    with _embedding_cache_lock:
+        _embedding_cache[text] = vec
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+    return vec
+
+
+async def build_knowledge_vectors(modality):
+    """
+    Embeds the modality's knowledge base into its on-disk index (run at
+    startup). Unchanged entries reuse the stored vectors without any
+    embedding calls.
+    """
+    knowledge = KnowledgeBase(modality.name, modality.knowledge_entries())
+    print(f"🧠 Preparing {modality.title} Knowledge Base ({len(knowledge.entries)} entries)...")
+    # Each batch is one embedding request; the embedding backend's own limit bounds parallelism
+    rebuilt = await knowledge.build(get_embeddings, BIOBERT_MODEL)
+    modality.knowledge = knowledge
+    print(f"✅ {modality.title} Knowledge Base Ready with {len(knowledge)} entries"
+          f"{'' if rebuilt else ' (cached embeddings)'}.")
+
+
+async def get_biobert_validation(modality, flagged_conditions_str: str) -> dict:
+    """Matches detected findings to the closest knowledge base entries (top KB_TOP_K)."""
+    try:
+        if modality.knowledge is None or not modality.knowledge.ready:
+            return {"status": "Knowledge base uninitialized", "match_category": "Unknown", "semantic_score": 0.0}
+
+        query_text = modality.query_template.format(findings=flagged_conditions_str)
+        query_vec = await get_query_embedding(modality, query_text)
+        if query_vec is None: raise ValueError("Failed to extract features.")
+
+        matches = modality.knowledge.search(query_vec, KB_TOP_K)
+
+        best_match, highest_score = "General Observation", 0.0
+        if matches and matches[0][1] > 0:
+            best_match, highest_score = matches[0][0]["category"], matches[0][1]
+
+        status = f"Validated: {best_match}" if highest_score > VALIDATION_THRESHOLD else modality.correlation_status
+        return {
+            "status": status, "match_category": best_match, "semantic_score": highest_score,
+            "matches": [{"category": e["category"], "text": e["text"], "score": round(score, 6)} for e, score in matches],
+        }
+    except Exception as e:
+        print(f"❌ {modality.title} Validation Error: {e}")
+        return {"status": "Clinical Validation Pending", "match_category": "Unknown", "semantic_score": 0.0}
+
+
+# --- 3. LLM REPORTING ---
+async def generate_report(modality, flagged_list: list, validation: dict) -> str:
+    bio_category = validation.get('match_category', 'General Observation')
+
+    condition_strings = [f"{item['condition']} ({item['confidence']} confidence)" for item in flagged_list]
+    diseases_text = ", ".join(condition_strings) if condition_strings else modality.empty_findings_text
+
+    messages = modality.build_report_messages(diseases_text, bio_category)
+
+    with stage(modality.name, "report") as span:
+        try:
+            print(f"--- Contacting Ollama to synthesize {modality.name} report for: {diseases_text} ---")
+            response = await clients.chat(model=REPORT_MODEL, messages=messages)
+            print("--- Ollama report received. ---")
+            return response['message']['content']
+        except Exception as e:
+            print(f"❌ Ollama Error: {e}")
+            span.fail()
+            return "Error: Could not generate report. Please check Ollama connection."
+
+
+def summary_report(modality, flagged_list: list, validation: dict) -> str:
+    """Template report used when the latency budget leaves no room for the LLM."""
+    condition_strings = [f"{item['condition']} ({item['confidence']} confidence)" for item in flagged_list]
+    diseases_text = ", ".join(condition_strings) if condition_strings else modality.empty_findings_text
+    return (
+        f"[FINDINGS]\n{modality.title} AI screening flagged: {diseases_text}.\n"
+        f"[IMPRESSION]\n{validation.get('status', 'Clinical Validation Pending')}. "
+        "Automated summary only; the narrative report was skipped to meet the latency budget."
+    )
+
+
+# --- 4. VISION STAGES ---
+class PredictOptions:
+    """Per-request knobs for the shared pipeline, parsed by the router."""
+
+    def __init__(self, heatmap_mode="overlay", cam_dtype="uint8", binary=False, deadline=None, explain=None,
+                 study_id=None, release=None, tta=False):
+        if heatmap_mode not in HEATMAP_MODES:
+            raise ValueError(f"heatmap_mode must be one of {HEATMAP_MODES}")
+        if cam_dtype not in CAM_DTYPES:
+            raise ValueError(f"cam_dtype must be one of {CAM_DTYPES}")
+        self.heatmap_mode = heatmap_mode
+        self.cam_dtype = cam_dtype
+        # Binary responses (MessagePack/CBOR) carry heatmaps as raw bytes
+        self.binary = binary
+        # utils.budget.Deadline, or None for no latency budget
+        self.deadline = deadline
+        # utils.explain.ExplainPolicy overriding the modality's, or None
+        self.explain = explain
+        # Id the result will be stored under; also keys its similar-case vector
+        self.study_id = study_id
+        # modalities.base.Release the request runs on, pinned when it starts so
+        # a hot reload never mixes models or thresholds within one response
+        self.release = release
+        # Test-time augmentation for borderline findings (utils.tta)
+        self.tta = tta
+        # utils.memory.Reservation held for the request; trimmed once the
+        # heatmap count is known (None when admitted for several modalities)
+        self.reservation = None
+        # (img_array, preds) sampled for the shadow candidate; the router
+        # queues the comparison once the response has been sent
+        self.shadow = None
+        # Pooled features from the vision pass, indexed for similar-case
+        # search once the study is stored (see store_study)
+        self.features = None
+
+
+def decode_image(file: UploadFile) -> tuple:
+    """(model input batch, resized RGB frame) for one upload. CPU-bound: call it in a worker thread."""
+    with open_upload(file) as image_source:
+        return preprocess_image(image_source)
+
+
+def run_vision(model, img_array) -> np.ndarray:
+    """Returns the (batch, num_classes) probability matrix."""
+    return model(img_array, training=False).numpy()
+
+
+def record_findings(modality, release, preds, results):
+    """Feeds a classified batch into the population analytics (a few vectorized updates)."""
+    ANALYTICS.record(modality, preds, preds >= release.thresholds,
+                     [r["patient_status"] == "Abnormal" for r in results])
+
+
+def get_batcher(modality, release) -> MicroBatcher:
+    """The micro-batcher in front of one release's vision model, shared by concurrent triage requests."""
+    if release.batcher is None:
+        release.batcher = MicroBatcher(modality.name, lambda batch: run_vision(release.model, batch))
+    return release.batcher
+
+
+def generate_heatmaps(modality, img_array, original_image, class_indices, options=None, combined=False) -> dict:
+    """
+    Grad-CAM for every requested class (one forward pass, one backward pass
+    per class, each timed as a gradcam span) followed by a single batched
+    render/encode of the whole stack. With combined=True the classes share a
+    single heatmap, keyed COMBINED_HEATMAP, from one backward pass. In raw
+    mode the normalized CAM grids are returned as-is for the client to
+    upsample and colorize. Overlays are data URLs, or raw encoded bytes for
+    binary responses.
+    """
+    options = options or PredictOptions()
+    class_indices = list(class_indices)
+    if not class_indices:
+        return {}
+    model = (options.release or modality.release).model
+
+    names, cams = [], []
+    if combined:
+        with stage(modality.name, "gradcam", key=COMBINED_HEATMAP) as span:
+            cam = combined_grad_cam(img_array, model, class_indices, modality.conv_layer)
+            if cam is None:
+                span.fail()
+            else:
+                names.append(COMBINED_HEATMAP)
+                cams.append(cam)
+    else:
+        grad_cams = iter_grad_cams(img_array, model, class_indices, modality.conv_layer)
+        for i in class_indices:
+            with stage(modality.name, "gradcam", key=modality.classes[i]) as span:
+                cam = next(grad_cams, None)
+                if cam is None:
+                    span.fail()
+                    continue
+            names.append(modality.classes[i])
+            cams.append(cam)
+        grad_cams.close()
+
+    if not cams:
+        return {}
+    if options.heatmap_mode == "raw":
+        return dict(zip(names, encode_raw_cams(np.stack(cams), options.cam_dtype, binary=options.binary)))
+
+    with stage(modality.name, "render") as span:
+        try:
+            encoded, mime = render_heatmaps(np.stack(cams), original_image)
+        except Exception as e:
+            print(f"❌ Heatmap Render Error: {e}")
+            span.fail()
+            return {}
+    if options.binary:
+        return dict(zip(names, encoded))
+    return {name: to_data_url(buf, mime) for name, buf in zip(names, encoded)}
+
+
+async def test_time_augmentation(modality, release, img_array, preds, deadline) -> tuple:
+    """
+    Averages the probabilities over flipped and cropped views (one batched
+    forward pass) when some class lies within TTA_MARGIN of its threshold.
+    Returns (preds, summary for the response).
+    """
+    near = borderline(preds[0], release.thresholds)
+    summary = {"applied": False, "views": 1, "borderline": [modality.classes[i] for i in near]}
+    if not len(near):
+        return preds, summary
+    if deadline is not None and not deadline.fits("tta"):
+        degrade(modality, deadline, "tta", "omitted", "expected cost exceeds remaining budget")
+        return preds, summary
+    with stage(modality.name, "tta"):
+        preds, views = await asyncio.to_thread(averaged, release.model, img_array, preds)
+    summary.update(applied=True, views=views)
+    return preds, summary
+
+
+# --- 5. LATENCY BUDGETS ---
+SKIPPED_VALIDATION = {"status": "Skipped (latency budget)", "match_category": "Unknown", "semantic_score": 0.0}
+
+
+def degrade(modality, deadline, part: str, action: str, reason: str):
+    """Records an omitted/downgraded response part on the deadline and in metrics."""
+    if action == "omitted":
+        deadline.omit(part, reason)
+    else:
+        deadline.downgrade(part, reason)
+    DEGRADED_PARTS.inc(modality=modality.name, part=part, action=action)
+
+
+async def timed(modality, name: str, awaitable):
+    with stage(modality.name, name):
+        return await awaitable
+
+
+async def within_budget(modality, deadline, part: str, awaitable):
+    """
+    Awaits a backend stage, cut off when the request's budget runs out.
+    Returns None (and records the omission) on timeout.
+    """
+    if deadline is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout=deadline.remaining_s())
+    except asyncio.TimeoutError:
+        degrade(modality, deadline, part, "omitted" if part != "report_text" else "downgraded",
+                "latency budget exhausted while waiting")
+        return None
+
+
+def budget_heatmap_indices(modality, deadline, class_indices, options, combined=False) -> list:
+    """
+    The selected classes (most confident first) whose Grad-CAM fits in the
+    remaining budget, reserving time for the render pass. A combined heatmap
+    costs one gradient whatever the number of classes.
+    """
+    class_indices = list(class_indices)
+    if not class_indices:
+        return class_indices
+    reserve = deadline.expected_s("render") if options.heatmap_mode == "overlay" else 0.0
+    count = deadline.affordable("gradcam", 1 if combined else len(class_indices), extra=reserve)
+    if count == 0:
+        degrade(modality, deadline, "heatmaps", "omitted", "expected cost exceeds remaining budget")
+        return []
+    if not combined and count < len(class_indices):
+        degrade(modality, deadline, "heatmaps", "downgraded",
+                f"{count} of {len(class_indices)} selected classes (highest confidence first)")
+        return class_indices[:count]
+    return class_indices
+
+
+# --- 6. FULL PIPELINE ---
+async def run_prediction(modality, file: UploadFile, options=None) -> dict:
+    """
+    Decode -> classify -> Grad-CAM -> BioBERT -> Ollama for a single upload.
+    With a deadline in options, later stages are trimmed to fit and the
+    response carries a "budget" entry listing what was omitted or downgraded.
+    """
+    options = options or PredictOptions()
+    options.release = options.release or modality.release
+    policy = options.explain or modality.explain_policy
+    with in_flight(modality.name), stage(modality.name, "total"):
+        # Waits (or is refused) while the worker's memory budget is committed
+        with stage(modality.name, "admission"):
+            options.reservation = await MEMORY.admit(
+                modality.name, [file], max_heatmaps(modality, policy), TTA_BYTES if options.tta else 0
+            )
+        try:
+            # Decode and inference run in worker threads so the loop keeps serving other requests
+            with stage(modality.name, "decode"):
+                img_array, original_image = await asyncio.to_thread(decode_image, file)
+
+            # A. Vision Prediction (the pooled features come from the same forward pass)
+            with stage(modality.name, "inference"):
+                preds, features = await asyncio.to_thread(vision_with_features, options.release.model, img_array)
+            options.features = features
+            return await explain_prediction(modality, img_array, original_image, preds, options)
+        finally:
+            options.reservation.release()
+
+
+async def explain_prediction(modality, img_array, original_image, preds, options) -> dict:
+    """Thresholds, Grad-CAM, BioBERT and the report for an already classified image."""
+    release = options.release = options.release or modality.release
+    deadline = options.deadline
+    # The shadow candidate is compared on the same single view production saw
+    if SHADOW.sample(modality):
+        options.shadow = (img_array, preds)
+
+    tta = None
+    if options.tta:
+        preds, tta = await test_time_augmentation(modality, release, img_array, preds, deadline)
+
+    results = postprocess_batch(
+        preds, modality.classes, release.thresholds,
+        normal_class=modality.normal_class, normal_label=modality.normal_label
+    )
+    record_findings(modality, release, preds, results)
+    result = results[0]
+
+    # B. Grad-CAM Heatmaps, narrowed by the explanation policy before any gradient work.
+    # Runs in a worker thread so other requests' backend calls keep progressing.
+    policy = options.explain or modality.explain_policy
+    heatmap_indices = policy.select(preds[0], result["flagged_indices"])
+    if deadline is not None:
+        heatmap_indices = budget_heatmap_indices(modality, deadline, heatmap_indices, options, policy.combined)
+    if options.reservation is not None:
+        options.reservation.settle(min(len(heatmap_indices), 1) if policy.combined else len(heatmap_indices))
+    heatmaps = await asyncio.to_thread(
+        generate_heatmaps, modality, img_array, original_image, heatmap_indices, options, policy.combined
+    )
+
+    # C. BioBERT Validation
+    validation_data = SKIPPED_VALIDATION
+    if deadline is None or deadline.fits("validation"):
+        validation_data = await within_budget(
+            modality, deadline, "medical_validation",
+            timed(modality, "validation", get_biobert_validation(modality, result["diseases_string"])),
+        ) or SKIPPED_VALIDATION
+    else:
+        degrade(modality, deadline, "medical_validation", "omitted", "expected cost exceeds remaining budget")
+
+    # D. Synthesized LLM Report (a template summary when the budget runs out)
+    report_text = None
+    if deadline is None or deadline.fits("report"):
+        report_text = await within_budget(
+            modality, deadline, "report_text",
+            generate_report(modality, result["flagged_conditions"], validation_data),
+        )
+    else:
+        degrade(modality, deadline, "report_text", "downgraded", "template summary; expected cost exceeds remaining budget")
+    if report_text is None:
+        report_text = summary_report(modality, result["flagged_conditions"], validation_data)
+
+    response = {
+        "patient_status": result["patient_status"],
+        "flagged_conditions": result["flagged_conditions"],
+        "medical_validation": validation_data,
+        "heatmaps": heatmaps,
+        "explained_classes": [modality.classes[i] for i in heatmap_indices] if heatmaps else [],
+        "report_text": report_text,
+        **release.describe(),
+    }
+    if tta is not None:
+        response["tta"] = tta
+    if options.heatmap_mode != "overlay":
+        response["heatmap_mode"] = options.heatmap_mode
+    elif options.binary:
+        response["heatmap_mime"] = HEATMAP_MIME
+    if deadline is not None:
+        response["budget"] = deadline.summary()
+    return response
+
+
+# --- 7. TRIAGE (CLASSIFICATION ONLY) ---
+def decode_upload(file: UploadFile) -> np.ndarray:
+    return decode_image(file)[0]
+
+
+async def run_classification(modality, files: list) -> dict:
+    """
+    Thresholded findings and raw probabilities for a batch of uploads: no
+    heatmaps, validation or report. Uploads decode in parallel worker threads
+    and share batched model calls with concurrent triage requests.
+    """
+    release = modality.release
+    with in_flight(modality.name), stage(modality.name, "triage"):
+        with stage(modality.name, "admission"):
+            reservation = await MEMORY.admit(modality.name, files)
+        try:
+            with stage(modality.name, "triage_decode"):
+                arrays = await asyncio.gather(*(asyncio.to_thread(decode_upload, f) for f in files))
+
+            with stage(modality.name, "triage_inference"):
+                preds = await get_batcher(modality, release).submit(np.concatenate(arrays))
+        finally:
+            reservation.release()
+
+        results = postprocess_batch(
+            preds, modality.classes, release.thresholds,
+            normal_class=modality.normal_class, normal_label=modality.normal_label
+        )
+        record_findings(modality, release, preds, results)
+    return {
+        "classes": modality.classes,
+        "results": [
+            {
+                "filename": f.filename,
+                "patient_status": result["patient_status"],
+                "flagged_conditions": result["flagged_conditions"],
+                "probabilities": np.round(probs, 4).tolist(),
+            }
+            for f, result, probs in zip(files, results, preds)
+        ],
+        **release.describe(),
+    }
+
+
+# --- 8. COMBINED ANALYSIS ---
+ANALYZE = "analyze"
+
+
+async def run_analysis(modalities: list, file: UploadFile, make_options) -> dict:
+    """
+    Every requested modality on one upload: a single decode, one vision pass
+    (backbone features computed once when the models share a frozen
+    backbone), then each modality's explanations and report concurrently.
+    make_options(modality) returns that modality's PredictOptions.
+    """
+    with in_flight(ANALYZE), stage(ANALYZE, "total"):
+        options = {m.name: make_options(m) for m in modalities}
+        for m in modalities:
+            options[m.name].release = m.release
+
+        # One decode, but every modality's explanations run concurrently
+        with stage(ANALYZE, "admission"):
+            reservation = await MEMORY.admit(ANALYZE, [file], extra=sum(
+                explain_bytes(m, options[m.name].explain or m.explain_policy, options[m.name].tta) for m in modalities
+            ))
+        try:
+            with stage(ANALYZE, "decode"):
+                img_array, original_image = await asyncio.to_thread(decode_image, file)
+
+            with stage(ANALYZE, "inference"):
+                preds, features, shared = await asyncio.to_thread(
+                    shared_vision, {m.name: options[m.name].release.model for m in modalities}, img_array
+                )
+
+            for m in modalities:
+                options[m.name].features = features[m.name]
+            results = await asyncio.gather(*(
+                explain_prediction(m, img_array, original_image, preds[m.name], options[m.name])
+                for m in modalities
+            ))
+        finally:
+            reservation.release()
+    return {
+        "modalities": {m.name: result for m, result in zip(modalities, results)},
+        "shared_backbone": shared,
+    }
+
+
+# --- 9. SIMILAR CASES ---
+# Pooled penultimate features of every stored study, one on-disk index per
+# modality and model version: embeddings from different models are not
+# comparable, so a hot reload starts a fresh index for the new version.
+SIMILAR_CASES_ENABLED = os.getenv("SIMILAR_CASES", "1") != "0"
+CASE_INDEX_DIR = os.getenv("CASE_INDEX_DIR", "data/vectors")
+_case_indexes = {}
+_case_indexes_lock = threading.Lock()
+
+
+def get_case_index(modality, model_version: str) -> VectorIndex:
+    """The similar-case index for one model version (loads from disk on first use: call off the loop)."""
+    with _case_indexes_lock:
+        index = _case_indexes.get((modality.name, model_version))
+        if index is None:
+            index = _case_indexes[(modality.name, model_version)] = VectorIndex(
+                os.path.join(CASE_INDEX_DIR, modality.name, model_version)
+            )
+        return index
+
+
+def index_case(modality, model_version, study_id, features):
+    """Adds a stored study's pooled features to its model version's similar-case index."""
+    if not SIMILAR_CASES_ENABLED or study_id is None or features is None:
+        return
+    try:
+        with stage(modality.name, "index"):
+            get_case_index(modality, model_version).add([study_id], features.reshape(len(features), -1)[:1])
+    except Exception as e:
+        print(f"❌ Similar-case indexing failed for {study_id}: {e}")
+
+
+async def store_study(modality, result: dict, patient_id, options) -> str:
+    """
+    Queues a predict result for the study store, waiting while the store's
+    write queue is full. Its features are indexed
+    on the store's writer thread once the study has been written, so the
+    index never points at a study that failed to save, and index writes
+    stay off the event loop.
+    """
+    release, features, study_id = options.release, options.features, options.study_id
+    on_saved = None
+    if SIMILAR_CASES_ENABLED and features is not None:
+        on_saved = lambda: index_case(modality, release.model_version, study_id, features)
+    return await asyncio.to_thread(STUDIES.save, modality.name, result, patient_id, study_id=study_id,
+                                   heatmap_mime=HEATMAP_MIME, on_saved=on_saved)
+
+
+async def find_similar(modality, file: UploadFile, k=10) -> dict:
+    """The k stored studies whose pooled features are closest (cosine) to the upload's."""
+    release = modality.release
+    with in_flight(modality.name), stage(modality.name, "similar"):
+        with stage(modality.name, "admission"):
+            reservation = await MEMORY.admit(modality.name, [file])
+        try:
+            with stage(modality.name, "decode"):
+                img_array = await asyncio.to_thread(decode_upload, file)
+            with stage(modality.name, "inference"):
+                _, features = await asyncio.to_thread(vision_with_features, release.model, img_array)
+        finally:
+            reservation.release()
+        if features is None:
+            raise ValueError(f"{modality.title} model exposes no pooled feature layer.")
+
+        index = await asyncio.to_thread(get_case_index, modality, release.model_version)
+        with stage(modality.name, "search"):
+            matches = await asyncio.to_thread(index.search, features.reshape(1, -1), k)
+        summaries = await asyncio.to_thread(STUDIES.summaries, [study_id for study_id, _ in matches])
+    return {
+        "matches": [
+            # Unauthenticated endpoint: matches never say whose study they are
+            {"study_id": study_id, "similarity": round(score, 6),
+             **{k: v for k, v in summaries.get(study_id, {}).items() if k != "patient_id"}}
+            for study_id, score in matches
+        ],
+        "indexed_studies": len(index),
+        **release.describe(),
+    }
@@ -0,0 +1,131 @@
+import os
+import threading
+
+from modalities.base import MODALITIES
+from utils.metrics import Counter
+
+# --- 1. RELOAD CONFIG ---
+# Admin reloads may only name model files inside MODEL_DIR
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+# Seconds between artifact checks; 0 disables the file watcher
+MODEL_WATCH_S = float(os.getenv("MODEL_WATCH_S", "0"))
+
+RELOADS = Counter(
+    "xinsight_model_reloads_total",
+    "Model/threshold hot reloads by outcome.",
+    ("modality", "artifact", "outcome"),
+)
+
+_locks = {}
+
+
+# --- 2. RELOAD ---
+def resolve_model_path(filename: str) -> str:
+    """A model file inside MODEL_DIR; raises ValueError for anything outside it or missing."""
+    root = os.path.realpath(MODEL_DIR)
+    path = os.path.realpath(os.path.join(root, filename))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError("Model files must live in the model directory.")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"No model file named '{filename}'.")
+    return path
+
+
+def reload_modality(modality, model_path=None, reload_model=True) -> dict:
+    """
+    Loads and warms a new Release in the calling thread, then swaps it in.
+    Requests already running finish on the release they started with; the
+    old model is freed once the last of them completes. With
+    reload_model=False only the thresholds are re-read. Blocking: call it
+    via asyncio.to_thread from the event loop.
+    """
+    artifact = "model" if reload_model else "thresholds"
+    with _locks.setdefault(modality.name, threading.Lock()):
+        try:
+            release = modality.build_release(model_path, reload_model=reload_model)
+        except Exception as e:
+            RELOADS.inc(modality=modality.name, artifact=artifact, outcome="failed")
+            print(f"❌ {modality.title} {artifact} reload failed; keeping the active release: {e}")
+            raise
+        if model_path is not None:
+            modality.model_path = model_path
+        previous = modality.swap(release)
+    RELOADS.inc(modality=modality.name, artifact=artifact, outcome="ok")
+    old = previous.describe() if previous is not None else {}
+    print(f"✅ {modality.title} now serving model {release.model_version} "
+          f"(was {old.get('model_version')}), thresholds {release.thresholds_version}.")
+    return release.describe()
+
+
+# --- 3. FILE WATCHER ---
+def _signature(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+class ArtifactWatcher:
+    """
+    Polls every modality's model and thresholds files and reloads the ones
+    that changed. A change is acted on only once the file has looked the same
+    for two consecutive polls, so a copy still in progress is not loaded.
+    Replace files atomically (write elsewhere, then rename) where possible.
+    """
+
+    def __init__(self, interval_s=MODEL_WATCH_S):
+        self.interval_s = interval_s
+        self._seen = {}
+        self._pending = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _artifacts(self):
+        for modality in MODALITIES.values():
+            yield modality, "model", modality.model_path
+            if modality.thresholds_path is not None:
+                yield modality, "thresholds", modality.thresholds_path
+
+    def check(self):
+        for modality, artifact, path in self._artifacts():
+            # Keyed by path too: pointing a modality at a new file is not itself a change
+            key = (modality.name, artifact, path)
+            signature = _signature(path)
+            if key not in self._seen or signature is None:
+                self._seen.setdefault(key, signature)
+                continue
+            if signature == self._seen[key]:
+                self._pending.pop(key, None)
+                continue
+            if self._pending.get(key) != signature:
+                # First sighting of this version; wait one poll for it to settle
+                self._pending[key] = signature
+                continue
+            self._pending.pop(key, None)
+            self._seen[key] = signature
+            try:
+                reload_modality(modality, reload_model=artifact == "model" or modality.release is None)
+            except Exception:
+                # Already reported; the active release keeps serving
+                pass
+
+    def start(self):
+        """Starts the polling thread (idempotent; no-op when MODEL_WATCH_S is 0)."""
+        if self.interval_s <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self.check()
+
+        def run():
+            while not self._stop.wait(self.interval_s):
+                self.check()
+
+        self._thread = threading.Thread(target=run, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+WATCHER = ArtifactWatcher()
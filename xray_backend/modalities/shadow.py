@@ -0,0 +1,185 @@
+import os
+import random
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from modalities.base import MODALITIES, Release
+from utils.metrics import Counter, Histogram
+
+# --- 1. SHADOW CONFIG ---
+# A candidate is configured per modality with <NAME>_SHADOW_MODEL (and
+# optionally <NAME>_SHADOW_THRESHOLDS / <NAME>_SHADOW_FRACTION) or at runtime
+# through the admin API.
+SHADOW_FRACTION = float(os.getenv("SHADOW_FRACTION", "0.1"))
+# Comparisons waiting for the shadow worker; further samples are dropped
+SHADOW_QUEUE = int(os.getenv("SHADOW_QUEUE", "16"))
+
+DELTA_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0)
+
+SHADOW_COMPARISONS = Counter(
+    "xinsight_shadow_comparisons_total",
+    "Per-class threshold decisions of the shadow candidate vs production: agree, production_only, candidate_only.",
+    ("modality", "candidate", "condition", "outcome"),
+)
+SHADOW_STATUS = Counter(
+    "xinsight_shadow_status_total",
+    "Patient status agreement between the shadow candidate and production.",
+    ("modality", "candidate", "outcome"),
+)
+SHADOW_DELTA = Histogram(
+    "xinsight_shadow_probability_delta",
+    "Absolute per-class probability difference, candidate vs production.",
+    ("modality", "candidate", "condition"),
+    buckets=DELTA_BUCKETS,
+)
+SHADOW_SKIPPED = Counter(
+    "xinsight_shadow_skipped_total",
+    "Sampled shadow comparisons that were not run.",
+    ("modality", "reason"),
+)
+
+
+# --- 2. CANDIDATES ---
+class ShadowCandidate:
+    """A candidate release plus running agreement statistics against production."""
+
+    def __init__(self, release: Release, fraction: float, model_path: str, classes):
+        self.release = release
+        self.fraction = fraction
+        self.model_path = model_path
+        n = len(classes)
+        self.compared = 0
+        self.status_agreed = 0
+        self.agreed = np.zeros(n, dtype=np.int64)
+        self.production_only = np.zeros(n, dtype=np.int64)
+        self.candidate_only = np.zeros(n, dtype=np.int64)
+        self.delta_sum = np.zeros(n, dtype=np.float64)
+        self.abs_delta_sum = np.zeros(n, dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def describe(self, classes) -> dict:
+        with self._lock:
+            n = max(self.compared, 1)
+            return {
+                "model_path": self.model_path,
+                **self.release.describe(),
+                "fraction": self.fraction,
+                "compared": self.compared,
+                "status_agreement": round(self.status_agreed / n, 6),
+                "classes": {
+                    c: {
+                        "agreement": round(float(self.agreed[i]) / n, 6),
+                        "production_only": int(self.production_only[i]),
+                        "candidate_only": int(self.candidate_only[i]),
+                        "mean_delta": round(self.delta_sum[i] / n, 6),
+                        "mean_abs_delta": round(self.abs_delta_sum[i] / n, 6),
+                    }
+                    for i, c in enumerate(classes)
+                },
+            }
+
+
+# --- 3. SHADOW EVALUATION ---
+class ShadowEvaluator:
+    """
+    Runs a sampled fraction of production inputs through each modality's
+    candidate model on a single background worker, after the response has
+    gone out, and records how its decisions differ. Nothing on the request
+    path waits for it: samples beyond SHADOW_QUEUE are dropped.
+    """
+
+    def __init__(self, max_pending=SHADOW_QUEUE):
+        self.candidates = {}
+        self.max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+
+    def set(self, modality, model_path: str, fraction=SHADOW_FRACTION, thresholds_path=None) -> dict:
+        """Loads and warms a candidate (blocking), then starts sampling traffic for it."""
+        if not 0.0 <= fraction <= 1.0:
+            raise ValueError("fraction must be between 0 and 1.")
+        model, model_version = modality.load_model(model_path)
+        modality.warm_up(model)
+        # Production thresholds unless the candidate ships its own
+        thresholds, thresholds_version = modality.load_thresholds(thresholds_path)
+        candidate = ShadowCandidate(Release(model, thresholds, model_version, thresholds_version),
+                                    fraction, model_path, modality.classes)
+        self.candidates[modality.name] = candidate
+        print(f"✅ {modality.title} shadow candidate {model_version} sampling {fraction:.0%} of requests.")
+        return candidate.describe(modality.classes)
+
+    def clear(self, modality):
+        return self.candidates.pop(modality.name, None) is not None
+
+    def load_from_env(self):
+        for modality in MODALITIES.values():
+            prefix = modality.name.upper()
+            model_path = os.getenv(f"{prefix}_SHADOW_MODEL")
+            if not model_path:
+                continue
+            try:
+                self.set(modality, model_path, float(os.getenv(f"{prefix}_SHADOW_FRACTION", SHADOW_FRACTION)),
+                         os.getenv(f"{prefix}_SHADOW_THRESHOLDS"))
+            except Exception as e:
+                print(f"❌ {modality.title} shadow candidate not loaded: {e}")
+
+    def sample(self, modality) -> bool:
+        candidate = self.candidates.get(modality.name)
+        return candidate is not None and random.random() < candidate.fraction
+
+    def submit(self, modality, release, img_array, preds):
+        """Queues one comparison (call after the response is sent)."""
+        candidate = self.candidates.get(modality.name)
+        if candidate is None:
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                SHADOW_SKIPPED.inc(modality=modality.name, reason="queue_full")
+                return
+            self._pending += 1
+        self._executor.submit(self._compare, modality, candidate, release, img_array, preds)
+
+    def _compare(self, modality, candidate, release, img_array, preds):
+        try:
+            shadow_preds = candidate.release.model(img_array, training=False).numpy()
+            production, shadow = preds[0], shadow_preds[0]
+            prod_flags = production >= release.thresholds
+            shadow_flags = shadow >= candidate.release.thresholds
+            delta = shadow - production
+            prod_abnormal, shadow_abnormal = self._abnormal(modality, prod_flags), self._abnormal(modality, shadow_flags)
+
+            with candidate._lock:
+                candidate.compared += 1
+                candidate.status_agreed += int(prod_abnormal == shadow_abnormal)
+                candidate.agreed += prod_flags == shadow_flags
+                candidate.production_only += prod_flags & ~shadow_flags
+                candidate.candidate_only += shadow_flags & ~prod_flags
+                candidate.delta_sum += delta
+                candidate.abs_delta_sum += np.abs(delta)
+
+            version = candidate.release.model_version
+            SHADOW_STATUS.inc(modality=modality.name, candidate=version,
+                              outcome="agree" if prod_abnormal == shadow_abnormal else "disagree")
+            for i, condition in enumerate(modality.classes):
+                outcome = ("agree" if prod_flags[i] == shadow_flags[i]
+                           else "production_only" if prod_flags[i] else "candidate_only")
+                SHADOW_COMPARISONS.inc(modality=modality.name, candidate=version, condition=condition, outcome=outcome)
+                SHADOW_DELTA.observe(float(abs(delta[i])), modality=modality.name, candidate=version, condition=condition)
+        except Exception as e:
+            SHADOW_SKIPPED.inc(modality=modality.name, reason="error")
+            print(f"❌ {modality.title} shadow comparison failed: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    @staticmethod
+    def _abnormal(modality, flags) -> bool:
+        if modality.normal_class is not None:
+            flags = flags.copy()
+            flags[modality.classes.index(modality.normal_class)] = False
+        return bool(flags.any())
+
+
+SHADOW = ShadowEvaluator()
@@ -0,0 +1,102 @@
+import os
+import hmac
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+
+from modalities.base import MODALITIES
+from modalities.reload import reload_modality, resolve_model_path
+from modalities.shadow import SHADOW, SHADOW_FRACTION
+
+# Admin endpoints stay disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+ADMIN_TOKEN_HEADER = "x-admin-token"
+
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (set ADMIN_TOKEN).")
+    if not hmac.compare_digest(request.headers.get(ADMIN_TOKEN_HEADER, ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+router = APIRouter(prefix="/admin", tags=["Administration"], dependencies=[Depends(require_admin)])
+
+
+def get_modality(name: str):
+    modality = MODALITIES.get(name)
+    if modality is None:
+        raise HTTPException(status_code=404, detail=f"Unknown modality '{name}'; registered: {sorted(MODALITIES)}")
+    return modality
+
+
+def model_file(filename: str) -> str:
+    try:
+        return resolve_model_path(filename)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/models")
+def active_models():
+    """The release each modality is serving."""
+    return {
+        name: {"model_path": m.model_path, "thresholds_path": m.thresholds_path,
+               **(m.release.describe() if m.release is not None else {"model_version": None})}
+        for name, m in MODALITIES.items()
+    }
+
+
+@router.post("/{modality_name}/reload")
+async def reload(
+    modality_name: str,
+    model: str = Query(None, description="Model file in the model directory (default: the current one)"),
+    thresholds_only: bool = Query(False, description="Re-read thresholds and keep the loaded model"),
+):
+    """
+    Loads, warms up and swaps in a new release without dropping requests:
+    in-flight requests finish on the previous model and thresholds.
+    """
+    modality = get_modality(modality_name)
+    model_path = model_file(model) if model else None
+    if thresholds_only and (model_path or modality.release is None):
+        raise HTTPException(status_code=400, detail="thresholds_only needs a loaded model and no model file.")
+
+    try:
+        return await asyncio.to_thread(reload_modality, modality, model_path, not thresholds_only)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Reload failed; still serving the previous release: {e}")
+
+
+@router.get("/{modality_name}/shadow")
+def shadow_status(modality_name: str):
+    """The shadow candidate and its agreement with production so far."""
+    modality = get_modality(modality_name)
+    candidate = SHADOW.candidates.get(modality.name)
+    return {"candidate": candidate.describe(modality.classes) if candidate is not None else None}
+
+
+@router.put("/{modality_name}/shadow")
+async def set_shadow(
+    modality_name: str,
+    model: str = Query(..., description="Candidate model file in the model directory"),
+    fraction: float = Query(None, ge=0.0, le=1.0, description="Share of predict requests also run on the candidate"),
+    thresholds: str = Query(None, description="Candidate thresholds file in the model directory (default: production's)"),
+):
+    """Loads and warms a candidate model, then compares it against a sample of live traffic."""
+    modality = get_modality(modality_name)
+    model_path = model_file(model)
+    thresholds_path = model_file(thresholds) if thresholds else None
+    try:
+        candidate = await asyncio.to_thread(
+            SHADOW.set, modality, model_path, SHADOW_FRACTION if fraction is None else fraction, thresholds_path
+        )
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Candidate not loaded: {e}")
+    return {"candidate": candidate}
+
+
+@router.delete("/{modality_name}/shadow")
+def clear_shadow(modality_name: str):
+    return {"removed": SHADOW.clear(get_modality(modality_name))}
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException, Query
+
+from modalities.base import MODALITIES
+from utils.analytics import ANALYTICS, ANALYTICS_DAYS
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+def aggregates_for(modality: str):
+    if modality not in MODALITIES:
+        raise HTTPException(status_code=404, detail=f"Unknown modality '{modality}'.")
+    return ANALYTICS.get(modality, MODALITIES[modality].classes)
+
+
+# Every query reads precomputed aggregates, so cost does not grow with the number of studies
+@router.get("/{modality}/summary")
+def summary(modality: str):
+    """Study counts, abnormal rate and per-class prevalence (threshold-hit rates)."""
+    return aggregates_for(modality).summary()
+
+
+@router.get("/{modality}/distributions")
+def distributions(modality: str):
+    """Per-class histograms of predicted probabilities."""
+    return aggregates_for(modality).distributions()
+
+
+@router.get("/{modality}/cooccurrence")
+def cooccurrence(modality: str):
+    """How often each pair of classes is flagged in the same study."""
+    return aggregates_for(modality).cooccurrence_matrix()
+
+
+@router.get("/{modality}/timeline")
+def timeline(modality: str, days: int = Query(30, ge=1, le=ANALYTICS_DAYS)):
+    """Daily study counts and per-class hit rates, oldest first."""
+    return aggregates_for(modality).timeline(days)
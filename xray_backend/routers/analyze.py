@@ -0,0 +1,99 @@
+import uuid
+from fastapi import APIRouter, BackgroundTasks, File, Form, UploadFile, HTTPException, Request, Query
+
+from modalities.base import MODALITIES
+from modalities.shadow import SHADOW
+from modalities.pipeline import run_analysis, store_study, PredictOptions, ANALYZE
+from utils.tracing import start_trace, REQUEST_ID_HEADER
+from utils.serialization import negotiate, is_binary, encode_response
+from utils.budget import Deadline, parse_budget_ms
+from utils.study_store import STUDY_STORE_ENABLED
+from utils.coalescing import INFLIGHT, request_key
+
+router = APIRouter(tags=["Combined Diagnostics"])
+
+
+@router.post("/analyze")
+async def analyze(
+    request: Request,
+    background: BackgroundTasks,
+    file: UploadFile = File(...),
+    patient_id: str = Form(None),
+    modalities: str = Query(None, description="Comma-separated modalities (default: all registered)"),
+    heatmap_mode: str = Query("overlay", pattern="^(overlay|raw)$"),
+    cam_dtype: str = Query("uint8", pattern="^(uint8|float16)$"),
+    budget_ms: float = Query(None, gt=0),
+    explain: str = Query(None),
+    tta: bool = Query(False),
+):
+    """
+    One upload through several modalities: decoded once, classified in one
+    vision pass, then explained and reported per modality concurrently.
+    """
+    names = [n.strip() for n in modalities.split(",") if n.strip()] if modalities else list(MODALITIES)
+    unknown = [n for n in names if n not in MODALITIES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown modalities {unknown}; registered: {sorted(MODALITIES)}")
+    selected = [MODALITIES[n] for n in dict.fromkeys(names)]
+    missing = [m.title for m in selected if not m.model]
+    if missing:
+        raise HTTPException(status_code=500, detail=f"Vision model not loaded for: {', '.join(missing)}.")
+
+    fmt = negotiate(request)
+    try:
+        budget_ms = parse_budget_ms(request, budget_ms)
+        policies = {m.name: m.explain_policy.parse(explain) if explain else None for m in selected}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # One clock for the whole request; each modality predicts its stage costs from its own history
+    deadlines = {m.name: Deadline(budget_ms, m.name) if budget_ms else None for m in selected}
+    study_ids = {m.name: uuid.uuid4().hex if STUDY_STORE_ENABLED else None for m in selected}
+    options = {}
+
+    def make_options(modality):
+        options[modality.name] = PredictOptions(
+            heatmap_mode=heatmap_mode, cam_dtype=cam_dtype, binary=is_binary(fmt),
+            deadline=deadlines[modality.name], explain=policies[modality.name], study_id=study_ids[modality.name],
+            tta=tta,
+        )
+        return options[modality.name]
+
+    async def compute(upload):
+        result = await run_analysis(selected, upload, make_options)
+        if STUDY_STORE_ENABLED:
+            for name, modality_result in result["modalities"].items():
+                modality_result["study_id"] = await store_study(MODALITIES[name], modality_result, patient_id,
+                                                                options[name])
+        return result
+
+    with start_trace(request, ANALYZE, "analyze", filename=file.filename, upload_bytes=file.size,
+                     modalities=[m.name for m in selected]) as trace:
+        headers = {REQUEST_ID_HEADER: trace.request_id}
+        try:
+            # A repeated upload joins the identical analysis already running
+            key = request_key(
+                ANALYZE, file, patient_id, [(m.name, m.release.describe()) for m in selected],
+                heatmap_mode, cam_dtype, is_binary(fmt), budget_ms, explain, tta,
+            ) if INFLIGHT.enabled else None
+            result, shared = await INFLIGHT.run(ANALYZE, key, file, compute)
+        except HTTPException as e:
+            trace.log("rejected", http_status=e.status_code)
+            raise
+        except Exception as e:
+            print(f"❌ Combined Analysis Error: {e}")
+            trace.log("error", error=str(e))
+            return encode_response({"error": str(e)}, "json", status_code=500, headers=headers)
+
+        result = dict(result)
+        trace.log("ok", shared_backbone=result["shared_backbone"],
+                  patient_status={name: r["patient_status"] for name, r in result["modalities"].items()},
+                  coalesced=shared)
+        if trace.debug:
+            result["timings"] = {"request_id": trace.request_id, **trace.timings()}
+        # Only the request that ran the analysis has options (and shadow samples)
+        for modality in selected:
+            if modality.name in options and options[modality.name].shadow is not None:
+                background.add_task(SHADOW.submit, modality, options[modality.name].release,
+                                    *options[modality.name].shadow)
+        return encode_response(result, fmt, headers=headers)
@@ -0,0 +1,143 @@
+import os
+import uuid
+from typing import List
+from fastapi import APIRouter, BackgroundTasks, File, Form, UploadFile, HTTPException, Request, Query
+
+from modalities.pipeline import (
+    build_knowledge_vectors, run_prediction, run_classification, find_similar, store_study, PredictOptions
+)
+from modalities.shadow import SHADOW
+from utils.tracing import start_trace, REQUEST_ID_HEADER
+from utils.serialization import negotiate, is_binary, encode_response
+from utils.budget import Deadline, parse_budget_ms
+from utils.study_store import STUDY_STORE_ENABLED
+from utils.coalescing import INFLIGHT, request_key
+
+# Uploads accepted by one /classify call (each still bounded by MAX_UPLOAD_MB overall)
+CLASSIFY_MAX_FILES = int(os.getenv("CLASSIFY_MAX_FILES", "64"))
+
+
+def build_router(modality) -> APIRouter:
+    """
+    Builds the HTTP surface for one modality on top of the shared pipeline.
+    Loads the modality's model on import, like the original per-modality routers.
+    """
+    router = APIRouter(prefix=f"/{modality.name}", tags=[f"{modality.title} Diagnostics"])
+    modality.load()
+
+    @router.on_event("startup")
+    async def startup_event():
+        await build_knowledge_vectors(modality)
+
+    @router.post("/predict", name=f"predict_{modality.name}")
+    async def predict(
+        request: Request,
+        background: BackgroundTasks,
+        file: UploadFile = File(...),
+        patient_id: str = Form(None, description="Stores the study under this patient for the portals"),
+        heatmap_mode: str = Query("overlay", pattern="^(overlay|raw)$",
+                                  description="overlay: rendered images; raw: normalized CAM grids"),
+        cam_dtype: str = Query("uint8", pattern="^(uint8|float16)$", description="Element type of raw CAM grids"),
+        budget_ms: float = Query(None, gt=0, description="Latency budget; overrides X-Latency-Budget-Ms and the server default"),
+        explain: str = Query(None, description="Heatmap policy override: none, all, combined, top:<k>, min:<p> (comma-separated)"),
+        tta: bool = Query(False, description="Average flipped/cropped views when a finding is near its threshold"),
+    ):
+        if not modality.model:
+            raise HTTPException(status_code=500, detail=f"{modality.title} Vision model is not loaded.")
+
+        # Accept: application/msgpack (or application/cbor) selects a binary body
+        fmt = negotiate(request)
+        try:
+            budget_ms = parse_budget_ms(request, budget_ms)
+            explain_policy = modality.explain_policy.parse(explain) if explain else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Stages that would overrun the budget are skipped or downgraded, never the vision result
+        deadline = Deadline(budget_ms, modality.name) if budget_ms else None
+        options = PredictOptions(heatmap_mode=heatmap_mode, cam_dtype=cam_dtype, binary=is_binary(fmt),
+                                 deadline=deadline, explain=explain_policy, tta=tta,
+                                 study_id=uuid.uuid4().hex if STUDY_STORE_ENABLED else None)
+
+        async def compute(upload):
+            result = await run_prediction(modality, upload, options)
+            if STUDY_STORE_ENABLED:
+                result["study_id"] = await store_study(modality, result, patient_id, options)
+            return result
+
+        with start_trace(request, modality.name, "predict", filename=file.filename, upload_bytes=file.size) as trace:
+            headers = {REQUEST_ID_HEADER: trace.request_id}
+            try:
+                # A double-click or client retry of the same upload joins the request already running
+                key = request_key(
+                    modality.name, file, patient_id, heatmap_mode, cam_dtype, options.binary,
+                    budget_ms, explain, tta, modality.release.describe(),
+                ) if INFLIGHT.enabled else None
+                result, shared = await INFLIGHT.run(modality.name, key, file, compute)
+            except HTTPException as e:
+                trace.log("rejected", http_status=e.status_code)
+                raise
+            except Exception as e:
+                print(f"❌ {modality.title} API Error: {e}")
+                trace.log("error", error=str(e))
+                return encode_response({"error": str(e)}, "json", status_code=500, headers=headers)
+
+            result = dict(result)
+            trace.log("ok", patient_status=result["patient_status"],
+                      flagged=[c["condition"] for c in result["flagged_conditions"]],
+                      budget=result.get("budget"), coalesced=shared)
+            if trace.debug:
+                result["timings"] = {"request_id": trace.request_id, **trace.timings()}
+            if options.shadow is not None:
+                background.add_task(SHADOW.submit, modality, options.release, *options.shadow)
+            return encode_response(result, fmt, headers=headers)
+
+    @router.post("/classify", name=f"classify_{modality.name}")
+    async def classify(request: Request, files: List[UploadFile] = File(...)):
+        """Triage: thresholded findings and probabilities only, for one or more uploads."""
+        if not modality.model:
+            raise HTTPException(status_code=500, detail=f"{modality.title} Vision model is not loaded.")
+        if len(files) > CLASSIFY_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"At most {CLASSIFY_MAX_FILES} files per request.")
+
+        fmt = negotiate(request)
+        with start_trace(request, modality.name, "classify", files=len(files)) as trace:
+            headers = {REQUEST_ID_HEADER: trace.request_id}
+            try:
+                body = await run_classification(modality, files)
+            except HTTPException as e:
+                trace.log("rejected", http_status=e.status_code)
+                raise
+            except Exception as e:
+                print(f"❌ {modality.title} Classify Error: {e}")
+                trace.log("error", error=str(e))
+                return encode_response({"error": str(e)}, "json", status_code=500, headers=headers)
+
+            trace.log("ok", flagged=[[c["condition"] for c in r["flagged_conditions"]] for r in body["results"]])
+            if trace.debug:
+                body["timings"] = {"request_id": trace.request_id, **trace.timings()}
+            return encode_response(body, fmt, headers=headers)
+
+    @router.post("/similar", name=f"similar_{modality.name}")
+    async def similar(request: Request, file: UploadFile = File(...), k: int = Query(10, ge=1, le=100)):
+        """Prior stored studies that look most like the upload (pooled DenseNet features, cosine)."""
+        if not modality.model:
+            raise HTTPException(status_code=500, detail=f"{modality.title} Vision model is not loaded.")
+
+        with start_trace(request, modality.name, "similar", filename=file.filename) as trace:
+            headers = {REQUEST_ID_HEADER: trace.request_id}
+            try:
+                result = await find_similar(modality, file, k)
+            except HTTPException as e:
+                trace.log("rejected", http_status=e.status_code)
+                raise
+            except Exception as e:
+                print(f"❌ {modality.title} Similar-Case Error: {e}")
+                trace.log("error", error=str(e))
+                return encode_response({"error": str(e)}, "json", status_code=500, headers=headers)
+
+            trace.log("ok", matches=len(result["matches"]))
+            if trace.debug:
+                result["timings"] = {"request_id": trace.request_id, **trace.timings()}
+            return encode_response(result, negotiate(request), headers=headers)
+
+    return router
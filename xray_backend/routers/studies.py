@@ -0,0 +1,69 @@
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi.responses import FileResponse
+
+from utils.access import STUDY_TOKEN_SECRET, Viewer, verify_token
+from utils.study_store import STUDIES, STUDY_PAGE_MAX
+
+
+def require_viewer(request: Request) -> Viewer:
+    """The caller behind the request's bearer token (see utils/access.py)."""
+    if not STUDY_TOKEN_SECRET:
+        raise HTTPException(status_code=403, detail="Study endpoints are disabled (set STUDY_TOKEN_SECRET).")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token.", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return verify_token(token.strip())
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+
+router = APIRouter(prefix="/studies", tags=["Study History"], dependencies=[Depends(require_viewer)])
+
+
+# Plain def endpoints: FastAPI runs them in its thread pool, each thread with its own SQLite connection
+@router.get("")
+def list_studies(
+    patient_id: str = Query(None),
+    modality: str = Query(None),
+    condition: str = Query(None, description="Only studies that flagged this condition"),
+    since: float = Query(None, description="Unix timestamp (inclusive)"),
+    until: float = Query(None, description="Unix timestamp (exclusive)"),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=STUDY_PAGE_MAX),
+    viewer: Viewer = Depends(require_viewer),
+):
+    """Newest-first, paginated study summaries; no model is touched. Patients only see their own."""
+    if not viewer.is_clinician:
+        if patient_id is not None and patient_id != viewer.subject:
+            raise HTTPException(status_code=403, detail="Patients can only list their own studies.")
+        patient_id = viewer.subject
+    try:
+        return STUDIES.query(patient_id=patient_id, modality=modality, condition=condition,
+                             since=since, until=until, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{study_id}")
+def get_study(study_id: str, viewer: Viewer = Depends(require_viewer)):
+    """A stored predict result; heatmaps are listed by name and served below."""
+    study = STUDIES.get(study_id)
+    # Another patient's study is reported as missing, not as forbidden
+    if study is None or not viewer.may_see(study["patient_id"]):
+        raise HTTPException(status_code=404, detail="Study not found.")
+    study["heatmaps"] = {name: f"/studies/{study_id}/heatmaps/{quote(name)}" for name in study["heatmaps"]}
+    return study
+
+
+@router.get("/{study_id}/heatmaps/{name}")
+def get_heatmap(study_id: str, name: str, viewer: Viewer = Depends(require_viewer)):
+    blob = STUDIES.heatmap(study_id, name)
+    if blob is not None and not viewer.is_clinician:
+        owner = STUDIES.summaries([study_id]).get(study_id, {}).get("patient_id")
+        blob = blob if viewer.may_see(owner) else None
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Heatmap not found.")
+    path, mime = blob
+    return FileResponse(path, media_type=mime, headers={"Cache-Control": "private, max-age=31536000, immutable"})
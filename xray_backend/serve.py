@@ -0,0 +1,75 @@
+"""
+Production launcher: one supervisor process and RUNTIME.workers API workers.
+
+    WEB_WORKERS=4 CPU_AFFINITY=auto python serve.py
+
+The supervisor only binds the listening socket and watches the workers; it
+never imports main6, so the models and the TensorFlow/OpenCV pools exist
+once per worker rather than once more in the parent. Each worker gets its
+own WORKER_INDEX before it imports the app, which CPU_AFFINITY=auto uses to
+pin it to its own slice of the CPUs. A worker that dies is restarted with
+the same index.
+"""
+import os
+import signal
+import threading
+import multiprocessing
+
+import uvicorn
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+# Seconds a worker gets to finish in-flight requests on shutdown
+GRACEFUL_SHUTDOWN_S = float(os.getenv("GRACEFUL_SHUTDOWN_S", "30"))
+
+
+def run_worker(index: int, sockets: list):
+    """Worker entry point (a freshly spawned interpreter): the app loads here."""
+    os.environ["WORKER_INDEX"] = str(index)
+    config = uvicorn.Config("main6:app", host=HOST, port=PORT)
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+def start_worker(index: int, sockets: list):
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_worker, args=(index, sockets), name=f"xinsight-worker-{index}"
+    )
+    process.start()
+    return process
+
+
+def main():
+    # Imported here, not at module level: spawned workers import this module
+    # too, and must read the config only after their WORKER_INDEX is set.
+    # Index 0 also stands for a single in-process worker.
+    os.environ.setdefault("WORKER_INDEX", "0")
+    from utils.runtime import RUNTIME
+
+    if RUNTIME.workers == 1:
+        uvicorn.run("main6:app", host=HOST, port=PORT)
+        return
+
+    sockets = [uvicorn.Config("main6:app", host=HOST, port=PORT).bind_socket()]
+    workers = {i: start_worker(i, sockets) for i in range(RUNTIME.workers)}
+    print(f"✅ Supervisor {os.getpid()} started {len(workers)} workers on {HOST}:{PORT}.")
+
+    stopping = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopping.set())
+
+    while not stopping.wait(1.0):
+        for index, process in workers.items():
+            if not process.is_alive():
+                print(f"⚠️ Worker {index} exited with code {process.exitcode}; restarting.")
+                workers[index] = start_worker(index, sockets)
+
+    for process in workers.values():
+        process.terminate()
+    for process in workers.values():
+        process.join(GRACEFUL_SHUTDOWN_S)
+        if process.is_alive():
+            process.kill()
+
+
+if __name__ == "__main__":
+    main()
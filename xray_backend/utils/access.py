@@ -0,0 +1,89 @@
+"""
+Bearer tokens for the study history, which serves patient data.
+
+    python -m utils.access --role patient --subject 1
+
+prints a token for patient 1 (STUDY_TOKEN_SECRET must be set). A token is
+base64url(JSON claims) "." base64url(HMAC-SHA256 of the claims); patient
+tokens only reach the studies of their own subject, clinician tokens
+(doctor, admin) reach every study.
+"""
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import argparse
+
+# Study endpoints stay disabled unless a signing secret is configured
+STUDY_TOKEN_SECRET = os.getenv("STUDY_TOKEN_SECRET")
+STUDY_TOKEN_TTL_S = int(os.getenv("STUDY_TOKEN_TTL_S", str(12 * 3600)))
+
+PATIENT = "patient"
+CLINICIAN_ROLES = ("doctor", "admin")
+ROLES = (PATIENT, *CLINICIAN_ROLES)
+
+
+class Viewer:
+    """The verified caller of a study endpoint."""
+
+    def __init__(self, subject: str, role: str):
+        self.subject = subject
+        self.role = role
+
+    @property
+    def is_clinician(self) -> bool:
+        return self.role in CLINICIAN_ROLES
+
+    def may_see(self, patient_id) -> bool:
+        return self.is_clinician or patient_id == self.subject
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload: str, secret: str) -> str:
+    return _b64(hmac.new(secret.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def issue_token(subject: str, role: str, ttl_s=STUDY_TOKEN_TTL_S, secret=None) -> str:
+    secret = secret or STUDY_TOKEN_SECRET
+    if not secret:
+        raise ValueError("STUDY_TOKEN_SECRET is not set.")
+    if role not in ROLES:
+        raise ValueError(f"Unknown role '{role}'; expected one of {ROLES}.")
+    payload = _b64(json.dumps({"sub": str(subject), "role": role, "exp": int(time.time() + ttl_s)}).encode("utf-8"))
+    return f"{payload}.{_sign(payload, secret)}"
+
+
+def verify_token(token: str, secret=None) -> Viewer:
+    """The Viewer a token was issued to; raises ValueError if it is forged, malformed or expired."""
+    secret = secret or STUDY_TOKEN_SECRET
+    payload, _, signature = token.partition(".")
+    if not secret or not signature or not hmac.compare_digest(signature, _sign(payload, secret)):
+        raise ValueError("Invalid token.")
+    try:
+        claims = json.loads(_unb64(payload))
+        subject, role, expires = str(claims["sub"]), claims["role"], float(claims["exp"])
+    except Exception:
+        raise ValueError("Invalid token.")
+    if role not in ROLES:
+        raise ValueError("Invalid token.")
+    if expires < time.time():
+        raise ValueError("Token expired.")
+    return Viewer(subject, role)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Issue a study history access token")
+    parser.add_argument("--role", choices=ROLES, required=True)
+    parser.add_argument("--subject", required=True, help="Patient id (patients) or staff id (clinicians)")
+    parser.add_argument("--ttl", type=int, default=STUDY_TOKEN_TTL_S, help="Lifetime in seconds")
+    args = parser.parse_args()
+    print(issue_token(args.subject, args.role, args.ttl))
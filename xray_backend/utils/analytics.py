@@ -0,0 +1,218 @@
+import os
+import time
+import threading
+import numpy as np
+
+# --- 1. ANALYTICS CONFIG ---
+# Set ANALYTICS=0 to stop aggregating predictions
+ANALYTICS_ENABLED = os.getenv("ANALYTICS", "1") != "0"
+ANALYTICS_DIR = os.getenv("ANALYTICS_DIR", "data/analytics")
+ANALYTICS_BINS = int(os.getenv("ANALYTICS_BINS", "20"))
+ANALYTICS_DAYS = int(os.getenv("ANALYTICS_DAYS", "365"))
+ANALYTICS_SNAPSHOT_S = float(os.getenv("ANALYTICS_SNAPSHOT_S", "60"))
+
+SECONDS_PER_DAY = 86400
+
+
+# --- 2. INCREMENTAL AGGREGATES ---
+class FindingsAggregates:
+    """
+    Running population statistics for one modality, updated per prediction
+    batch in O(classes^2) and read back without touching individual studies:
+
+    - totals: studies and abnormal studies
+    - hits: threshold hits per class
+    - histograms: per-class probability histograms over [0, 1]
+    - cooccurrence: how often two classes are flagged in the same study
+    - daily ring buffer of study counts and hits, one slot per UTC day
+    """
+
+    def __init__(self, classes, bins=ANALYTICS_BINS, days=ANALYTICS_DAYS):
+        self.classes = list(classes)
+        n = len(self.classes)
+        self.bins = bins
+        self.days = days
+        self.edges = np.linspace(0.0, 1.0, bins + 1)
+        self.total = np.zeros((), dtype=np.int64)
+        self.abnormal = np.zeros((), dtype=np.int64)
+        self.hits = np.zeros(n, dtype=np.int64)
+        self.histograms = np.zeros((n, bins), dtype=np.int64)
+        self.cooccurrence = np.zeros((n, n), dtype=np.int64)
+        self.day_slots = np.full(days, -1, dtype=np.int64)
+        self.daily_studies = np.zeros(days, dtype=np.int64)
+        self.daily_hits = np.zeros((days, n), dtype=np.int64)
+        self.updated_at = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, preds, flagged, abnormal, now=None):
+        """
+        preds: (batch, classes) probabilities; flagged: matching boolean
+        threshold hits; abnormal: (batch,) boolean patient status.
+        """
+        preds = np.asarray(preds, dtype=np.float32)
+        flagged = np.asarray(flagged, dtype=bool)
+        now = time.time() if now is None else now
+        day = int(now // SECONDS_PER_DAY)
+        slot = day % self.days
+
+        n = len(self.classes)
+        # Offset each class's bins so one bincount fills the whole (classes, bins) table
+        bin_index = np.clip((preds * self.bins).astype(np.int64), 0, self.bins - 1) + np.arange(n) * self.bins
+        histograms = np.bincount(bin_index.ravel(), minlength=n * self.bins).reshape(n, self.bins)
+        hits = flagged.sum(axis=0)
+        f = flagged.astype(np.int64)
+        cooccurrence = f.T @ f
+        with self._lock:
+            self.total += len(preds)
+            self.abnormal += int(np.count_nonzero(abnormal))
+            self.hits += hits
+            self.histograms += histograms
+            self.cooccurrence += cooccurrence
+            if self.day_slots[slot] != day:
+                self.day_slots[slot] = day
+                self.daily_studies[slot] = 0
+                self.daily_hits[slot] = 0
+            self.daily_studies[slot] += len(preds)
+            self.daily_hits[slot] += hits
+            self.updated_at = now
+
+    # Dashboard queries: constant cost in the number of studies
+    def summary(self) -> dict:
+        with self._lock:
+            total = int(self.total)
+            rates = self.hits / total if total else np.zeros(len(self.classes))
+            return {
+                "studies": total,
+                "abnormal": int(self.abnormal),
+                "abnormal_rate": float(self.abnormal) / total if total else 0.0,
+                "prevalence": {c: {"hits": int(h), "rate": round(float(r), 6)}
+                               for c, h, r in zip(self.classes, self.hits, rates)},
+                "updated_at": self.updated_at,
+            }
+
+    def distributions(self) -> dict:
+        with self._lock:
+            return {
+                "bin_edges": self.edges.round(6).tolist(),
+                "histograms": dict(zip(self.classes, self.histograms.tolist())),
+            }
+
+    def cooccurrence_matrix(self) -> dict:
+        with self._lock:
+            return {"classes": self.classes, "counts": self.cooccurrence.tolist()}
+
+    def timeline(self, days=30, now=None) -> dict:
+        """Per-day studies and hit rates for the last `days` days (oldest first)."""
+        days = max(1, min(days, self.days))
+        today = int((time.time() if now is None else now) // SECONDS_PER_DAY)
+        wanted = np.arange(today - days + 1, today + 1)
+        slots = wanted % self.days
+        with self._lock:
+            live = self.day_slots[slots] == wanted
+            studies = np.where(live, self.daily_studies[slots], 0)
+            hits = np.where(live[:, None], self.daily_hits[slots], 0)
+        rates = np.divide(hits, studies[:, None], out=np.zeros(hits.shape), where=studies[:, None] > 0)
+        return {
+            "days": [time.strftime("%Y-%m-%d", time.gmtime(d * SECONDS_PER_DAY)) for d in wanted],
+            "studies": studies.tolist(),
+            "hit_rates": {c: rates[:, i].round(6).tolist() for i, c in enumerate(self.classes)},
+        }
+
+    # Snapshots
+    def state(self) -> dict:
+        with self._lock:
+            return {
+                "classes": np.array(self.classes), "total": self.total.copy(), "abnormal": self.abnormal.copy(),
+                "hits": self.hits.copy(), "histograms": self.histograms.copy(),
+                "cooccurrence": self.cooccurrence.copy(), "day_slots": self.day_slots.copy(),
+                "daily_studies": self.daily_studies.copy(), "daily_hits": self.daily_hits.copy(),
+                "updated_at": np.float64(self.updated_at),
+            }
+
+    def restore(self, state):
+        """Loads a snapshot; ignored if the class list or layout has changed since."""
+        if list(state["classes"]) != self.classes or state["histograms"].shape != self.histograms.shape \
+                or state["day_slots"].shape != self.day_slots.shape:
+            print("⚠️ Analytics snapshot does not match the current classes/layout; starting fresh.")
+            return
+        with self._lock:
+            for field in ("total", "abnormal", "hits", "histograms", "cooccurrence",
+                          "day_slots", "daily_studies", "daily_hits"):
+                getattr(self, field)[...] = state[field]
+            self.updated_at = float(state["updated_at"])
+
+
+# --- 3. REGISTRY AND SNAPSHOTS ---
+class Analytics:
+    """Per-modality aggregates with periodic atomic snapshots to ANALYTICS_DIR."""
+
+    def __init__(self, directory=ANALYTICS_DIR, interval_s=ANALYTICS_SNAPSHOT_S):
+        self.directory = directory
+        self.interval_s = interval_s
+        self.aggregates = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _path(self, modality: str) -> str:
+        return os.path.join(self.directory, f"{modality}.npz")
+
+    def get(self, modality: str, classes=None):
+        """The aggregates for a modality, restored from its snapshot on first use."""
+        aggregates = self.aggregates.get(modality)
+        if aggregates is None and classes is not None:
+            with self._lock:
+                aggregates = self.aggregates.get(modality)
+                if aggregates is None:
+                    aggregates = FindingsAggregates(classes)
+                    if os.path.exists(self._path(modality)):
+                        try:
+                            with np.load(self._path(modality)) as state:
+                                aggregates.restore(state)
+                        except Exception as e:
+                            print(f"❌ Analytics snapshot for {modality} unreadable: {e}")
+                    self.aggregates[modality] = aggregates
+        return aggregates
+
+    def record(self, modality, preds, flagged, abnormal):
+        if not ANALYTICS_ENABLED:
+            return
+        self.get(modality.name, modality.classes).update(preds, flagged, abnormal)
+        self._dirty.add(modality.name)
+
+    def snapshot(self):
+        """Writes every changed modality's aggregates (tmp file + rename, so readers never see a partial file)."""
+        dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for name in dirty:
+            path = self._path(name)
+            tmp = f"{path}.tmp.npz"
+            try:
+                np.savez(tmp, **self.aggregates[name].state())
+                os.replace(tmp, path)
+            except Exception as e:
+                self._dirty.add(name)
+                print(f"❌ Analytics snapshot for {name} failed: {e}")
+
+    def start(self):
+        """Starts the background snapshot thread (idempotent)."""
+        if not ANALYTICS_ENABLED or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(self.interval_s):
+                self.snapshot()
+
+        self._thread = threading.Thread(target=run, name="analytics-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.snapshot()
+
+
+ANALYTICS = Analytics()
@@ -0,0 +1,96 @@
+import os
+import asyncio
+import numpy as np
+
+from utils.metrics import Histogram
+
+# Rows per model call and how long the first request waits for company
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+BATCH_ROWS = Histogram(
+    "xinsight_batch_rows",
+    "Rows per batched model call.",
+    ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent inference requests into one model call.
+
+    submit() takes an array whose first axis is the batch (a single study or
+    a whole multi-file upload) and resolves to the matching rows of the
+    output. A single worker per event loop drains the queue: it takes the
+    first waiting request, gathers more for up to max_wait_ms or until
+    max_batch rows are queued, and runs run_batch off the loop. The worker
+    exits once the queue is empty and submit() starts a new one, so an idle
+    batcher holds no task (and nothing keeps a retired model alive).
+    """
+
+    def __init__(self, name, run_batch, max_batch=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000.0
+        self._queue = None
+        self._worker = None
+        self._loop = None
+
+    def _ensure_worker(self):
+        # asyncio primitives bind to one loop; rebuild if the app runs on a new one
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            if self._loop is not loop:
+                self._queue = asyncio.Queue()
+                self._loop = loop
+            self._worker = loop.create_task(self._drain())
+        return self._queue
+
+    async def submit(self, rows: np.ndarray) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        self._ensure_worker().put_nowait((rows, future))
+        return await future
+
+    async def _collect(self) -> list:
+        pending = [await self._queue.get()]
+        size = len(pending[0][0])
+        deadline = asyncio.get_running_loop().time() + self.max_wait_s
+        while size < self.max_batch:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    async def _drain(self):
+        while True:
+            await self._run(await self._collect())
+            if self._queue.empty():
+                return
+
+    async def _run(self, pending):
+        # Requests cancelled while queued (client gone) are dropped
+        pending = [(rows, future) for rows, future in pending if not future.done()]
+        if not pending:
+            return
+        try:
+            batch = np.concatenate([rows for rows, _ in pending]) if len(pending) > 1 else pending[0][0]
+            BATCH_ROWS.observe(len(batch), batcher=self.name)
+            outputs = await asyncio.to_thread(self.run_batch, batch)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        offset = 0
+        for rows, future in pending:
+            if not future.done():
+                future.set_result(outputs[offset:offset + len(rows)])
+            offset += len(rows)
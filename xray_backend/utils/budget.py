@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+# --- 1. BUDGET CONFIG ---
+# Server-side default budget for predict requests, in milliseconds (0 = none).
+# Clients override it per request with the header or the budget_ms query param.
+LATENCY_BUDGET_MS = float(os.getenv("LATENCY_BUDGET_MS", "0"))
+BUDGET_HEADER = "x-latency-budget-ms"
+
+# Expected stage cost = this quantile of the most recent successful samples
+STATS_WINDOW = int(os.getenv("BUDGET_STATS_WINDOW", "100"))
+STATS_QUANTILE = float(os.getenv("BUDGET_STATS_QUANTILE", "90"))
+STATS_MIN_SAMPLES = int(os.getenv("BUDGET_STATS_MIN_SAMPLES", "5"))
+# Samples older than this are ignored. A stage the budget keeps skipping
+# records nothing new, so once its samples age out it is assumed to fit
+# again and runs to re-measure, instead of being starved for good.
+STATS_MAX_AGE_S = float(os.getenv("BUDGET_STATS_MAX_AGE_S", "300"))
+
+
+# --- 2. RECENT STAGE LATENCY ---
+class StageStats:
+    """
+    Sliding window of recent stage durations per (modality, stage): completed
+    runs, plus the elapsed time of runs cut off by a budget (a lower bound).
+    """
+
+    def __init__(self, window=STATS_WINDOW, max_age_s=STATS_MAX_AGE_S):
+        self.window = window
+        self.max_age_s = max_age_s
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, modality: str, stage: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get((modality, stage))
+            if samples is None:
+                samples = self._samples[(modality, stage)] = deque(maxlen=self.window)
+            samples.append((time.monotonic(), seconds))
+
+    def expected(self, modality: str, stage: str):
+        """Expected duration in seconds, or None until enough recent samples exist."""
+        oldest = time.monotonic() - self.max_age_s
+        with self._lock:
+            samples = self._samples.get((modality, stage))
+            if samples is None:
+                return None
+            while samples and samples[0][0] < oldest:
+                samples.popleft()
+            if len(samples) < STATS_MIN_SAMPLES:
+                return None
+            values = np.fromiter((seconds for _, seconds in samples), dtype=np.float64, count=len(samples))
+        return float(np.percentile(values, STATS_QUANTILE))
+
+
+STAGE_STATS = StageStats()
+
+
+# --- 3. PER-REQUEST DEADLINE ---
+class Deadline:
+    """
+    Remaining time for one request, and a record of the response parts that
+    were omitted or downgraded to stay within it.
+    """
+
+    def __init__(self, budget_ms: float, modality: str, stats=STAGE_STATS):
+        self.budget_ms = budget_ms
+        self.modality = modality
+        self.stats = stats
+        self.expires = time.monotonic() + budget_ms / 1000.0
+        self.omitted = {}
+        self.downgraded = {}
+
+    def remaining_s(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def affordable(self, stage: str, count=1, extra=0.0) -> int:
+        """
+        How many of `count` runs of a stage fit in the remaining budget after
+        reserving `extra` seconds. Stages with no history are assumed to fit.
+        """
+        cost = self.stats.expected(self.modality, stage)
+        remaining = self.remaining_s() - extra
+        if remaining <= 0:
+            return 0
+        if not cost:
+            return count
+        return min(count, int(remaining // cost))
+
+    def fits(self, stage: str) -> bool:
+        return self.affordable(stage) >= 1
+
+    def expected_s(self, stage: str) -> float:
+        return self.stats.expected(self.modality, stage) or 0.0
+
+    def omit(self, part: str, reason: str):
+        self.omitted[part] = reason
+
+    def downgrade(self, part: str, detail: str):
+        self.downgraded[part] = detail
+
+    def summary(self) -> dict:
+        return {
+            "budget_ms": self.budget_ms,
+            "remaining_ms": round(self.remaining_s() * 1000.0, 3),
+            "omitted": self.omitted,
+            "downgraded": self.downgraded,
+        }
+
+
+def parse_budget_ms(request, budget_ms=None):
+    """
+    The request's budget in milliseconds: the budget_ms query param, then the
+    X-Latency-Budget-Ms header, then LATENCY_BUDGET_MS. None means unlimited.
+    Raises ValueError on a malformed header.
+    """
+    if budget_ms is None:
+        header = request.headers.get(BUDGET_HEADER)
+        if header is not None:
+            try:
+                budget_ms = float(header)
+            except ValueError:
+                budget_ms = 0.0
+            if not budget_ms > 0:
+                raise ValueError(f"{BUDGET_HEADER} must be a positive number of milliseconds")
+    if budget_ms is None and LATENCY_BUDGET_MS > 0:
+        budget_ms = LATENCY_BUDGET_MS
+    return budget_ms
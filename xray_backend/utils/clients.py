@@ -0,0 +1,233 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+import ollama
+from huggingface_hub import InferenceClient
+
+from utils.metrics import Counter, Gauge
+
+# --- 1. BACKEND CONFIG ---
+# Each backend gets a timeout, a concurrency cap, a retry budget with jittered
+# exponential backoff, and a circuit breaker that fails fast once it trips.
+OLLAMA_HOST = os.getenv("OLLAMA_HOST")
+OLLAMA_TIMEOUT_S = float(os.getenv("OLLAMA_TIMEOUT_S", "120"))
+OLLAMA_CONNECT_TIMEOUT_S = float(os.getenv("OLLAMA_CONNECT_TIMEOUT_S", "3"))
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "4"))
+OLLAMA_RETRIES = int(os.getenv("OLLAMA_RETRIES", "1"))
+
+HF_TOKEN = os.getenv("HF_TOKEN")
+HF_TIMEOUT_S = float(os.getenv("HF_TIMEOUT_S", "15"))
+HF_MAX_CONCURRENCY = int(os.getenv("HF_MAX_CONCURRENCY", "8"))
+HF_RETRIES = int(os.getenv("HF_RETRIES", "2"))
+
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_S = float(os.getenv("BREAKER_RESET_S", "30"))
+RETRY_BASE_S = float(os.getenv("RETRY_BASE_S", "0.2"))
+RETRY_MAX_S = float(os.getenv("RETRY_MAX_S", "2.0"))
+
+BACKEND_CALLS = Counter(
+    "xinsight_backend_calls_total",
+    "External backend calls by result (ok, error, timeout, rejected, cancelled).",
+    ("backend", "result"),
+)
+BREAKER_OPEN = Gauge(
+    "xinsight_backend_circuit_open",
+    "1 while a backend's circuit breaker is open.",
+    ("backend",),
+)
+
+
+class BackendUnavailable(Exception):
+    """Raised without contacting the backend while its circuit breaker is open."""
+
+
+# --- 2. CIRCUIT BREAKER ---
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds, then lets a single half-open probe through.
+    A cancelled probe is neutral: it neither closes nor re-opens the
+    breaker, and the next call probes instead.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_S):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """None to reject the call, else the state it was let through in ("closed" or "half-open" for the probe)."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return state
+            if state == "half-open" and not self.probing:
+                self.probing = True
+                return state
+            return None
+
+    def release_probe(self):
+        """Frees the half-open slot after a probe that ended without a verdict (cancelled)."""
+        with self._lock:
+            self.probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+        BREAKER_OPEN.set(0, backend=self.name)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+                tripped = True
+            else:
+                tripped = False
+        if tripped:
+            BREAKER_OPEN.set(1, backend=self.name)
+
+
+def _is_retryable(exc) -> bool:
+    """Client errors (4xx other than 429) are not worth retrying."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status != 429:
+        return False
+    return True
+
+
+# --- 3. RESILIENT BACKEND WRAPPER ---
+class Backend:
+    """Bounded-concurrency, timed, retried and circuit-broken access to one service."""
+
+    def __init__(self, name, timeout, max_concurrency, retries):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.max_concurrency = max_concurrency
+        self.breaker = CircuitBreaker(name)
+        self._semaphore = None
+        self._loop = None
+
+    def _get_semaphore(self):
+        # asyncio primitives bind to one loop; rebuild if the app runs on a new one
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def call(self, make_call):
+        """
+        Awaits make_call() (a zero-argument coroutine factory) under the
+        backend's limits. Raises BackendUnavailable while the breaker is open,
+        otherwise the last error once retries are exhausted.
+        """
+        admitted = self.breaker.allow()
+        if admitted is None:
+            BACKEND_CALLS.inc(backend=self.name, result="rejected")
+            raise BackendUnavailable(f"{self.name} circuit is open; failing fast.")
+
+        attempt = 0
+        try:
+            while True:
+                try:
+                    async with self._get_semaphore():
+                        result = await asyncio.wait_for(make_call(), timeout=self.timeout)
+                    self.breaker.record_success()
+                    BACKEND_CALLS.inc(backend=self.name, result="ok")
+                    return result
+                except Exception as e:
+                    timed_out = isinstance(e, asyncio.TimeoutError)
+                    BACKEND_CALLS.inc(backend=self.name, result="timeout" if timed_out else "error")
+                    if attempt >= self.retries or not _is_retryable(e):
+                        self.breaker.record_failure()
+                        raise
+                    attempt += 1
+                    # Full jitter keeps retries from synchronizing across workers
+                    await asyncio.sleep(random.uniform(0, min(RETRY_MAX_S, RETRY_BASE_S * 2 ** attempt)))
+        except asyncio.CancelledError:
+            # The caller's budget ran out or its client left: no verdict on the
+            # backend, but a cancelled probe must not hold the half-open slot
+            BACKEND_CALLS.inc(backend=self.name, result="cancelled")
+            if admitted == "half-open":
+                self.breaker.release_probe()
+            raise
+
+
+OLLAMA = Backend("ollama", OLLAMA_TIMEOUT_S, OLLAMA_MAX_CONCURRENCY, OLLAMA_RETRIES)
+EMBEDDINGS = Backend("embeddings", HF_TIMEOUT_S, HF_MAX_CONCURRENCY, HF_RETRIES)
+
+# --- 4. SHARED CLIENTS ---
+# One keep-alive HTTP pool for Ollama; one InferenceClient (whose HTTP session
+# is pooled by huggingface_hub) for every modality's embeddings.
+_ollama_client = None
+_ollama_loop = None
+embedding_client = InferenceClient(api_key=HF_TOKEN, timeout=HF_TIMEOUT_S)
+# The embedding calls are blocking. A timed-out call's thread runs on until the
+# client's own HF_TIMEOUT_S ends it. A dedicated pool keeps those threads capped at
+# HF_MAX_CONCURRENCY and out of the default executor. A call that times out
+# while still queued is dropped before it starts.
+_embedding_pool = ThreadPoolExecutor(max_workers=HF_MAX_CONCURRENCY, thread_name_prefix="hf-embed")
+
+
+def get_ollama_client():
+    """The pooled async Ollama client for the running event loop."""
+    global _ollama_client, _ollama_loop
+    loop = asyncio.get_running_loop()
+    if _ollama_client is None or _ollama_loop is not loop:
+        _ollama_loop = loop
+        _ollama_client = ollama.AsyncClient(
+            host=OLLAMA_HOST,
+            timeout=httpx.Timeout(OLLAMA_TIMEOUT_S, connect=OLLAMA_CONNECT_TIMEOUT_S),
+            limits=httpx.Limits(max_connections=OLLAMA_MAX_CONCURRENCY * 2,
+                                max_keepalive_connections=OLLAMA_MAX_CONCURRENCY),
+        )
+    return _ollama_client
+
+
+async def chat(model: str, messages: list) -> dict:
+    """ollama.chat through the pooled async client and the Ollama backend limits."""
+    client = get_ollama_client()
+    return await OLLAMA.call(lambda: client.chat(model=model, messages=messages))
+
+
+async def feature_extraction(text, model: str):
+    """
+    InferenceClient.feature_extraction on the embedding thread pool, under
+    the embedding limits. text may be a list of texts, embedded in one request: the response
+    then holds one feature array per text.
+    """
+    return await EMBEDDINGS.call(
+        lambda: asyncio.get_running_loop().run_in_executor(
+            _embedding_pool, lambda: embedding_client.feature_extraction(text, model=model))
+    )
+
+
+async def close_clients():
+    """Closes the Ollama connection pool (run at shutdown)."""
+    global _ollama_client, _ollama_loop
+    if _ollama_client is not None and _ollama_loop is asyncio.get_running_loop():
+        await _ollama_client.close()
+    _ollama_client, _ollama_loop = None, None
@@ -0,0 +1,133 @@
+import os
+import asyncio
+import hashlib
+
+from utils.uploads import detach_upload, upload_digest, upload_size
+from utils.metrics import Counter, Gauge
+from utils.tracing import current_trace
+
+# --- 1. COALESCING CONFIG ---
+# Identical uploads (same bytes, endpoint and parameters) that arrive while the
+# first is still being processed share its result instead of recomputing it.
+# Uploads are only hashed when one of the same size is already in flight.
+# Set COALESCE_REQUESTS=0 to process every request independently.
+COALESCE_ENABLED = os.getenv("COALESCE_REQUESTS", "1") != "0"
+
+COALESCED = Counter(
+    "xinsight_coalesced_requests_total",
+    "Requests by coalescing role: leader (computed the result) or follower (shared an in-flight one).",
+    ("modality", "role"),
+)
+COALESCING = Gauge(
+    "xinsight_coalescing_in_flight",
+    "Distinct in-flight computations that identical requests may join.",
+    ("modality",),
+)
+
+
+def request_key(scope: str, file, *params) -> str:
+    """
+    Coalescing key for one upload's size plus every parameter that shapes
+    the response. Cheap: the bytes are only hashed once another request
+    with the same key is in flight (see SingleFlight.run).
+    """
+    return hashlib.sha1(repr((scope, upload_size(file), params)).encode("utf-8")).hexdigest()
+
+
+# --- 2. SINGLE-FLIGHT ---
+class Flight:
+    """One in-flight computation: its task, the detached upload it reads and the leader's trace."""
+
+    def __init__(self, task, source, trace):
+        self.task = task
+        self.source = source
+        self.trace = trace
+        self._digest = None
+
+    async def digest(self):
+        """SHA-1 of the leader's upload, hashed once, on the first request that needs to compare."""
+        if self._digest is None:
+            self._digest = asyncio.ensure_future(asyncio.to_thread(upload_digest, self.source))
+        try:
+            return await asyncio.shield(self._digest)
+        except Exception:
+            return None
+
+    def close(self):
+        # A digest still being computed reads the upload: close it once that is done
+        if self._digest is not None and not self._digest.done():
+            self._digest.add_done_callback(lambda _: self.source.file.close())
+        else:
+            self.source.file.close()
+
+
+class SingleFlight:
+    """
+    One in-flight computation per distinct upload and parameters. The first
+    caller (the leader) starts it as its own task; callers arriving with the
+    same upload before it finishes await that task. The task is shielded, so
+    a caller that disconnects does not cancel the work others are waiting on.
+    Only the in-flight window is covered: nothing is kept once the task
+    completes.
+    """
+
+    def __init__(self, enabled=COALESCE_ENABLED):
+        self.enabled = enabled
+        # {request_key: [Flight]}; uploads of equal size are told apart by digest
+        self._calls = {}
+
+    def __len__(self):
+        return sum(len(flights) for flights in self._calls.values())
+
+    async def run(self, modality: str, key, file, compute) -> tuple:
+        """
+        (result, shared) for compute(upload), an async callable, where shared
+        is True when this caller joined another request's computation. Errors
+        reach every caller. A leader's computation outlives it, so it reads a
+        detached copy of the upload, made only once no identical request is
+        found in flight; without coalescing, compute reads `file` itself.
+        Treat the result as read-only: copy it before adding per-request
+        fields. A follower's trace takes the leader's stage spans.
+        """
+        if not self.enabled or key is None:
+            return await compute(file), False
+        flight = await self._find(key, file)
+        shared = flight is not None
+        if not shared:
+            # Registered in the same step as the lookup, so concurrent duplicates find it
+            source = detach_upload(file)
+            flight = Flight(asyncio.ensure_future(compute(source)), source, current_trace())
+            self._calls.setdefault(key, []).append(flight)
+            COALESCING.inc(modality=modality)
+            flight.task.add_done_callback(lambda t: self._finished(modality, key, flight))
+        COALESCED.inc(modality=modality, role="follower" if shared else "leader")
+        result = await asyncio.shield(flight.task)
+        trace = current_trace()
+        if shared and trace is not None and flight.trace is not None:
+            trace.adopt(flight.trace)
+        return result, shared
+
+    async def _find(self, key, file):
+        """The running Flight over the same bytes as `file`, or None."""
+        if not any(not flight.task.done() for flight in self._calls.get(key, ())):
+            return None
+        digest = await asyncio.to_thread(upload_digest, file)
+        for flight in list(self._calls.get(key, ())):
+            if not flight.task.done() and await flight.digest() == digest:
+                return flight
+        return None
+
+    def _finished(self, modality: str, key, flight):
+        flights = self._calls.get(key, [])
+        if flight in flights:
+            flights.remove(flight)
+            if not flights:
+                del self._calls[key]
+        COALESCING.dec(modality=modality)
+        flight.close()
+        # Retrieve the error even when every caller has gone, so it is not reported as unhandled
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+
+INFLIGHT = SingleFlight()
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+
+
+class ExplainPolicy:
+    """
+    Chooses which flagged classes get a Grad-CAM explanation, before any
+    gradient work starts:
+
+    - top_k: only the k most confident flagged classes
+    - threshold: only flagged classes whose probability reaches this value
+    - combined: one heatmap for all selected classes from a single gradient
+    - enabled=False: no heatmaps at all
+    """
+
+    def __init__(self, top_k=None, threshold=None, combined=False, enabled=True):
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be at least 1")
+        if threshold is not None and not 0.0 <= threshold <= 1.0:
+            raise ValueError("threshold must be between 0 and 1")
+        self.top_k = top_k
+        self.threshold = threshold
+        self.combined = combined
+        self.enabled = enabled
+
+    def __repr__(self):
+        return (f"ExplainPolicy(top_k={self.top_k}, threshold={self.threshold}, "
+                f"combined={self.combined}, enabled={self.enabled})")
+
+    @classmethod
+    def from_env(cls, prefix: str):
+        """Reads <PREFIX>_EXPLAIN_TOP_K, _EXPLAIN_THRESHOLD and _EXPLAIN_COMBINED (unset = explain every flagged class)."""
+        top_k = os.getenv(f"{prefix}_EXPLAIN_TOP_K")
+        threshold = os.getenv(f"{prefix}_EXPLAIN_THRESHOLD")
+        return cls(
+            top_k=int(top_k) if top_k else None,
+            threshold=float(threshold) if threshold else None,
+            combined=os.getenv(f"{prefix}_EXPLAIN_COMBINED", "0") == "1",
+        )
+
+    def parse(self, spec: str):
+        """
+        A per-request policy from an explain= value, starting from this one.
+        Comma-separated terms: "none", "all", "combined", "top:<k>", "min:<p>".
+        Raises ValueError on anything else.
+        """
+        top_k, threshold, combined, enabled = self.top_k, self.threshold, self.combined, True
+        for term in (t.strip().lower() for t in spec.split(",") if t.strip()):
+            name, _, value = term.partition(":")
+            try:
+                if term == "none":
+                    enabled = False
+                elif term == "all":
+                    top_k, threshold, combined = None, None, False
+                elif term == "combined":
+                    combined = True
+                elif name == "top" and value:
+                    top_k = int(value)
+                elif name == "min" and value:
+                    threshold = float(value)
+                else:
+                    raise ValueError
+            except ValueError:
+                raise ValueError(f"Unknown explain term '{term}'; use none, all, combined, top:<k> or min:<p>")
+        return ExplainPolicy(top_k=top_k, threshold=threshold, combined=combined, enabled=enabled)
+
+    def select(self, probs, flagged_indices) -> list:
+        """Flagged class indices to explain, most confident first."""
+        if not self.enabled:
+            return []
+        probs = np.asarray(probs)
+        indices = sorted(flagged_indices, key=lambda i: -probs[i])
+        if self.threshold is not None:
+            indices = [i for i in indices if probs[i] >= self.threshold]
+        if self.top_k is not None:
+            indices = indices[:self.top_k]
+        return indices
@@ -0,0 +1,129 @@
+import os
+import csv
+import json
+import shutil
+import asyncio
+import hashlib
+import numpy as np
+
+from utils.vector_index import VectorIndex, IVF_MIN_TRAIN
+
+# --- 1. KNOWLEDGE CONFIG ---
+KNOWLEDGE_DIR = os.getenv("KNOWLEDGE_DIR", "data/knowledge")
+KB_EMBED_BATCH = int(os.getenv("KB_EMBED_BATCH", "64"))
+# Batch requests in flight at once while building
+KB_EMBED_PARALLEL = int(os.getenv("KB_EMBED_PARALLEL", "4"))
+KB_TOP_K = int(os.getenv("KB_TOP_K", "3"))
+
+
+def load_entries(path, fallback: dict) -> list:
+    """
+    Reference findings as [{"category", "text", ...}]. path may be a JSONL
+    file (one object per line) or a CSV with category and text columns;
+    extra fields (term, source, ...) are kept. Without a file the modality's
+    built-in {category: description} dict is used.
+    """
+    if not path or not os.path.exists(path):
+        return [{"category": category, "text": text} for category, text in fallback.items()]
+
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    entries = [row for row in rows if row.get("category") and row.get("text")]
+    if len(entries) < len(rows):
+        print(f"⚠️ Skipped {len(rows) - len(entries)} knowledge entries without category/text in {path}")
+    return entries
+
+
+# --- 2. KNOWLEDGE BASE ---
+class KnowledgeBase:
+    """
+    A modality's reference findings, embedded once and kept in an on-disk
+    vector index (utils.vector_index). The index is rebuilt only when the
+    entries or the embedding model change; otherwise startup just maps the
+    stored vectors. Below IVF_MIN_TRAIN entries matching scans a resident
+    float32 copy of the rows; larger knowledge bases are searched through
+    IVF on the memory map, so their rows are never all held in RAM.
+    """
+
+    def __init__(self, name: str, entries: list, directory=None):
+        self.name = name
+        self.entries = entries
+        self.directory = directory or os.path.join(KNOWLEDGE_DIR, name)
+        self.index = None
+
+    def __len__(self):
+        return len(self.index) if self.index is not None else 0
+
+    @property
+    def ready(self) -> bool:
+        return len(self) > 0
+
+    def fingerprint(self, model: str) -> str:
+        digest = hashlib.sha1(model.encode("utf-8"))
+        for entry in self.entries:
+            digest.update(json.dumps(entry, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _source_path(self):
+        return os.path.join(self.directory, "source.json")
+
+    def _load_existing(self, fingerprint) -> bool:
+        try:
+            with open(self._source_path()) as f:
+                source = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if source.get("fingerprint") != fingerprint:
+            return False
+        index = VectorIndex(os.path.join(self.directory, "index"), auto_train=False)
+        if len(index) != len(source["entries"]):
+            return False
+        index.resident = len(index) < IVF_MIN_TRAIN
+        self.entries, self.index = source["entries"], index
+        return True
+
+    async def build(self, embed, model: str):
+        """
+        Loads the stored index, or embeds every entry with `embed` (an async
+        [text] -> [vector or None] function), one call per KB_EMBED_BATCH
+        entries and up to KB_EMBED_PARALLEL calls at once. Entries whose
+        embedding fails are left out and retried on the next build.
+        """
+        fingerprint = self.fingerprint(model)
+        if await asyncio.to_thread(self._load_existing, fingerprint):
+            return False
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        index = VectorIndex(os.path.join(self.directory, "index"), auto_train=False)
+        kept = []
+        window = KB_EMBED_BATCH * KB_EMBED_PARALLEL
+        for start in range(0, len(self.entries), window):
+            batches = [self.entries[s:s + KB_EMBED_BATCH]
+                       for s in range(start, min(start + window, len(self.entries)), KB_EMBED_BATCH)]
+            results = await asyncio.gather(*(embed([entry["text"] for entry in batch]) for batch in batches))
+            for batch, vectors in zip(batches, results):
+                ok = [(entry, vec) for entry, vec in zip(batch, vectors) if vec is not None]
+                if ok:
+                    index.add([str(len(kept) + i) for i in range(len(ok))], np.stack([vec for _, vec in ok]))
+                    kept.extend(entry for entry, _ in ok)
+        index.flush()
+        if len(index) >= IVF_MIN_TRAIN:
+            # Trained once over the complete set rather than repeatedly while it grows
+            await asyncio.to_thread(index.train)
+        index.resident = len(index) < IVF_MIN_TRAIN
+
+        if kept and len(kept) == len(self.entries):
+            # Only a complete build is reused by later startups
+            with open(self._source_path(), "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": fingerprint, "model": model, "entries": kept}, f)
+        self.entries, self.index = kept, index
+        return True
+
+    def search(self, query_vec, k=KB_TOP_K) -> list:
+        """[(entry, cosine similarity)] of the k closest reference findings, best first."""
+        if not self.ready:
+            return []
+        return [(self.entries[int(row)], score) for row, score in self.index.search(query_vec, k)]
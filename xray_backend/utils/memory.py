@@ -0,0 +1,248 @@
+import os
+import asyncio
+import time
+from collections import deque
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from utils.uploads import open_upload, upload_size
+from utils.metrics import Counter, Gauge, Histogram
+
+# --- 1. MEMORY BUDGET CONFIG ---
+# Transient memory the worker may commit to in-flight requests, on top of
+# the models and indexes it holds anyway (0 = no admission control). Size it
+# per worker: container limit / WEB_WORKERS minus the worker's idle RSS.
+MB = 1024 * 1024
+MEMORY_BUDGET_BYTES = int(float(os.getenv("MEMORY_BUDGET_MB", "0")) * MB)
+# Requests that do not fit wait (FIFO) up to ADMISSION_TIMEOUT_S, at most
+# ADMISSION_QUEUE of them; beyond either they are refused with a 503.
+ADMISSION_TIMEOUT_S = float(os.getenv("ADMISSION_TIMEOUT_S", "10"))
+ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", "64"))
+
+# Per-request cost model, in bytes. REQUEST_BASE covers the fixed-size model
+# input tensors and forward-pass activations; GRADCAM_BASE the backward pass
+# of a Grad-CAM batch; HEATMAP each class's CAM, overlay and encoded image;
+# TTA the augmented batch and its forward pass.
+REQUEST_BASE_BYTES = int(float(os.getenv("MEMORY_REQUEST_BASE_MB", "48")) * MB)
+GRADCAM_BASE_BYTES = int(float(os.getenv("MEMORY_GRADCAM_BASE_MB", "96")) * MB)
+HEATMAP_BYTES = int(float(os.getenv("MEMORY_HEATMAP_MB", "2")) * MB)
+TTA_BYTES = int(float(os.getenv("MEMORY_TTA_MB", "64")) * MB)
+# Decoded size per upload byte when the image header cannot be read
+UNKNOWN_EXPANSION = 8
+
+BYTES_PER_PIXEL = {"1": 1, "L": 1, "P": 1, "LA": 2, "I;16": 2, "RGB": 3, "YCbCr": 3, "RGBA": 4, "CMYK": 4, "I": 4, "F": 4}
+
+MEMORY_RESERVED = Gauge(
+    "xinsight_memory_reserved_bytes",
+    "Estimated transient memory reserved by admitted requests.",
+)
+MEMORY_RESERVED_PEAK = Gauge(
+    "xinsight_memory_reserved_peak_bytes",
+    "Highest estimated transient memory reserved at once.",
+)
+MEMORY_BUDGET = Gauge(
+    "xinsight_memory_budget_bytes",
+    "Configured transient memory budget (0 = admission control off).",
+)
+ADMISSION_WAITING = Gauge(
+    "xinsight_admission_waiting",
+    "Requests queued for memory admission.",
+)
+ADMISSIONS = Counter(
+    "xinsight_admissions_total",
+    "Memory admission decisions: admitted, queued (then admitted), queue_full, timeout.",
+    ("modality", "outcome"),
+)
+ADMISSION_WAIT = Histogram(
+    "xinsight_admission_wait_seconds",
+    "Time queued requests waited for memory admission.",
+    ("modality",),
+)
+
+
+# --- 2. PER-REQUEST ESTIMATES ---
+def decoded_bytes(file: UploadFile, target_size=(224, 224)) -> int:
+    """
+    Peak size of the decoded frame in preprocess_image, from the image
+    header alone (nothing is decoded). JPEGs are sized after the same draft
+    downscale the decoder applies.
+    """
+    try:
+        with open_upload(file) as image_source:
+            img = Image.open(image_source)
+            img.draft("RGB", (target_size[0] * 2, target_size[1] * 2))
+            width, height = img.size
+            frame = width * height * BYTES_PER_PIXEL.get(img.mode, 4)
+            # Modes without a resize-first path are expanded to RGB at full size
+            if img.mode not in ("RGB", "L"):
+                frame += width * height * 3
+            return frame
+    except HTTPException:
+        raise
+    except Exception:
+        return upload_size(file) * UNKNOWN_EXPANSION
+    finally:
+        file.file.seek(0)
+
+
+def max_heatmaps(modality, policy) -> int:
+    """Upper bound on the heatmaps a request can render before its findings are known."""
+    if not policy.enabled:
+        return 0
+    if policy.combined:
+        return 1
+    count = len(modality.classes) - (modality.normal_class is not None)
+    return min(count, policy.top_k) if policy.top_k is not None else count
+
+
+def heatmap_bytes(count: int) -> int:
+    return GRADCAM_BASE_BYTES + count * HEATMAP_BYTES if count else 0
+
+
+def upload_bytes(file: UploadFile) -> int:
+    """Transient memory one upload costs up to the model input: raw bytes, decoded frame and tensors."""
+    return REQUEST_BASE_BYTES + upload_size(file) + decoded_bytes(file)
+
+
+def explain_bytes(modality, policy, tta=False) -> int:
+    """Worst-case Grad-CAM (and TTA) memory for one modality's explanation of an upload."""
+    return heatmap_bytes(max_heatmaps(modality, policy)) + (TTA_BYTES if tta else 0)
+
+
+# --- 3. ADMISSION CONTROL ---
+class Reservation:
+    """Memory held by one admitted request; release() it when the request ends."""
+
+    def __init__(self, budget, modality: str, nbytes: int, heatmaps=0):
+        self.budget = budget
+        self.modality = modality
+        self.nbytes = nbytes
+        # Heatmaps the estimate allowed for; settle() trims it to the real count
+        self.heatmaps = heatmaps
+
+    def settle(self, heatmaps: int):
+        """Trims the Grad-CAM share once the classes to explain are known."""
+        if heatmaps < self.heatmaps:
+            self.shrink(self.nbytes - heatmap_bytes(self.heatmaps) + heatmap_bytes(heatmaps))
+            self.heatmaps = heatmaps
+
+    def shrink(self, nbytes: int):
+        """Lowers the reservation once the real cost is known (e.g. the heatmap count)."""
+        nbytes = max(0, nbytes)
+        if nbytes < self.nbytes:
+            self.budget._adjust(self.nbytes - nbytes)
+            self.nbytes = nbytes
+
+    def release(self):
+        self.shrink(0)
+
+
+class MemoryBudget:
+    """
+    Admits requests while their estimated transient memory fits the budget.
+    Requests that do not fit queue in arrival order, so a large upload is
+    not starved by a stream of small ones; a request larger than the whole
+    budget is admitted alone. All calls run on the event loop thread.
+    """
+
+    def __init__(self, limit_bytes=MEMORY_BUDGET_BYTES, max_waiting=ADMISSION_QUEUE, timeout_s=ADMISSION_TIMEOUT_S):
+        self.limit_bytes = limit_bytes
+        self.max_waiting = max_waiting
+        self.timeout_s = timeout_s
+        self.reserved = 0
+        self.peak = 0
+        self._waiters = deque()
+        MEMORY_BUDGET.set(limit_bytes)
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit_bytes > 0
+
+    def describe(self) -> dict:
+        return {
+            "budget_bytes": self.limit_bytes,
+            "reserved_bytes": self.reserved,
+            "peak_reserved_bytes": self.peak,
+            "waiting": len(self._waiters),
+        }
+
+    async def admit(self, modality: str, files: list, heatmaps=0, extra=0) -> Reservation:
+        """
+        Reserves the estimated memory of a request on these uploads that
+        renders up to `heatmaps` heatmaps, plus `extra` bytes. Estimating
+        reads only the image headers, in a thread so a slow upload does not
+        hold up the event loop, and is skipped when the budget is off.
+        """
+        if not self.enabled:
+            return Reservation(self, modality, 0)
+        uploads = await asyncio.to_thread(lambda: sum(upload_bytes(f) for f in files))
+        nbytes = uploads + heatmap_bytes(heatmaps) + extra
+        return await self.acquire(modality, nbytes, heatmaps)
+
+    async def acquire(self, modality: str, nbytes: int, heatmaps=0) -> Reservation:
+        """
+        A Reservation for nbytes, waiting for room if needed. Raises a 503
+        HTTPException when the wait queue is full or the wait times out.
+        """
+        if not self.enabled:
+            return Reservation(self, modality, 0)
+        nbytes = min(nbytes, self.limit_bytes)
+        if not self._waiters and self.reserved + nbytes <= self.limit_bytes:
+            self._grant(nbytes)
+            ADMISSIONS.inc(modality=modality, outcome="admitted")
+            return Reservation(self, modality, nbytes, heatmaps)
+        if len(self._waiters) >= self.max_waiting:
+            self._refuse(modality, "queue_full")
+
+        waiter = (nbytes, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        ADMISSION_WAITING.set(len(self._waiters))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), timeout=self.timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter[1].done():
+                # Granted just as the wait ended: hand the memory back
+                self._adjust(nbytes)
+            else:
+                waiter[1].cancel()
+                self._waiters.remove(waiter)
+                # The queue head may have changed
+                self._wake()
+            ADMISSION_WAITING.set(len(self._waiters))
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._refuse(modality, "timeout")
+        ADMISSION_WAIT.observe(time.perf_counter() - started, modality=modality)
+        ADMISSIONS.inc(modality=modality, outcome="queued")
+        return Reservation(self, modality, nbytes, heatmaps)
+
+    def _grant(self, nbytes: int):
+        self.reserved += nbytes
+        self.peak = max(self.peak, self.reserved)
+        MEMORY_RESERVED.set(self.reserved)
+        MEMORY_RESERVED_PEAK.set_max(self.reserved)
+
+    def _adjust(self, freed: int):
+        self.reserved -= freed
+        MEMORY_RESERVED.set(self.reserved)
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.reserved + self._waiters[0][0] <= self.limit_bytes:
+            nbytes, future = self._waiters.popleft()
+            self._grant(nbytes)
+            future.set_result(None)
+        ADMISSION_WAITING.set(len(self._waiters))
+
+    def _refuse(self, modality: str, reason: str):
+        ADMISSIONS.inc(modality=modality, outcome=reason)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server memory budget exhausted ({reason.replace('_', ' ')}); retry shortly.",
+            headers={"Retry-After": str(max(1, round(self.timeout_s)))},
+        )
+
+
+MEMORY = MemoryBudget()
@@ -0,0 +1,246 @@
+import os
+import asyncio
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+from utils.tracing import current_trace
+from utils.budget import STAGE_STATS
+
+# Set METRICS_ENABLED=0 to turn every observe/inc into a no-op
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+# Set MEMORY_METRICS=0 to skip the per-stage RSS sample (one /proc read per stage)
+MEMORY_METRICS = METRICS_ENABLED and os.getenv("MEMORY_METRICS", "1") != "0"
+
+# Latency buckets in seconds, spanning sub-ms thresholding to multi-second LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REGISTRY = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels) -> tuple:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1.0, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def set_max(self, value, **labels):
+        """Raises the gauge to value if it is higher (a running peak)."""
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            if value > self._values.get(key, float("-inf")):
+                self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in sorted(self._values.items())]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render_metrics() -> str:
+    """Serializes every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- PIPELINE METRICS ---
+STAGE_SECONDS = Histogram(
+    "xinsight_stage_duration_seconds",
+    "Latency of each predict pipeline stage.",
+    ("modality", "stage", "outcome"),
+)
+IN_FLIGHT = Gauge(
+    "xinsight_requests_in_flight",
+    "Predict requests currently being processed.",
+    ("modality",),
+)
+STAGE_RSS = Gauge(
+    "xinsight_stage_rss_bytes",
+    "Process resident memory when each pipeline stage last finished.",
+    ("modality", "stage"),
+)
+STAGE_RSS_PEAK = Gauge(
+    "xinsight_stage_rss_peak_bytes",
+    "Highest process resident memory seen at the end of each pipeline stage.",
+    ("modality", "stage"),
+)
+CACHE_LOOKUPS = Counter(
+    "xinsight_cache_lookups_total",
+    "Cache lookups by cache name and result (hit/miss).",
+    ("modality", "cache", "result"),
+)
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def process_rss_bytes():
+    """Current resident set size from /proc/self/statm, or None off Linux."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class Span:
+    """Handle yielded by stage(); call fail() when a stage degrades without raising."""
+
+    __slots__ = ("modality", "name", "outcome", "start", "seconds")
+
+    def __init__(self, modality, name):
+        self.modality = modality
+        self.name = name
+        self.outcome = "ok"
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+
+    def fail(self):
+        self.outcome = "error"
+
+
+@contextmanager
+def stage(modality: str, name: str, key=None):
+    """
+    Times a pipeline stage into STAGE_SECONDS, labelled by modality, stage and
+    outcome, into the recent-latency window used by latency budgets, and into
+    the request's Trace if one is active. key (e.g. the
+    class name of a Grad-CAM pass) only appears in the trace breakdown.
+    """
+    span = Span(modality, name)
+    try:
+        yield span
+    except asyncio.CancelledError:
+        # Cut off by a latency budget (or the client left) before finishing
+        span.outcome = "cancelled"
+        raise
+    except BaseException:
+        span.fail()
+        raise
+    finally:
+        span.seconds = time.perf_counter() - span.start
+        STAGE_SECONDS.observe(span.seconds, modality=modality, stage=name, outcome=span.outcome)
+        if span.outcome != "error":
+            # Latency budgets predict stage costs from these recent samples; a
+            # cancelled run's elapsed time is a lower bound on its cost
+            STAGE_STATS.observe(modality, name, span.seconds)
+        if MEMORY_METRICS:
+            rss = process_rss_bytes()
+            if rss is not None:
+                STAGE_RSS.set(rss, modality=modality, stage=name)
+                STAGE_RSS_PEAK.set_max(rss, modality=modality, stage=name)
+        trace = current_trace()
+        if trace is not None:
+            trace.record_span(name, span.seconds, span.outcome, key)
+
+
+def count_cache(modality: str, cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(modality=modality, cache=cache, result="hit" if hit else "miss")
+    trace = current_trace()
+    if trace is not None:
+        trace.record_cache(cache, hit)
+
+
+@contextmanager
+def in_flight(modality: str):
+    IN_FLIGHT.inc(modality=modality)
+    try:
+        yield
+    finally:
+        IN_FLIGHT.dec(modality=modality)
@@ -0,0 +1,68 @@
+import numpy as np
+
+NORMAL_STATUS = "Normal"
+
+
+def compile_thresholds(classes, thresholds) -> np.ndarray:
+    """
+    Compiles a {class_name: threshold} mapping into a float32 array aligned
+    with the model's output columns, so thresholding is a single comparison.
+    """
+    missing = [c for c in classes if c not in thresholds]
+    if missing:
+        raise ValueError(f"Missing thresholds for classes: {missing}")
+    return np.array([float(thresholds[c]) for c in classes], dtype=np.float32)
+
+
+def postprocess_batch(preds, classes, thresholds, normal_class=None, normal_label=NORMAL_STATUS):
+    """
+    Turns a (batch, num_classes) probability matrix into per-image findings.
+
+    Flag masks, the "Normal" collapse and the descending-probability ordering
+    are computed for the whole batch with NumPy; Python only touches the
+    (few) flagged entries when building the response dicts.
+
+    Each result holds:
+      - flagged_conditions: sorted findings, or a single Normal entry
+      - diseases_string:    comma-joined findings or "Normal"
+      - patient_status:     "Abnormal" / "Normal"
+      - flagged_indices:    every class index at or above its threshold, in
+                            class order (used to pick Grad-CAM targets)
+    """
+    preds = np.atleast_2d(np.asarray(preds, dtype=np.float32))
+    flags = preds >= thresholds
+
+    finding_mask = flags.copy()
+    if normal_class is not None:
+        finding_mask[:, list(classes).index(normal_class)] = False
+    is_normal = ~finding_mask.any(axis=1)
+
+    # Stable descending sort so ties keep class order, matching list.sort()
+    order = np.argsort(-preds, axis=1, kind="stable")
+    sorted_mask = np.take_along_axis(finding_mask, order, axis=1)
+    percents = preds * np.float32(100)
+
+    results = []
+    for row in range(preds.shape[0]):
+        if is_normal[row]:
+            flagged_conditions = [{"condition": normal_label, "confidence": "High", "probability": 1.0}]
+            diseases_string = NORMAL_STATUS
+        else:
+            indices = order[row][sorted_mask[row]]
+            flagged_conditions = [
+                {
+                    "condition": classes[i],
+                    "confidence": f"{percents[row, i]:.1f}%",
+                    "probability": float(preds[row, i]),
+                }
+                for i in indices
+            ]
+            diseases_string = ", ".join(c["condition"] for c in flagged_conditions)
+
+        results.append({
+            "flagged_conditions": flagged_conditions,
+            "diseases_string": diseases_string,
+            "patient_status": "Normal" if is_normal[row] else "Abnormal",
+            "flagged_indices": np.flatnonzero(flags[row]).tolist(),
+        })
+    return results
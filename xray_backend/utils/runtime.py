@@ -0,0 +1,125 @@
+import os
+import json
+
+# --- 1. RUNTIME CONFIG ---
+# Every thread pool in the API process is sized from one config, so that
+# workers x (TF intra-op + inter-op + OpenCV + heatmap render threads) fits
+# the CPUs the server may use instead of each library claiming every core.
+# Values come from the JSON file named by RUNTIME_CONFIG, overridden by the
+# environment variables below; 0 or unset means "derive from the CPU count".
+RUNTIME_CONFIG = os.getenv("RUNTIME_CONFIG")
+
+ENV_VARS = {
+    "workers": "WEB_WORKERS",
+    "intra_op_threads": "TF_INTRA_OP_THREADS",
+    "inter_op_threads": "TF_INTER_OP_THREADS",
+    "cv2_threads": "CV2_THREADS",
+    "render_threads": "RENDER_THREADS",
+    # "0-7,16-23", or "auto" to give each worker its own slice (serve.py sets WORKER_INDEX)
+    "cpu_affinity": "CPU_AFFINITY",
+}
+
+
+def available_cpus() -> list:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpus(spec: str) -> list:
+    """CPU ids from a list like "0-3,8,10-11"; raises ValueError on a malformed spec."""
+    cpus = []
+    for part in (p.strip() for p in spec.split(",") if p.strip()):
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    if not cpus:
+        raise ValueError(f"Empty CPU list '{spec}'.")
+    return sorted(set(cpus))
+
+
+# --- 2. THREAD LAYOUT ---
+class RuntimeConfig:
+    """
+    Resolved thread layout for one worker process. apply() must run before
+    TensorFlow executes its first op (main6 calls it before importing the
+    routers, which load the models); thread counts set later are ignored.
+    """
+
+    def __init__(self, workers=1, intra_op_threads=0, inter_op_threads=0, cv2_threads=0, render_threads=0,
+                 cpu_affinity=None, worker_index=None):
+        self.workers = max(1, int(workers))
+        cpus = available_cpus()
+        sliced = cpu_affinity == "auto" and worker_index is not None
+        pinned = bool(cpu_affinity) and cpu_affinity != "auto"
+        if sliced:
+            per_worker = max(1, len(cpus) // self.workers)
+            start = (int(worker_index) % self.workers) * per_worker
+            # More workers than CPUs: the extra workers share a CPU round-robin
+            cpus = cpus[start:start + per_worker] or [cpus[int(worker_index) % len(cpus)]]
+        elif pinned:
+            cpus = parse_cpus(cpu_affinity)
+        self.cpu_affinity = cpu_affinity
+        self.cpus = cpus if sliced or pinned else None
+        # A worker with its own slice uses all of it; otherwise workers share the CPU set
+        cores = max(1, len(cpus) if sliced else len(cpus) // self.workers)
+        self.intra_op_threads = int(intra_op_threads) or cores
+        self.inter_op_threads = int(inter_op_threads) or min(2, cores)
+        self.cv2_threads = int(cv2_threads) or max(1, cores // 4)
+        self.render_threads = int(render_threads) or min(4, cores)
+        self.applied = False
+
+    @classmethod
+    def from_env(cls):
+        values = {}
+        if RUNTIME_CONFIG:
+            with open(RUNTIME_CONFIG, "r") as f:
+                values = {k: v for k, v in json.load(f).items() if k in ENV_VARS}
+        for field, var in ENV_VARS.items():
+            if os.getenv(var):
+                values[field] = os.environ[var]
+        return cls(**values, worker_index=os.getenv("WORKER_INDEX"))
+
+    def describe(self) -> dict:
+        return {
+            "workers": self.workers,
+            "intra_op_threads": self.intra_op_threads,
+            "inter_op_threads": self.inter_op_threads,
+            "cv2_threads": self.cv2_threads,
+            "render_threads": self.render_threads,
+            "cpus": self.cpus,
+        }
+
+    def env(self) -> dict:
+        """The environment variables that reproduce this layout in another process."""
+        env = {ENV_VARS[k]: str(getattr(self, k)) for k in ENV_VARS if k not in ("cpu_affinity",)}
+        if self.cpus:
+            env["CPU_AFFINITY"] = ",".join(map(str, self.cpus))
+        return env
+
+    def apply(self):
+        """Pins the process and sizes the TensorFlow, oneDNN/OpenMP and OpenCV pools (idempotent)."""
+        if self.applied:
+            return self
+        self.applied = True
+        # oneDNN sizes its OpenMP pool from this when TensorFlow initializes
+        os.environ.setdefault("OMP_NUM_THREADS", str(self.intra_op_threads))
+        if self.cpus and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, self.cpus)
+            except OSError as e:
+                print(f"⚠️ CPU affinity {self.cpus} not applied: {e}")
+
+        import cv2
+        import tensorflow as tf
+
+        cv2.setNumThreads(self.cv2_threads)
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(self.intra_op_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(self.inter_op_threads)
+        except RuntimeError as e:
+            print(f"⚠️ TensorFlow thread pools already initialized; keeping their sizes: {e}")
+        print(f"✅ Runtime: {self.describe()}")
+        return self
+
+
+RUNTIME = RuntimeConfig.from_env()
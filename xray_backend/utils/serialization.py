@@ -0,0 +1,103 @@
+import json
+import base64
+import numpy as np
+from fastapi.responses import JSONResponse, Response
+
+# Optional fast/binary encoders; each format degrades gracefully when missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+CBOR_TYPES = ("application/cbor",)
+
+
+def _default(value):
+    """Fallback for types the encoders do not know natively."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # Only reached by JSON; binary formats carry bytes natively
+        return base64.b64encode(bytes(value)).decode("ascii")
+    raise TypeError(f"Type {type(value).__name__} is not serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available (NumPy scalars/arrays included)."""
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def parse_accept(header: str) -> dict:
+    """
+    {media_range: q} for an Accept header. Parameters other than q are
+    ignored; a malformed q counts as 1, as browsers send no junk there.
+    """
+    ranges = {}
+    for part in header.lower().split(","):
+        media_range, *params = [p.strip() for p in part.split(";")]
+        if "/" not in media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    pass
+        # A range listed twice keeps its highest q
+        ranges[media_range] = max(q, ranges.get(media_range, 0.0))
+    return ranges
+
+
+def negotiate(request) -> str:
+    """
+    Picks the response encoding from the Accept header: "msgpack", "cbor" or
+    "json". Binary formats must be named explicitly (wildcards only ever
+    select JSON) and their encoder installed. The highest q wins, q=0 rules
+    a format out, and ties go to the binary formats. Falls back to JSON.
+    """
+    ranges = parse_accept(request.headers.get("accept", ""))
+    offers = []
+    if msgpack is not None:
+        offers.append(("msgpack", max(ranges.get(t, 0.0) for t in MSGPACK_TYPES)))
+    if cbor2 is not None:
+        offers.append(("cbor", max(ranges.get(t, 0.0) for t in CBOR_TYPES)))
+    # The most specific range that matches JSON sets its q; no Accept header accepts anything
+    json_ranges = [t for t in ("application/json", "application/*", "*/*") if t in ranges]
+    offers.append(("json", ranges[json_ranges[0]] if json_ranges else 0.0 if ranges else 1.0))
+    fmt, q = max(offers, key=lambda offer: offer[1])
+    return fmt if q > 0 else "json"
+
+
+def is_binary(fmt: str) -> bool:
+    return fmt in ("msgpack", "cbor")
+
+
+def encode_response(content, fmt: str, status_code=200, headers=None) -> Response:
+    """Encodes a response body in the negotiated format; bytes stay raw in binary formats."""
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if fmt == "msgpack":
+        body = msgpack.packb(content, default=_default, use_bin_type=True)
+        return Response(body, status_code=status_code, media_type=MSGPACK_TYPES[0], headers=headers)
+    if fmt == "cbor":
+        body = cbor2.dumps(content, default=lambda encoder, value: encoder.encode(_default(value)))
+        return Response(body, status_code=status_code, media_type=CBOR_TYPES[0], headers=headers)
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
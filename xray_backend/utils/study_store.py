@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import uuid
+import base64
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import Gauge
+
+# --- 1. STORE CONFIG ---
+# Set STUDY_STORE=0 to keep results ephemeral (nothing is written to disk)
+STUDY_STORE_ENABLED = os.getenv("STUDY_STORE", "1") != "0"
+STUDY_DB_PATH = os.getenv("STUDY_DB_PATH", "data/studies.db")
+STUDY_BLOB_DIR = os.getenv("STUDY_BLOB_DIR", "data/blobs")
+STUDY_PAGE_MAX = int(os.getenv("STUDY_PAGE_MAX", "200"))
+# Results (heatmaps included) queued for the writer at most; save() blocks beyond it
+STUDY_WRITE_QUEUE = int(os.getenv("STUDY_WRITE_QUEUE", "64"))
+# Seconds a read of a study still in the write queue waits for it to land
+STUDY_READ_WAIT_S = float(os.getenv("STUDY_READ_WAIT_S", "5"))
+
+STUDY_WRITES_PENDING = Gauge(
+    "xinsight_study_writes_pending",
+    "Studies queued for the study store writer and not yet written.",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS studies (
+    id TEXT PRIMARY KEY,
+    patient_id TEXT,
+    modality TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    patient_status TEXT NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS studies_patient ON studies (patient_id, created_at DESC, id);
+CREATE INDEX IF NOT EXISTS studies_modality ON studies (modality, created_at DESC, id);
+CREATE INDEX IF NOT EXISTS studies_created ON studies (created_at DESC, id);
+
+CREATE TABLE IF NOT EXISTS study_findings (
+    study_id TEXT NOT NULL REFERENCES studies (id) ON DELETE CASCADE,
+    condition TEXT NOT NULL,
+    probability REAL NOT NULL,
+    PRIMARY KEY (study_id, condition)
+);
+CREATE INDEX IF NOT EXISTS findings_condition ON study_findings (condition, study_id);
+
+CREATE TABLE IF NOT EXISTS study_heatmaps (
+    study_id TEXT NOT NULL REFERENCES studies (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mime TEXT NOT NULL,
+    PRIMARY KEY (study_id, name)
+);
+"""
+
+MIME_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "application/json": ".json"}
+
+
+# --- 2. HEATMAP BLOBS ---
+def _heatmap_blob(value, mime: str):
+    """(bytes, mime) for one response heatmap: a data URL, raw encoded bytes or a raw CAM dict."""
+    if isinstance(value, str) and value.startswith("data:"):
+        header, _, payload = value.partition(",")
+        return base64.b64decode(payload), header[5:].split(";")[0]
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value), mime
+    if isinstance(value, dict):
+        cam = dict(value)
+        if isinstance(cam.get("data"), (bytes, bytearray, memoryview)):
+            cam["data"] = base64.b64encode(bytes(cam["data"])).decode("ascii")
+        return json.dumps(cam).encode("utf-8"), "application/json"
+    raise TypeError(f"Unsupported heatmap payload {type(value).__name__}")
+
+
+# --- 3. STUDY STORE ---
+class StudyStore:
+    """
+    SQLite (WAL) index of predict results plus a blob directory for their
+    heatmaps. Writes go through one background thread so requests do not
+    wait on disk, up to STUDY_WRITE_QUEUE queued results; reads use a
+    connection per thread and run alongside writes. A study id is returned
+    before its write lands: get() and heatmap() wait for a queued study,
+    while query() and summaries() only list studies already written.
+    """
+
+    def __init__(self, db_path=STUDY_DB_PATH, blob_dir=STUDY_BLOB_DIR):
+        self.db_path = db_path
+        self.blob_dir = blob_dir
+        self._local = threading.local()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="study-writer")
+        self._ready = False
+        self._init_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(STUDY_WRITE_QUEUE)
+        # {study_id: Event set once its write has finished, successfully or not}
+        self._pending = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self._initialize()
+            conn = sqlite3.connect(self.db_path, timeout=30.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _initialize(self):
+        with self._init_lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            os.makedirs(self.blob_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30.0)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                conn.commit()
+            finally:
+                conn.close()
+            self._ready = True
+
+    # Writes
+    def save(self, modality: str, result: dict, patient_id=None, study_id=None, heatmap_mime=None,
+             on_saved=None) -> str:
+        """
+        Queues a predict result for storage and returns its study id. Blocks
+        while the write queue is full (call it via asyncio.to_thread), so a
+        slow disk slows requests down instead of piling heatmaps up in memory.
+        Heatmaps go to the blob directory; the row keeps everything else.
+        on_saved() runs on the writer thread once the study is committed
+        (never if the write fails).
+        """
+        study_id = study_id or uuid.uuid4().hex
+        self._slots.acquire()
+        self._pending[study_id] = threading.Event()
+        STUDY_WRITES_PENDING.inc()
+        # Shallow copy: the caller keeps adding response-only fields to result
+        self._writer.submit(self._write, study_id, modality, dict(result), patient_id, time.time(), heatmap_mime,
+                            on_saved)
+        return study_id
+
+    def _write(self, study_id, modality, result, patient_id, created_at, heatmap_mime, on_saved=None):
+        try:
+            self._store(study_id, modality, result, patient_id, created_at, heatmap_mime)
+        except Exception as e:
+            print(f"❌ Study Store Error ({study_id}): {e}")
+            return
+        finally:
+            self._pending.pop(study_id).set()
+            self._slots.release()
+            STUDY_WRITES_PENDING.dec()
+        if on_saved is not None:
+            on_saved()
+
+    def _store(self, study_id, modality, result, patient_id, created_at, heatmap_mime):
+        conn = self._connect()
+        blobs = []
+        study_dir = os.path.join(self.blob_dir, study_id[:2], study_id)
+        for name, value in (result.get("heatmaps") or {}).items():
+            data, mime = _heatmap_blob(value, heatmap_mime or "image/jpeg")
+            os.makedirs(study_dir, exist_ok=True)
+            path = os.path.join(study_dir, f"{len(blobs)}{MIME_EXTENSIONS.get(mime, '.bin')}")
+            with open(path, "wb") as f:
+                f.write(data)
+            blobs.append((study_id, name, path, mime))
+
+        stored = {k: v for k, v in result.items() if k not in ("heatmaps", "timings", "study_id")}
+        findings = [(study_id, c["condition"], float(c["probability"])) for c in result.get("flagged_conditions", [])]
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO studies (id, patient_id, modality, created_at, patient_status, result) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (study_id, patient_id, modality, created_at, result["patient_status"], json.dumps(stored, default=str)),
+            )
+            conn.executemany("INSERT OR REPLACE INTO study_findings VALUES (?, ?, ?)", findings)
+            conn.executemany("INSERT OR REPLACE INTO study_heatmaps VALUES (?, ?, ?, ?)", blobs)
+
+    def flush(self):
+        """Blocks until every queued write has landed."""
+        self._writer.submit(lambda: None).result()
+
+    # Reads
+    def _landed(self, study_id: str):
+        """Waits (up to STUDY_READ_WAIT_S) for a study that is still queued for writing."""
+        pending = self._pending.get(study_id)
+        if pending is not None:
+            pending.wait(STUDY_READ_WAIT_S)
+
+    def query(self, patient_id=None, modality=None, condition=None, since=None, until=None,
+              cursor=None, limit=50) -> dict:
+        """
+        Newest-first page of study summaries. Pagination is keyset-based:
+        pass the returned next_cursor to get the following page.
+        """
+        limit = max(1, min(int(limit), STUDY_PAGE_MAX))
+        clauses, params = [], []
+        if patient_id is not None:
+            clauses.append("s.patient_id = ?")
+            params.append(patient_id)
+        if modality is not None:
+            clauses.append("s.modality = ?")
+            params.append(modality)
+        if condition is not None:
+            clauses.append("s.id IN (SELECT study_id FROM study_findings WHERE condition = ?)")
+            params.append(condition)
+        if since is not None:
+            clauses.append("s.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("s.created_at < ?")
+            params.append(until)
+        if cursor:
+            created_at, cursor_id = decode_cursor(cursor)
+            clauses.append("(s.created_at < ? OR (s.created_at = ? AND s.id < ?))")
+            params.extend([created_at, created_at, cursor_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT s.id, s.patient_id, s.modality, s.created_at, s.patient_status FROM studies s {where} "
+            "ORDER BY s.created_at DESC, s.id DESC LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+
+        page = rows[:limit]
+        findings = self._findings([r["id"] for r in page])
+        items = [{**dict(r), "flagged_conditions": findings.get(r["id"], [])} for r in page]
+        next_cursor = encode_cursor(page[-1]["created_at"], page[-1]["id"]) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def _findings(self, study_ids) -> dict:
+        if not study_ids:
+            return {}
+        marks = ",".join("?" * len(study_ids))
+        findings = {}
+        for row in self._connect().execute(
+            f"SELECT study_id, condition, probability FROM study_findings WHERE study_id IN ({marks}) "
+            "ORDER BY probability DESC", study_ids,
+        ):
+            findings.setdefault(row["study_id"], []).append({"condition": row["condition"], "probability": row["probability"]})
+        return findings
+
+    def summaries(self, study_ids) -> dict:
+        """{id: summary} for the given studies (missing ids are skipped)."""
+        if not study_ids:
+            return {}
+        marks = ",".join("?" * len(study_ids))
+        rows = self._connect().execute(
+            f"SELECT id, patient_id, modality, created_at, patient_status FROM studies WHERE id IN ({marks})",
+            list(study_ids),
+        ).fetchall()
+        findings = self._findings([r["id"] for r in rows])
+        return {r["id"]: {**dict(r), "flagged_conditions": findings.get(r["id"], [])} for r in rows}
+
+    def get(self, study_id: str):
+        """The stored result for one study (heatmaps as names), or None."""
+        self._landed(study_id)
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM studies WHERE id = ?", (study_id,)).fetchone()
+        if row is None:
+            return None
+        heatmaps = [r["name"] for r in conn.execute(
+            "SELECT name FROM study_heatmaps WHERE study_id = ? ORDER BY rowid", (study_id,))]
+        return {
+            "id": row["id"], "patient_id": row["patient_id"], "modality": row["modality"],
+            "created_at": row["created_at"], **json.loads(row["result"]), "heatmaps": heatmaps,
+        }
+
+    def heatmap(self, study_id: str, name: str):
+        """(path, mime) of a stored heatmap, or None."""
+        self._landed(study_id)
+        row = self._connect().execute(
+            "SELECT path, mime FROM study_heatmaps WHERE study_id = ? AND name = ?", (study_id, name)
+        ).fetchone()
+        return (row["path"], row["mime"]) if row else None
+
+
+def encode_cursor(created_at: float, study_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at!r}|{study_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """Raises ValueError for a cursor this store did not issue."""
+    try:
+        created_at, study_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return float(created_at), study_id
+    except Exception:
+        raise ValueError("Invalid cursor.")
+
+
+STUDIES = StudyStore()
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import uuid
+import logging
+import contextvars
+from contextlib import contextmanager
+
+# One JSON line per request on this logger; set TRACE_LOG=0 to silence it
+TRACE_LOG_ENABLED = os.getenv("TRACE_LOG", "1") != "0"
+DEBUG_HEADER = "x-debug-timings"
+REQUEST_ID_HEADER = "X-Request-ID"
+
+logger = logging.getLogger("xinsight.trace")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_current_trace = contextvars.ContextVar("xinsight_trace", default=None)
+
+
+class Trace:
+    """Per-request record of stage spans and cache hits, for one endpoint (event)."""
+
+    def __init__(self, request_id: str, modality: str, event: str, debug: bool = False, attributes=None):
+        self.request_id = request_id
+        self.modality = modality
+        self.event = event
+        self.debug = debug
+        self.attributes = dict(attributes or {})
+        self.spans = []
+        self.cache = {}
+        self.started = time.time()
+
+    def record_span(self, name: str, seconds: float, outcome: str, key=None):
+        self.spans.append({"stage": name, "key": key, "ms": round(seconds * 1000.0, 3), "outcome": outcome})
+
+    def record_cache(self, cache: str, hit: bool):
+        counts = self.cache.setdefault(cache, {"hits": 0, "misses": 0})
+        counts["hits" if hit else "misses"] += 1
+
+    def adopt(self, leader):
+        """Takes the spans and cache counts of the request whose computation this one shared."""
+        self.attributes["coalesced_with"] = leader.request_id
+        self.spans.extend(leader.spans)
+        for cache, counts in leader.cache.items():
+            mine = self.cache.setdefault(cache, {"hits": 0, "misses": 0})
+            mine["hits"] += counts["hits"]
+            mine["misses"] += counts["misses"]
+
+    def timings(self) -> dict:
+        """
+        Flattens spans into {"<stage>_ms": total} plus per-key breakdowns
+        (e.g. gradcam_ms per class) and cache hit counts; a coalesced request
+        reports the leader's, and names it in coalesced_with.
+        """
+        timings = {}
+        for span in self.spans:
+            field = f"{span['stage']}_ms"
+            if span["key"] is None:
+                timings[field] = round(timings.get(field, 0.0) + span["ms"], 3)
+            else:
+                per_key = timings.setdefault(field, {})
+                per_key[span["key"]] = round(per_key.get(span["key"], 0.0) + span["ms"], 3)
+        timings["cache"] = self.cache
+        if "coalesced_with" in self.attributes:
+            timings["coalesced_with"] = self.attributes["coalesced_with"]
+        return timings
+
+    def log(self, status: str, **fields):
+        if not TRACE_LOG_ENABLED:
+            return
+        record = {
+            "event": self.event,
+            "request_id": self.request_id,
+            "modality": self.modality,
+            "status": status,
+            "started_at": self.started,
+            **self.attributes,
+            **fields,
+            "spans": self.spans,
+            "cache": self.cache,
+        }
+        logger.info(json.dumps(record, default=str))
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def is_debug_request(request) -> bool:
+    """Debug timings are opt-in via an X-Debug-Timings header or ?debug=true."""
+    flag = request.headers.get(DEBUG_HEADER) or request.query_params.get("debug") or ""
+    return flag.lower() in ("1", "true", "yes", "on")
+
+
+@contextmanager
+def start_trace(request, modality: str, event: str, **attributes):
+    """
+    Binds a Trace to the current context for the duration of one request;
+    event names the endpoint (predict, classify, similar, analyze) in the log.
+    """
+    request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+    trace = Trace(request_id, modality, event, debug=is_debug_request(request), attributes=attributes)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import tensorflow as tf
+
+# --- 1. TTA CONFIG ---
+# A class is borderline when its probability is within TTA_MARGIN of its threshold
+TTA_MARGIN = float(os.getenv("TTA_MARGIN", "0.05"))
+# Augmented views: "flip" (horizontal mirror) and/or "crops" (four corners + centre)
+TTA_VIEWS = tuple(v.strip() for v in os.getenv("TTA_VIEWS", "flip,crops").split(",") if v.strip())
+# Side of each crop as a fraction of the image, resized back to the model input
+TTA_CROP = float(os.getenv("TTA_CROP", "0.875"))
+
+VIEW_NAMES = ("flip", "crops")
+
+
+def crop_boxes(fraction=TTA_CROP) -> np.ndarray:
+    """Normalized (y1, x1, y2, x2) boxes for the four corner crops and the centre crop."""
+    lo, hi = 1.0 - fraction, fraction
+    mid = (1.0 - fraction) / 2.0
+    return np.array([
+        [0.0, 0.0, fraction, fraction], [0.0, lo, fraction, 1.0],
+        [lo, 0.0, 1.0, fraction], [lo, lo, 1.0, 1.0],
+        [mid, mid, mid + fraction, mid + fraction],
+    ], dtype=np.float32)
+
+
+# --- 2. AUGMENTATION ---
+def augment(img_array, views=TTA_VIEWS, fraction=TTA_CROP) -> np.ndarray:
+    """
+    Every augmented view of a (1, H, W, C) input stacked into one batch (the
+    original view is not included). Crops are cut and resized back in a
+    single crop_and_resize call.
+    """
+    unknown = [v for v in views if v not in VIEW_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown TTA views {unknown}; expected some of {VIEW_NAMES}")
+    batch = []
+    if "flip" in views:
+        batch.append(img_array[:, :, ::-1, :])
+    if "crops" in views:
+        boxes = crop_boxes(fraction)
+        crops = tf.image.crop_and_resize(
+            img_array, boxes, np.zeros(len(boxes), dtype=np.int32), img_array.shape[1:3]
+        )
+        batch.append(crops.numpy())
+    if not batch:
+        return img_array[:0]
+    return np.concatenate(batch).astype(np.float32, copy=False)
+
+
+def borderline(probs, thresholds, margin=TTA_MARGIN) -> np.ndarray:
+    """Indices of the classes whose probability lies within margin of their threshold."""
+    return np.flatnonzero(np.abs(np.asarray(probs) - thresholds) <= margin)
+
+
+def averaged(model, img_array, preds, views=TTA_VIEWS) -> tuple:
+    """
+    (mean probabilities over the original and augmented views, view count).
+    preds are the model's outputs for the original view; the augmented
+    views run as one batch in a single forward pass.
+    """
+    batch = augment(img_array, views)
+    if not len(batch):
+        return preds, 1
+    view_preds = model(batch, training=False).numpy()
+    return (preds.sum(axis=0, keepdims=True) + view_preds.sum(axis=0, keepdims=True)) / (len(batch) + 1), len(batch) + 1
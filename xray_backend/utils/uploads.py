@@ -0,0 +1,121 @@
+import os
+import io
+import mmap
+import hashlib
+from contextlib import contextmanager
+from fastapi import UploadFile, HTTPException
+from fastapi.responses import JSONResponse
+
+# --- UPLOAD LIMITS ---
+# Uploads above MAX_UPLOAD_MB are rejected before the body is parsed.
+# Uploads above UPLOAD_MMAP_THRESHOLD_MB are decoded from a memory-mapped view
+# of the spooled temp file instead of being pulled into a Python bytes object.
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024)
+MMAP_THRESHOLD_BYTES = int(float(os.getenv("UPLOAD_MMAP_THRESHOLD_MB", "4")) * 1024 * 1024)
+
+# Room for multipart boundaries and form headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def _too_large_detail() -> str:
+    return f"Upload exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit."
+
+
+async def enforce_upload_limit(request, call_next):
+    """
+    HTTP middleware that refuses oversized uploads from the Content-Length
+    header alone, before Starlette spools the multipart body to disk.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        if int(content_length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+            return JSONResponse(content={"error": _too_large_detail()}, status_code=413)
+    return await call_next(request)
+
+
+def upload_size(file: UploadFile) -> int:
+    """Returns the upload size without reading it into memory."""
+    if file.size is not None:
+        return file.size
+    fp = file.file
+    position = fp.tell()
+    fp.seek(0, os.SEEK_END)
+    size = fp.tell()
+    fp.seek(position)
+    return size
+
+
+@contextmanager
+def open_upload(file: UploadFile):
+    """
+    Yields a seekable file-like view of the upload for the image decoder.
+    Small uploads are read straight from the spooled file object; large ones
+    (already rolled over to disk by Starlette) are memory-mapped so the
+    decoder pages them in on demand instead of holding a full copy.
+    """
+    size = upload_size(file)
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Empty upload.")
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=_too_large_detail())
+
+    fp = file.file
+    fp.seek(0)
+
+    mapped = None
+    if size >= MMAP_THRESHOLD_BYTES:
+        try:
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            mapped = None
+
+    try:
+        yield mapped if mapped is not None else fp
+    finally:
+        if mapped is not None:
+            mapped.close()
+
+
+def upload_digest(file: UploadFile, chunk_bytes=1024 * 1024) -> str:
+    """
+    SHA-1 of the upload's bytes, read in chunks (or straight from the memory
+    map). A detached upload is read by position instead, so it can be hashed
+    while the pipeline is decoding it.
+    """
+    digest = hashlib.sha1()
+    fp = file.file
+    if isinstance(fp, io.BytesIO):
+        digest.update(fp.getbuffer())
+    elif isinstance(fp, io.BufferedReader):
+        offset = 0
+        while chunk := os.pread(fp.fileno(), chunk_bytes, offset):
+            digest.update(chunk)
+            offset += len(chunk)
+    else:
+        with open_upload(file) as source:
+            if isinstance(source, mmap.mmap):
+                digest.update(source)
+            else:
+                for chunk in iter(lambda: source.read(chunk_bytes), b""):
+                    digest.update(chunk)
+        fp.seek(0)
+    return digest.hexdigest()
+
+
+def detach_upload(file: UploadFile) -> UploadFile:
+    """
+    An UploadFile over the same bytes that stays readable after the request
+    closes the original: the spooled temp file is shared through a duplicated
+    descriptor, not copied into memory. A small spool still held in memory
+    (at most Starlette's 1 MB) is rolled over to its temp file first. Close
+    it when done.
+    """
+    fp = file.file
+    fp.seek(0)
+    try:
+        detached = os.fdopen(os.dup(fp.fileno()), "rb")
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        # Not file-backed (e.g. a BytesIO in tests): copy
+        detached = io.BytesIO(fp.read())
+        fp.seek(0)
+    return UploadFile(detached, size=file.size, filename=file.filename, headers=file.headers)
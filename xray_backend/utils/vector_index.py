@@ -0,0 +1,228 @@
+import os
+import json
+import threading
+import numpy as np
+
+# --- 1. INDEX CONFIG ---
+# Below IVF_MIN_TRAIN vectors a brute-force scan is already fast; above it a
+# coarse IVF quantizer is trained in the background and only IVF_NPROBE
+# inverted lists (plus vectors added since training) are scanned per query.
+IVF_MIN_TRAIN = int(os.getenv("IVF_MIN_TRAIN", "20000"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+IVF_TRAIN_SAMPLE = int(os.getenv("IVF_TRAIN_SAMPLE", "65536"))
+IVF_ITERATIONS = 10
+# Retrain once the unindexed tail reaches this fraction of the indexed vectors
+IVF_RETRAIN_RATIO = 0.25
+SCAN_CHUNK = 65536
+INITIAL_CAPACITY = 1024
+ID_WIDTH = 32
+
+
+def normalize(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first (argpartition, then a small sort)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+def spherical_kmeans(sample, nlist, iterations=IVF_ITERATIONS, seed=0) -> np.ndarray:
+    """Unit-norm centroids for cosine similarity (sample rows must be normalized)."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty clusters from random sample rows
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+# --- 2. MEMORY-MAPPED VECTOR INDEX ---
+class VectorIndex:
+    """
+    Append-only cosine-similarity index on disk:
+
+    - vectors.f16: (capacity, dim) float16 memmap of unit-norm rows
+    - ids.bin:     matching fixed-width ids
+    - meta.json:   row count and dimension (written after the rows)
+    - ivf.npz:     trained centroids and inverted lists, when present
+
+    Only the rows a query scans are paged in, so archives far larger than
+    RAM stay searchable. Small, read-mostly indexes can set resident=True to
+    scan a float32 copy held in memory instead.
+    """
+
+    def __init__(self, directory: str, dim=None, auto_train=True, resident=False):
+        self.directory = directory
+        self.dim = dim
+        self.auto_train = auto_train
+        self.resident = resident
+        self._dense = None
+        self.count = 0
+        self.capacity = 0
+        self._vectors = None
+        self._ids = None
+        self._ivf = None
+        self._training = False
+        self._lock = threading.RLock()
+        self._load()
+
+    def __len__(self):
+        return self.count
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        if not os.path.exists(self._path("meta.json")):
+            return
+        with open(self._path("meta.json")) as f:
+            meta = json.load(f)
+        self.dim, self.count = meta["dim"], meta["count"]
+        self._map(max(meta["capacity"], INITIAL_CAPACITY))
+        if os.path.exists(self._path("ivf.npz")):
+            with np.load(self._path("ivf.npz")) as ivf:
+                self._ivf = {k: ivf[k] for k in ("centroids", "order", "offsets")}
+                self._ivf["indexed"] = int(ivf["indexed"])
+
+    def _map(self, capacity):
+        """(Re)maps the data files at `capacity` rows, growing them on disk if needed."""
+        os.makedirs(self.directory, exist_ok=True)
+        for name, row_bytes in (("vectors.f16", self.dim * 2), ("ids.bin", ID_WIDTH)):
+            with open(self._path(name), "ab") as f:
+                if f.tell() < capacity * row_bytes:
+                    f.truncate(capacity * row_bytes)
+        self._vectors = np.memmap(self._path("vectors.f16"), dtype=np.float16, mode="r+", shape=(capacity, self.dim))
+        self._ids = np.memmap(self._path("ids.bin"), dtype=f"S{ID_WIDTH}", mode="r+", shape=(capacity,))
+        self.capacity = capacity
+
+    def _write_meta(self):
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "count": self.count, "capacity": self.capacity}, f)
+        os.replace(tmp, self._path("meta.json"))
+
+    def add(self, ids, vectors):
+        """Appends rows; ids are strings of at most 32 ASCII characters."""
+        vectors = normalize(vectors)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-d vectors, got {vectors.shape[1]}-d")
+            needed = self.count + len(vectors)
+            if needed > self.capacity:
+                capacity = max(INITIAL_CAPACITY, self.capacity)
+                while capacity < needed:
+                    capacity *= 2
+                self._map(capacity)
+            self._vectors[self.count:needed] = vectors
+            self._ids[self.count:needed] = [str(i).encode("ascii") for i in ids]
+            self.count = needed
+            self._dense = None
+            self._write_meta()
+        self._maybe_train()
+
+    def flush(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._ids.flush()
+
+    # Search
+    def _resident_rows(self, count):
+        with self._lock:
+            if self._dense is None or len(self._dense) < count:
+                self._dense = np.asarray(self._vectors[:self.count], dtype=np.float32)
+            return self._dense
+
+    def _scan(self, rows_or_range, query):
+        """Scores for a row range (start, stop) or an array of row numbers."""
+        if self.resident:
+            if isinstance(rows_or_range, tuple):
+                start, stop = rows_or_range
+                return np.arange(start, stop), self._resident_rows(stop)[start:stop] @ query
+            rows = np.sort(rows_or_range)
+            return rows, self._resident_rows(0)[rows] @ query
+        if isinstance(rows_or_range, tuple):
+            start, stop = rows_or_range
+            rows = np.arange(start, stop)
+            scores = np.concatenate([
+                self._vectors[s:min(s + SCAN_CHUNK, stop)].astype(np.float32) @ query
+                for s in range(start, stop, SCAN_CHUNK)
+            ]) if stop > start else np.empty(0, dtype=np.float32)
+            return rows, scores
+        rows = np.sort(rows_or_range)
+        return rows, self._vectors[rows].astype(np.float32) @ query
+
+    def search(self, query, k=10, nprobe=IVF_NPROBE) -> list:
+        """[(id, cosine similarity)] of the k nearest rows, best first."""
+        query = normalize(query)[0]
+        with self._lock:
+            count, ivf = self.count, self._ivf
+        if count == 0:
+            return []
+
+        if ivf is None:
+            rows, scores = self._scan((0, count), query)
+        else:
+            probes = top_k(ivf["centroids"] @ query, nprobe)
+            offsets, order = ivf["offsets"], ivf["order"]
+            candidates = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes])
+            rows, scores = self._scan(candidates, query)
+            # Rows added since training are not in any list yet
+            tail_rows, tail_scores = self._scan((ivf["indexed"], count), query)
+            rows, scores = np.concatenate([rows, tail_rows]), np.concatenate([scores, tail_scores])
+
+        best = top_k(scores, k)
+        return [(self._ids[rows[i]].decode("ascii"), float(scores[i])) for i in best]
+
+    # IVF training
+    def _maybe_train(self):
+        with self._lock:
+            if not self.auto_train or self._training or self.count < IVF_MIN_TRAIN:
+                return
+            indexed = self._ivf["indexed"] if self._ivf is not None else 0
+            if indexed and self.count - indexed < IVF_RETRAIN_RATIO * indexed:
+                return
+            self._training = True
+        threading.Thread(target=self.train, name="ivf-train", daemon=True).start()
+
+    def train(self, nlist=None):
+        """Clusters a sample of the rows and rebuilds the inverted lists for every row."""
+        try:
+            with self._lock:
+                count = self.count
+            nlist = nlist or int(min(4096, max(16, 4 * np.sqrt(count))))
+            rng = np.random.default_rng(0)
+            sample_rows = np.sort(rng.choice(count, size=min(count, max(IVF_TRAIN_SAMPLE, nlist)), replace=False))
+            centroids = spherical_kmeans(self._vectors[sample_rows].astype(np.float32), nlist)
+
+            assign = np.concatenate([
+                np.argmax(self._vectors[s:min(s + SCAN_CHUNK, count)].astype(np.float32) @ centroids.T, axis=1)
+                for s in range(0, count, SCAN_CHUNK)
+            ])
+            order = np.argsort(assign, kind="stable").astype(np.int64)
+            offsets = np.searchsorted(assign[order], np.arange(nlist + 1)).astype(np.int64)
+            ivf = {"centroids": centroids, "order": order, "offsets": offsets, "indexed": count}
+
+            tmp = self._path("ivf.tmp.npz")
+            np.savez(tmp, **ivf)
+            os.replace(tmp, self._path("ivf.npz"))
+            with self._lock:
+                self._ivf = ivf
+            print(f"✅ IVF index for {self.directory}: {nlist} lists over {count} vectors.")
+        except Exception as e:
+            print(f"❌ IVF training failed for {self.directory}: {e}")
+        finally:
+            self._training = False
@@ -1,86 +1,245 @@
 import io
+import os
 import cv2
+import weakref
 import numpy as np
 import base64
 import tensorflow as tf
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
 
-def preprocess_image(image_bytes: bytes, target_size=(224, 224)):
+from utils.runtime import RUNTIME
+
+# --- HEATMAP RENDERING CONFIG ---
+# HEATMAP_SIZE is the output edge in pixels (0 = match the preprocessed image)
+HEATMAP_FORMAT = os.getenv("HEATMAP_FORMAT", "jpeg").lower()
+HEATMAP_QUALITY = int(os.getenv("HEATMAP_QUALITY", "95"))
+HEATMAP_SIZE = int(os.getenv("HEATMAP_SIZE", "0"))
+RENDER_THREADS = RUNTIME.render_threads
+
+ENCODINGS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+    "png": (".png", "image/png", None),
+}
+if HEATMAP_FORMAT not in ENCODINGS:
+    raise ValueError(f"HEATMAP_FORMAT must be one of {sorted(ENCODINGS)}, got '{HEATMAP_FORMAT}'.")
+
+# COLORMAP_JET as a 256x3 BGR lookup table, so colorizing a stack is one gather
+JET_LUT = cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(256, 1), cv2.COLORMAP_JET).reshape(256, 3)
+
+# cv2.imencode releases the GIL, so encodes for one image run in parallel
+_render_pool = ThreadPoolExecutor(max_workers=RENDER_THREADS, thread_name_prefix="heatmap-encode")
+
+# model -> Grad-CAM functional model, built once instead of on every call
+_grad_models = weakref.WeakKeyDictionary()
+
+def preprocess_image(image_source, target_size=(224, 224)):
     """
     Standardizes the incoming image for DenseNet121.
-    Converts bytes to a normalized NumPy array and returns both the 
-    preprocessed batch and the original image for overlay.
+    Accepts raw bytes or any seekable file-like object (spooled upload,
+    memory-mapped temp file) and returns both the preprocessed batch and
+    the original image for overlay.
     """
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img_resized = img.resize(target_size)
+    if isinstance(image_source, (bytes, bytearray, memoryview)):
+        image_source = io.BytesIO(image_source)
+
+    img = Image.open(image_source)
+    # Let the JPEG decoder downscale in the DCT domain so a 50 MB radiograph is
+    # never materialized at full resolution (kept at >= 2x target for quality).
+    img.draft("RGB", (target_size[0] * 2, target_size[1] * 2))
+
+    # Resize before the RGB expansion when the mode allows it, so the full-size
+    # frame is never tripled into three channels.
+    if img.mode in ("RGB", "L"):
+        img_resized = img.resize(target_size).convert("RGB")
+    else:
+        img_resized = img.convert("RGB").resize(target_size)
+
     img_array = np.array(img_resized, dtype=np.float32) / 255.0
     img_final = np.expand_dims(img_array, axis=0)
     return img_final, np.array(img_resized) 
 
-def generate_grad_cam_heatmap(img_array, original_image, model, class_index):
+def get_grad_model(model, last_conv_layer_name="conv5_block16_concat"):
+    """Returns (and caches) a model mapping the input to (last conv output, predictions)."""
+    cached = _grad_models.get(model)
+    if cached is not None and cached[0] == last_conv_layer_name:
+        return cached[1]
+    grad_model = tf.keras.models.Model(
+        inputs=[model.inputs],
+        outputs=[model.get_layer(last_conv_layer_name).output, model.output]
+    )
+    _grad_models[model] = (last_conv_layer_name, grad_model)
+    return grad_model
+
+
+def iter_grad_cams(img_array, model, class_indices, last_conv_layer_name="conv5_block16_concat"):
     """
-    Generates a Grad-CAM heatmap and overlays it onto the original X-ray.
-    Uses Direct Call inference to avoid Keras 3 input naming conflicts.
+    Yields one normalized Grad-CAM map (conv grid resolution, float32 in [0, 1])
+    per class index, in order. The forward pass runs once for all classes;
+    each class then costs a single backward pass. Yields None for a class
+    whose gradient fails. Uses Direct Call inference to avoid Keras 3 input
+    naming conflicts.
     """
+    class_indices = list(class_indices)
     try:
-        last_conv_layer_name = "conv5_block16_concat"
-        
-        # Create a functional model that maps input to the last conv layer and output
-        grad_model = tf.keras.models.Model(
-            inputs=[model.inputs], 
-            outputs=[model.get_layer(last_conv_layer_name).output, model.output]
-        )
-        
-        with tf.GradientTape() as tape:
-            # Using Direct Call (grad_model(img_array)) to bypass naming warnings
+        grad_model = get_grad_model(model, last_conv_layer_name)
+        with tf.GradientTape(persistent=True) as tape:
             last_conv_layer_output, preds = grad_model(img_array, training=False)
-            
+
             # Ensure we handle list outputs from multi-output functional models
-            if isinstance(preds, list): 
+            if isinstance(preds, list):
                 preds = preds[0]
-            if isinstance(last_conv_layer_output, list): 
+            if isinstance(last_conv_layer_output, list):
                 last_conv_layer_output = last_conv_layer_output[0]
-                
-            class_channel = preds[:, class_index]
-        
-        # Compute gradients of the class with respect to the last conv layer
-        grads = tape.gradient(class_channel, last_conv_layer_output)
-        if isinstance(grads, list): 
-            grads = grads[0]
-            
-        pooled_grads = tf.reduce_mean(grads, axis=(0, 1, 2))
-        
-        last_conv_layer_output = last_conv_layer_output[0]
-        heatmap = last_conv_layer_output @ pooled_grads[..., tf.newaxis]
-        heatmap = tf.squeeze(heatmap)
-        
-        # Normalize heatmap between 0 and 1
-        heatmap = tf.maximum(heatmap, 0)
-        max_val = tf.math.reduce_max(heatmap)
-        if max_val == 0: 
-            max_val = 1e-10
-        heatmap = heatmap / max_val
-        heatmap = heatmap.numpy()
-        
-        # --- OpenCV Color Processing ---
-        # Note: original_image is RGB (from PIL), OpenCV expects BGR for processing
-        original_bgr = cv2.cvtColor(original_image, cv2.COLOR_RGB2BGR)
-        
-        heatmap_resized = cv2.resize(heatmap, (original_image.shape[1], original_image.shape[0]))
-        heatmap_resized = np.uint8(255 * heatmap_resized)
-        
-        # cv2.COLORMAP_JET produces a BGR heatmap
-        heatmap_colored = cv2.applyColorMap(heatmap_resized, cv2.COLORMAP_JET)
-        
-        # Superimpose BGR heatmap onto BGR original
-        superimposed_img = cv2.addWeighted(original_bgr, 0.6, heatmap_colored, 0.4, 0)
-        
-        # Encode the final BGR image into a JPEG buffer
-        _, buffer = cv2.imencode(".jpg", superimposed_img)
-        heatmap_base64 = base64.b64encode(buffer).decode("utf-8")
-        
-        return f"data:image/jpeg;base64,{heatmap_base64}"
-        
+
+            class_channels = [preds[:, i] for i in class_indices]
+    except Exception as e:
+        print(f"❌ Heatmap Error (forward pass): {e}")
+        for _ in class_indices:
+            yield None
+        return
+
+    try:
+        for class_index, class_channel in zip(class_indices, class_channels):
+            try:
+                yield _grad_cam_from_tape(tape, class_channel, last_conv_layer_output)
+            except Exception as e:
+                print(f"❌ Heatmap Error for index {class_index}: {e}")
+                yield None
+    finally:
+        del tape
+
+
+def combined_grad_cam(img_array, model, class_indices, last_conv_layer_name="conv5_block16_concat"):
+    """
+    One Grad-CAM map for several classes at once: a single backward pass of
+    the summed class scores. Returns None if the gradient fails.
+    """
+    try:
+        grad_model = get_grad_model(model, last_conv_layer_name)
+        with tf.GradientTape() as tape:
+            last_conv_layer_output, preds = grad_model(img_array, training=False)
+            if isinstance(preds, list):
+                preds = preds[0]
+            if isinstance(last_conv_layer_output, list):
+                last_conv_layer_output = last_conv_layer_output[0]
+            combined_channel = tf.reduce_sum(tf.gather(preds, list(class_indices), axis=1), axis=1)
+        return _grad_cam_from_tape(tape, combined_channel, last_conv_layer_output)
+    except Exception as e:
+        print(f"❌ Heatmap Error (combined): {e}")
+        return None
+
+
+def _grad_cam_from_tape(tape, class_channel, last_conv_layer_output):
+    # Compute gradients of the class with respect to the last conv layer
+    grads = tape.gradient(class_channel, last_conv_layer_output)
+    if isinstance(grads, list):
+        grads = grads[0]
+
+    pooled_grads = tf.reduce_mean(grads, axis=(0, 1, 2))
+    heatmap = last_conv_layer_output[0] @ pooled_grads[..., tf.newaxis]
+    heatmap = tf.squeeze(heatmap, axis=-1)
+
+    # Normalize heatmap between 0 and 1
+    heatmap = tf.maximum(heatmap, 0)
+    max_val = tf.math.reduce_max(heatmap)
+    if max_val == 0:
+        max_val = 1e-10
+    return (heatmap / max_val).numpy().astype(np.float32)
+
+
+def _encode(image, extension, params):
+    ok, buffer = cv2.imencode(extension, image, params)
+    if not ok:
+        raise ValueError(f"OpenCV could not encode heatmap as {extension}")
+    return buffer.tobytes()
+
+
+def render_heatmaps(heatmaps, original_image, fmt=None, quality=None, size=None):
+    """
+    Overlays a (num_maps, h, w) stack of normalized heatmaps onto one RGB image
+    and encodes each overlay. Returns (list of encoded bytes, mime type).
+
+    The original is converted to BGR once, every map is resized in a single
+    multi-channel cv2.resize, colorized through JET_LUT, blended 60/40 in one
+    vectorized op, and the encodes fan out over a thread pool.
+    """
+    fmt = (fmt or HEATMAP_FORMAT).lower()
+    quality = HEATMAP_QUALITY if quality is None else quality
+    size = size if size is not None else HEATMAP_SIZE
+    extension, mime, quality_flag = ENCODINGS[fmt]
+    params = [quality_flag, int(quality)] if quality_flag is not None else []
+
+    heatmaps = np.asarray(heatmaps, dtype=np.float32)
+    if heatmaps.ndim == 2:
+        heatmaps = heatmaps[np.newaxis]
+    if heatmaps.shape[0] == 0:
+        return [], mime
+
+    # Note: original_image is RGB (from PIL), OpenCV expects BGR for processing
+    original_bgr = cv2.cvtColor(original_image, cv2.COLOR_RGB2BGR)
+    if size:
+        original_bgr = cv2.resize(original_bgr, (size, size), interpolation=cv2.INTER_AREA)
+    height, width = original_bgr.shape[:2]
+
+    # (h, w, num_maps) so one resize call handles the whole stack
+    stacked = np.ascontiguousarray(np.moveaxis(heatmaps, 0, -1))
+    resized = cv2.resize(stacked, (width, height))
+    if resized.ndim == 2:
+        resized = resized[..., np.newaxis]
+    indices = np.uint8(255 * np.clip(np.moveaxis(resized, -1, 0), 0, 1))
+
+    # JET_LUT produces BGR colors; blend onto the BGR original (addWeighted 0.6/0.4)
+    colored = JET_LUT[indices]
+    blended = original_bgr.astype(np.float32) * 0.6 + colored.astype(np.float32) * 0.4
+    overlays = np.clip(np.rint(blended), 0, 255).astype(np.uint8)
+
+    if len(overlays) == 1:
+        return [_encode(overlays[0], extension, params)], mime
+    futures = [_render_pool.submit(_encode, overlay, extension, params) for overlay in overlays]
+    return [f.result() for f in futures], mime
+
+
+def encode_raw_cams(heatmaps, dtype="uint8", binary=False) -> list:
+    """
+    Packs normalized CAM grids (e.g. 7x7 for conv5_block16_concat) for
+    client-side rendering. uint8 maps [0, 1] to [0, 255]; float16 is stored
+    little-endian. Each entry is {"shape", "dtype", "data"}, where data is
+    base64 text, or raw bytes when binary=True (MessagePack/CBOR responses).
+    """
+    heatmaps = np.asarray(heatmaps, dtype=np.float32)
+    if heatmaps.ndim == 2:
+        heatmaps = heatmaps[np.newaxis]
+    if dtype == "uint8":
+        packed = np.rint(np.clip(heatmaps, 0, 1) * 255).astype(np.uint8)
+    elif dtype == "float16":
+        packed = heatmaps.astype("<f2")
+    else:
+        raise ValueError(f"Unsupported CAM dtype '{dtype}' (use uint8 or float16).")
+    return [
+        {"shape": list(cam.shape), "dtype": dtype,
+         "data": cam.tobytes() if binary else base64.b64encode(cam.tobytes()).decode("utf-8")}
+        for cam in packed
+    ]
+
+
+def to_data_url(encoded: bytes, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(encoded).decode('utf-8')}"
+
+
+def generate_grad_cam_heatmap(img_array, original_image, model, class_index, last_conv_layer_name="conv5_block16_concat"):
+    """
+    Generates a Grad-CAM heatmap for one class and overlays it onto the
+    original X-ray, returned as a data URL. Multi-class callers should use
+    iter_grad_cams() + render_heatmaps() to share the forward pass and encode.
+    """
+    heatmap = next(iter_grad_cams(img_array, model, [class_index], last_conv_layer_name))
+    if heatmap is None:
+        return None
+    try:
+        encoded, mime = render_heatmaps(heatmap, original_image)
+        return to_data_url(encoded[0], mime)
     except Exception as e:
         print(f"❌ Heatmap Error for index {class_index}: {e}")
-        return None
\ No newline at end of file
+        return None